@@ -0,0 +1,578 @@
+from calendar import timegm
+from collections import Counter
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Union
+from parse.apache_log_entry import ApacheLogEntry
+from data.response_info import ResponseInfo
+from data.metadata_info import MetadataInfo
+from analysis.hyper_log_log import HyperLogLog
+from analysis.space_saving import SpaceSaving
+from analysis.dd_sketch import DDSketch
+
+
+def get_percent(count: int, total: int) -> float:
+    """
+    Returns the percent of a count in a total, 0 if the total is 0
+    (no entry passed the filter).
+    """
+    return count / total * 100 if total else 0.0
+
+
+class ApacheLogAggregator:
+    """
+    Base class of the aggregators, each one computes a statistic of the entries.
+
+    The analyser gives every entry which passed the filter to the update method
+    of its aggregators, in a single pass over the entries. The aggregators of
+    several parts of a file can be merged (in the order of the file), and saved
+    and loaded in a JSON serializable form.
+
+    Attributes:
+        name (str): The name of the statistic in the analysis.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def update(self, entry: ApacheLogEntry):
+        """
+        Updates the statistic with an entry.
+
+        Args:
+            entry (ApacheLogEntry): An entry which passed the filter.
+        """
+        raise NotImplementedError()
+
+    def merge(self, other: "ApacheLogAggregator"):
+        """
+        Adds the statistic of another aggregator of the same kind to this one.
+
+        Args:
+            other (ApacheLogAggregator): The aggregator to merge.
+        """
+        raise NotImplementedError()
+
+    def result(self, total_requests: int) -> dict:
+        """
+        Returns the statistics of the aggregator, by name.
+
+        Args:
+            total_requests (int): The number of entries which passed the filter.
+
+        Returns:
+            dict: The statistics, put in the section of the analysis.
+        """
+        raise NotImplementedError()
+
+    def get_state(self) -> Any:
+        """
+        Returns the aggregator in a JSON serializable form (see load_state).
+
+        Returns:
+            Any: The state of the aggregator.
+        """
+        raise NotImplementedError()
+
+    def load_state(self, state: Any):
+        """
+        Replaces the statistic of the aggregator by a state returned by get_state.
+
+        Args:
+            state (Any): The state of an aggregator of the same kind.
+        """
+        raise NotImplementedError()
+
+
+class ItemsRateAggregator(ApacheLogAggregator):
+    """
+    Aggregator counting the entries by item, with the percent of each item.
+
+    Attributes:
+        items_name (str): The name of the items in the results.
+        key (Callable[[ApacheLogEntry], Any]): The function giving the item of an entry.
+        sort (bool): Sort the results by item instead of the order of first occurrence.
+        reverse (bool): Sort the results in descending order.
+        column (Optional[str]): The column of an ApacheLogColumnarFile holding the
+            items, so they can be counted by the NumPy backend (see ApacheLogNumpyBackend).
+        column_key (Optional[Callable[[Any], Any]]): The function giving the item
+            from the value of the column (the value itself if None).
+    """
+
+    def __init__(self, name: str, items_name: str, key: Callable[[ApacheLogEntry], Any],
+                 sort: bool = False, reverse: bool = False,
+                 column: Optional[str] = None, column_key: Optional[Callable[[Any], Any]] = None):
+        super().__init__(name)
+        self.items_name = items_name
+        self.key = key
+        self.sort = sort
+        self.reverse = reverse
+        self.column = column
+        self.column_key = column_key
+        self._counts = Counter()
+
+    def update(self, entry: ApacheLogEntry):
+        self._counts[self.key(entry)] += 1
+
+    def merge(self, other: "ItemsRateAggregator"):
+        self._counts.update(other._counts)
+
+    def get_rate(self, total_requests: int) -> list:
+        """
+        Returns the number of entries and the percent of each item.
+
+        Args:
+            total_requests (int): The number of entries which passed the filter.
+
+        Returns:
+            list: The dicts of the items with their total and percent.
+        """
+        rate = [
+            {self.items_name: item, "total": count, "percent": get_percent(count, total_requests)}
+            for item, count in self._counts.items()
+        ]
+        if self.sort:
+            rate.sort(key=lambda item_rate: item_rate[self.items_name], reverse=self.reverse)
+        return rate
+
+    def result(self, total_requests: int) -> dict:
+        return {self.name: self.get_rate(total_requests)}
+
+    def get_state(self) -> list:
+        # List of [item, count] pairs to keep the type and the order of the items
+        return list(self._counts.items())
+
+    def load_state(self, state: list):
+        self._counts = Counter(dict(state))
+
+
+class StatusCodeAggregator(ItemsRateAggregator):
+    """
+    Aggregator counting the entries by status code and by class of status code.
+    Only the status codes are counted, the classes are computed from their counts.
+
+    Attributes:
+        classes_name (str): The name of the rate of the classes in the results.
+    """
+
+    def __init__(self, name: str, classes_name: str):
+        super().__init__(name, "code", attrgetter("response_info.status_code"), sort=True, column="status_codes")
+        self.classes_name = classes_name
+
+    def get_classes_rate(self, total_requests: int) -> list:
+        """
+        Returns the number of entries and the percent of each class of status code.
+
+        Args:
+            total_requests (int): The number of entries which passed the filter.
+
+        Returns:
+            list: The dicts of the classes with their total and percent, the highest class first.
+        """
+        classes_counts = Counter()
+        for status_code, count in self._counts.items():
+            classes_counts[ResponseInfo.get_class_of_status_code(status_code)] += count
+        classes_rate = [
+            {"class": status_code_class, "total": count, "percent": get_percent(count, total_requests)}
+            for status_code_class, count in classes_counts.items()
+        ]
+        return sorted(classes_rate, key=lambda x: x["class"], reverse=True)
+
+    def result(self, total_requests: int) -> dict:
+        return {
+            self.name: self.get_rate(total_requests),
+            self.classes_name: self.get_classes_rate(total_requests)
+        }
+
+
+class TopItemsAggregator(ApacheLogAggregator):
+    """
+    Aggregator of the most frequent items and of the number of distinct items.
+
+    The items are counted exactly, or estimated in a fixed memory if an
+    approximation is given: the distinct items with a HyperLogLog and the
+    most frequent ones with a Space-Saving summary.
+
+    Attributes:
+        items_name (str): The name of the items in the results.
+        key (Callable[[ApacheLogEntry], Any]): The function giving the item of an entry.
+        top_n (int): The number of items in the results.
+        unique_name (Optional[str]): The name of the number of distinct items in the results,
+            not in the results if None.
+        approximation (Optional[dict]): The error bounds of the estimations
+            (see DEFAULT_APPROXIMATION), None if the items are counted exactly.
+        column (Optional[str]): The column of an ApacheLogColumnarFile holding the
+            items, so the exact counts can be computed by the NumPy backend.
+    """
+
+    def __init__(self, name: str, items_name: str, key: Callable[[ApacheLogEntry], Any],
+                 top_n: int, unique_name: Optional[str] = None, approximation: Optional[dict] = None,
+                 column: Optional[str] = None):
+        super().__init__(name)
+        self.items_name = items_name
+        self.key = key
+        self.column = column
+        self.top_n = top_n
+        self.unique_name = unique_name
+        self.approximation = approximation
+        self.__unique_items = None
+        if approximation is None:
+            self.__counts = Counter()
+        else:
+            self.__counts = SpaceSaving(approximation["top_error"])
+            if unique_name is not None:
+                self.__unique_items = HyperLogLog(approximation["unique_error"])
+
+    def update(self, entry: ApacheLogEntry):
+        item = self.key(entry)
+        if self.approximation is None:
+            self.__counts[item] += 1
+        else:
+            self.__counts.add(item)
+            if self.__unique_items is not None:
+                self.__unique_items.add(item)
+
+    def merge(self, other: "TopItemsAggregator"):
+        if self.approximation is None:
+            self.__counts.update(other.__counts)
+        else:
+            self.__counts.merge(other.__counts)
+            if self.__unique_items is not None:
+                self.__unique_items.merge(other.__unique_items)
+
+    def get_total_unique(self) -> int:
+        """
+        Returns the number of distinct items (estimated if approximated).
+
+        Returns:
+            int: The number of distinct items.
+        """
+        if self.approximation is None:
+            return len(self.__counts.keys())
+        return self.__unique_items.count()
+
+    def get_top(self, top_n: int, total_requests: int) -> list:
+        """
+        Returns the most frequent items. If they are approximated, the error
+        of each item is the maximum overestimation of its total.
+
+        Args:
+            top_n (int): The number of items to return.
+            total_requests (int): The number of entries which passed the filter.
+
+        Returns:
+            list: The dicts of the items with their total and percent, the most frequent first.
+        """
+        top_items = self.__counts.most_common(top_n)
+        if self.approximation is not None:
+            return [
+                {self.items_name: item, "total": count, "percent": get_percent(count, total_requests),
+                 "error": self.__counts.get_error(item)}
+                for item, count in top_items
+            ]
+        return [
+            {self.items_name: item, "total": count, "percent": get_percent(count, total_requests)}
+            for item, count in top_items
+        ]
+
+    def get_errors(self, total_requests: int) -> dict:
+        """
+        Returns the error bounds of the estimations (approximation only).
+        The bounds can be a bit tighter than the ones asked, they are
+        rounded to the precision of the estimators.
+
+        Args:
+            total_requests (int): The number of entries which passed the filter.
+
+        Returns:
+            dict: The relative standard error of the number of distinct items,
+            and the maximum overestimation of the top counts (fraction of the
+            requests and number of requests).
+        """
+        errors = {}
+        if self.__unique_items is not None:
+            errors["unique_relative_error"] = self.__unique_items.error
+        errors["top_error"] = self.__counts.error
+        errors["top_max_overestimation"] = int(total_requests * self.__counts.error)
+        return errors
+
+    def result(self, total_requests: int) -> dict:
+        results = {}
+        if self.unique_name is not None:
+            results[self.unique_name] = self.get_total_unique()
+        results[self.name] = self.get_top(self.top_n, total_requests)
+        return results
+
+    def get_state(self) -> Union[list, dict]:
+        if self.approximation is None:
+            return list(self.__counts.items())
+        state = {"top": self.__counts.get_state()}
+        if self.__unique_items is not None:
+            state["unique"] = self.__unique_items.get_state()
+        return state
+
+    def load_state(self, state: Union[list, dict]):
+        if self.approximation is None:
+            self.__counts = Counter(dict(state))
+            return
+        self.__counts.load_state(state["top"])
+        if self.__unique_items is not None:
+            self.__unique_items.load_state(state["unique"])
+
+
+class BotRateAggregator(ApacheLogAggregator):
+    """
+    Aggregator counting the entries sent by bots.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__bots = 0
+
+    def update(self, entry: ApacheLogEntry):
+        if entry.metadata_info.is_bot():
+            self.__bots += 1
+
+    def merge(self, other: "BotRateAggregator"):
+        self.__bots += other.__bots
+
+    def get_bot_rate(self, total_requests: int) -> dict:
+        """
+        Returns the number and the percent of the entries sent by bots.
+
+        Args:
+            total_requests (int): The number of entries which passed the filter.
+
+        Returns:
+            dict: The total and the percent of the entries sent by bots.
+        """
+        return {"total": self.__bots, "percent": get_percent(self.__bots, total_requests)}
+
+    def result(self, total_requests: int) -> dict:
+        return {self.name: self.get_bot_rate(total_requests)}
+
+    def get_state(self) -> int:
+        return self.__bots
+
+    def load_state(self, state: int):
+        self.__bots = state
+
+
+class TrafficAggregator(ApacheLogAggregator):
+    """
+    Aggregator of the requests, the bytes sent and the errors (status code from 400) by period of time.
+
+    The periods are computed from the local time written in the log, as integer
+    seconds since the epoch rounded down to a multiple of the bucket size, so
+    the buckets of a day start at midnight. The datetime of the previous entry
+    is memoized, the adjacent lines often share the same second.
+
+    Attributes:
+        bucket_size (int): The duration of a bucket, in seconds.
+    """
+
+    def __init__(self, name: str, bucket_size: int):
+        super().__init__(name)
+        self.bucket_size = bucket_size
+        # [requests, bytes, errors] by start of bucket (local epoch seconds)
+        self.__buckets = {}
+        self.__last_timestamp = None
+        self.__last_bucket = None
+
+    def update(self, entry: ApacheLogEntry):
+        timestamp = entry.request_info.timestamp
+        if timestamp is not self.__last_timestamp:
+            self.__last_timestamp = timestamp
+            self.__last_bucket = None
+            if timestamp is not None:
+                # timetuple gives the local time of the log, timegm doesn't apply any timezone
+                seconds = timegm(timestamp.timetuple())
+                self.__last_bucket = seconds - seconds % self.bucket_size
+        if self.__last_bucket is None:
+            return
+        bucket = self.__buckets.get(self.__last_bucket)
+        if bucket is None:
+            bucket = self.__buckets[self.__last_bucket] = [0, 0, 0]
+        response_info = entry.response_info
+        bucket[0] += 1
+        if response_info.response_size:
+            bucket[1] += response_info.response_size
+        if response_info.status_code is not None and response_info.status_code >= 400:
+            bucket[2] += 1
+
+    def merge(self, other: "TrafficAggregator"):
+        for start, (requests, size, errors) in other.__buckets.items():
+            bucket = self.__buckets.get(start)
+            if bucket is None:
+                self.__buckets[start] = [requests, size, errors]
+            else:
+                bucket[0] += requests
+                bucket[1] += size
+                bucket[2] += errors
+
+    def get_buckets(self) -> list:
+        """
+        Returns the traffic of each period of time, in chronological order.
+        The periods without request are not returned.
+
+        Returns:
+            list: The dicts of the periods with their start (local time, ISO format),
+            number of requests, bytes sent, number of errors and percent of errors.
+        """
+        epoch = datetime(1970, 1, 1)
+        return [
+            {"start": (epoch + timedelta(seconds=start)).isoformat(), "requests": requests,
+             "bytes": size, "errors": errors, "error_rate": get_percent(errors, requests)}
+            for start, (requests, size, errors) in sorted(self.__buckets.items())
+        ]
+
+    def result(self, total_requests: int) -> dict:
+        return {"bucket_size": self.bucket_size, self.name: self.get_buckets()}
+
+    def get_state(self) -> list:
+        return [[start] + bucket for start, bucket in self.__buckets.items()]
+
+    def load_state(self, state: list):
+        self.__buckets = {bucket[0]: bucket[1:] for bucket in state}
+
+
+class ResponseSizeAggregator(ApacheLogAggregator):
+    """
+    Aggregator of the bytes sent and of the percentiles of the size of the responses.
+    The percentiles are estimated with a DDSketch, in a compact memory.
+
+    Attributes:
+        percentiles (tuple): The percentiles returned (between 0 and 100).
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, name: str, relative_accuracy: float = 0.01):
+        super().__init__(name)
+        self.percentiles = self.PERCENTILES
+        self.__total_bytes = 0
+        self.__sizes = DDSketch(relative_accuracy)
+
+    def update(self, entry: ApacheLogEntry):
+        # The responses without body ("-") have a size of 0
+        size = entry.response_info.response_size or 0
+        self.__total_bytes += size
+        self.__sizes.add(size)
+
+    def merge(self, other: "ResponseSizeAggregator"):
+        self.__total_bytes += other.__total_bytes
+        self.__sizes.merge(other.__sizes)
+
+    def get_percentiles(self) -> dict:
+        """
+        Returns the estimated percentiles of the size of the responses.
+
+        Returns:
+            dict: The sizes in bytes (rounded), by percentile ("p50", "p95", "p99").
+        """
+        percentiles = {}
+        for percentile in self.percentiles:
+            size = self.__sizes.get_quantile(percentile / 100)
+            percentiles[f"p{percentile}"] = round(size) if size is not None else None
+        return percentiles
+
+    def result(self, total_requests: int) -> dict:
+        return {
+            "total_bytes": self.__total_bytes,
+            self.name: self.get_percentiles(),
+            "relative_accuracy": self.__sizes.relative_accuracy
+        }
+
+    def get_state(self) -> dict:
+        return {"total_bytes": self.__total_bytes, "sizes": self.__sizes.get_state()}
+
+    def load_state(self, state: dict):
+        self.__total_bytes = state["total_bytes"]
+        self.__sizes.load_state(state["sizes"])
+
+
+# Functions giving the items of the entries (module functions so the aggregators can be pickled)
+def get_os(entry: ApacheLogEntry) -> Optional[str]:
+    return entry.metadata_info.get_os()
+
+def get_browser(entry: ApacheLogEntry) -> Optional[str]:
+    return entry.metadata_info.get_browser()
+
+def get_type_device(entry: ApacheLogEntry) -> Optional[str]:
+    return entry.metadata_info.get_type_device()
+
+
+# Functions giving the items from the user agent column (see ApacheLogNumpyBackend)
+def get_user_agent_os(user_agent: Optional[str]) -> Optional[str]:
+    return MetadataInfo(None, user_agent).get_os()
+
+
+def get_user_agent_browser(user_agent: Optional[str]) -> Optional[str]:
+    return MetadataInfo(None, user_agent).get_browser()
+
+
+def get_user_agent_type_device(user_agent: Optional[str]) -> Optional[str]:
+    return MetadataInfo(None, user_agent).get_type_device()
+
+
+# Registry of the aggregators of each section of statistics, in the order of the
+# results. A factory takes the options of the analyser:
+#   - approximation: the error bounds of the approximate statistics (None if exact).
+#   - bucket_size: the duration of the buckets of the traffic, in seconds.
+AGGREGATORS: Dict[str, List[Callable[[dict], ApacheLogAggregator]]] = {
+    "clients": [
+        lambda options: TopItemsAggregator("top_ips", "ip", attrgetter("client_info.client_ip"),
+                                           3, "total_unique_ip", options["approximation"], "client_ips")
+    ],
+    "requests": [
+        lambda options: ItemsRateAggregator("http_method_rate", "method", attrgetter("request_info.method"),
+                                            column="methods"),
+        lambda options: TopItemsAggregator("top_urls", "url", attrgetter("request_info.url"),
+                                           3, approximation=options["approximation"], column="urls")
+    ],
+    "responses": [
+        lambda options: StatusCodeAggregator("status_code_rate", "status_code_classes_rate")
+    ],
+    "metadatas": [
+        lambda options: ItemsRateAggregator("os_rate", "os", get_os,
+                                            column="user_agents", column_key=get_user_agent_os),
+        lambda options: ItemsRateAggregator("browser_rate", "browser", get_browser,
+                                            column="user_agents", column_key=get_user_agent_browser),
+        lambda options: ItemsRateAggregator("type_device_rate", "type_device", get_type_device,
+                                            column="user_agents", column_key=get_user_agent_type_device),
+        lambda options: BotRateAggregator("bot_rate")
+    ],
+    "traffic": [
+        lambda options: TrafficAggregator("buckets", options["bucket_size"])
+    ],
+    "response_sizes": [
+        lambda options: ResponseSizeAggregator("percentiles")
+    ]
+}
+
+
+def register_aggregator(section: str, factory: Callable[[dict], ApacheLogAggregator]):
+    """
+    Adds an aggregator to a section of statistics.
+    The fields of the entries it needs must be in STATISTICS_FIELDS.
+
+    Args:
+        section (str): The section of statistics (see STATISTICS).
+        factory (Callable[[dict], ApacheLogAggregator]): The function creating
+            the aggregator from the options of the analyser.
+    """
+    AGGREGATORS.setdefault(section, []).append(factory)
+
+
+def create_aggregators(section: str, options: dict) -> List[ApacheLogAggregator]:
+    """
+    Creates the aggregators of a section of statistics.
+
+    Args:
+        section (str): The section of statistics (see STATISTICS).
+        options (dict): The options of the analyser (see AGGREGATORS).
+
+    Returns:
+        List[ApacheLogAggregator]: The aggregators, in the order of their results.
+    """
+    return [factory(options) for factory in AGGREGATORS.get(section, ())]
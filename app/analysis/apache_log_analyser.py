@@ -1,46 +1,190 @@
-
-from collections import Counter
+from typing import Iterable, List, Optional
 from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_entry import ApacheLogEntry
 from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_aggregators import ApacheLogAggregator, create_aggregators
+
+# Sections of statistics which can be computed by the analyser
+STATISTICS = ("clients", "requests", "responses", "metadatas", "traffic", "response_sizes")
+
+# Sections of statistics computed if none is given
+DEFAULT_STATISTICS = ("clients", "requests", "responses", "metadatas")
+
+# Fields of the entries needed by each section of statistics
+STATISTICS_FIELDS = {
+    "clients": ("ip",),
+    "requests": ("method", "url"),
+    "responses": ("status",),
+    "metadatas": ("user_agent",),
+    "traffic": ("timestamp", "status", "size"),
+    "response_sizes": ("size",)
+}
+
+# Durations of the buckets of the traffic, in seconds
+BUCKET_SIZES = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Default error bounds of the approximate statistics:
+#   - unique_error: relative standard error of the number of unique IPs.
+#   - top_error: maximum overestimation of the counts of the top IPs and URLs,
+#     as a fraction of the number of requests.
+DEFAULT_APPROXIMATION = {"unique_error": 0.01, "top_error": 0.001}
 
 class ApacheLogAnalyser:
     """
     Class for calculating statistics of an Apache log file.
 
+    The entries of the file are read only once: each statistic is computed
+    by an aggregator (see apache_log_aggregators) and the aggregators of the
+    sections asked are updated in a single loop as the entries pass by, so
+    the entries don't need to be kept in memory (the file can be streamed).
+
     Attributes:
         file (ApacheLogFile): The Apache log file.
+        filter (ApacheLogFilter): The filter applied on the entries.
+        total_entries (int): The number of entries given to the analyser (filtered or not).
+        stats (tuple): The sections of statistics computed (see STATISTICS).
+        bucket_size (int): The duration of the buckets of the traffic, in seconds.
+        approximation (Optional[dict]): The error bounds of the approximate statistics
+            (see DEFAULT_APPROXIMATION), None if the statistics are exact.
+            The unique IPs are then estimated with a HyperLogLog and the top IPs
+            and URLs with a Space-Saving summary, in a memory which doesn't
+            depend on the number of distinct IPs and URLs.
     """
 
-    def __init__(self, 
-                 apache_log_file: ApacheLogFile, 
-                 apache_log_filter: ApacheLogFilter):
+    def __init__(self,
+                 apache_log_file: ApacheLogFile,
+                 apache_log_filter: ApacheLogFilter,
+                 stats: Optional[Iterable[str]] = None,
+                 approximation: Optional[dict] = None,
+                 bucket_size: int = BUCKET_SIZES["hour"]):
         self.file = apache_log_file
         self.filter = apache_log_filter
-        self.valid_entries = self.__get_entries_pass_filter()
-
-    def __get_entries_pass_filter(self) -> list:
-        valid_entries = []
-        for entry in self.file.entries:
-            if self.filter.pass_filter(entry):
-                valid_entries.append(entry)
-        return valid_entries
-    
-    def __get_items_rate(self, list_items: list, items_name: str) -> list:
-        items_count = Counter(list_items)
-        items_total = len(list_items)
-        return [
-            {items_name: item, "total": count, "percent": count / items_total * 100}
-            for item, count in items_count.items()
-        ]
-    
-    def __get_top_items(self, list_items: list, items_name: str, top_n: int) -> list:
-        items_count = Counter(list_items)
-        items_total = len(list_items)
-        top_items = items_count.most_common(top_n)
-        return [
-            {items_name: item, "total": count, "percent": count / items_total * 100}
-            for item, count in top_items
+        self.stats = tuple(stats) if stats is not None else DEFAULT_STATISTICS
+        self.approximation = approximation
+        self.bucket_size = bucket_size
+        self.total_entries = 0
+        self.__total_requests = 0
+        # The aggregators of all the sections, only the ones of the sections asked are updated
+        options = {"approximation": approximation, "bucket_size": bucket_size}
+        self.__sections = {section: create_aggregators(section, options) for section in STATISTICS}
+        self.__aggregators = {
+            aggregator.name: aggregator
+            for aggregators in self.__sections.values() for aggregator in aggregators
+        }
+        self.__active_aggregators = [
+            aggregator
+            for section in STATISTICS if section in self.stats
+            for aggregator in self.__sections[section]
         ]
+        self.analyse_entries(self.file.entries)
+
+    @staticmethod
+    def get_required_fields(apache_log_filter: ApacheLogFilter,
+                            stats: Optional[Iterable[str]] = None) -> set:
+        """
+        Returns the fields of the entries needed by the filter and the statistics,
+        so the parser can skip the others.
+
+        Args:
+            apache_log_filter (ApacheLogFilter): The filter applied on the entries.
+            stats (Optional[Iterable[str]]): The sections of statistics computed (DEFAULT_STATISTICS if None).
+
+        Returns:
+            set: The names of the fields (see ApacheLogParser.FIELDS).
+        """
+        fields = apache_log_filter.get_required_fields()
+        for stat in (stats if stats is not None else DEFAULT_STATISTICS):
+            fields.update(STATISTICS_FIELDS[stat])
+        return fields
+
+    def get_aggregators(self) -> List[ApacheLogAggregator]:
+        """
+        Returns the aggregators updated by the analyser (the ones of the sections asked).
+
+        Returns:
+            List[ApacheLogAggregator]: The aggregators, in the order of the analysis.
+        """
+        return list(self.__active_aggregators)
+
+    def analyse_entries(self, entries: Iterable[ApacheLogEntry]):
+        """
+        Updates the statistics with the given entries.
+
+        Args:
+            entries (Iterable[ApacheLogEntry]): The entries to analyse.
+        """
+        pass_filter = self.filter.pass_filter
+        updates = [aggregator.update for aggregator in self.__active_aggregators]
+        for entry in entries:
+            self.total_entries += 1
+            if not pass_filter(entry):
+                continue
+            self.__total_requests += 1
+            for update in updates:
+                update(entry)
+
+    def add_totals(self, entries: int, requests: int):
+        """
+        Adds to the totals entries whose statistics were updated without
+        analyse_entries (see ApacheLogProfiler, which runs the filter and
+        each aggregator apart).
+
+        Args:
+            entries (int): The number of entries read.
+            requests (int): The number of entries which passed the filter.
+        """
+        self.total_entries += entries
+        self.__total_requests += requests
+
+    def analyse_entry(self, entry: ApacheLogEntry):
+        """
+        Updates the statistics with the given entry if it passes the filter.
+
+        Args:
+            entry (ApacheLogEntry): The entry to analyse.
+        """
+        self.analyse_entries((entry,))
+
+    def merge(self, other: "ApacheLogAnalyser"):
+        """
+        Adds the statistics of another analyser to this one.
+        The analysers must be merged in the order of the file
+        so the first seen items keep the same order.
+        Both analysers must have the same approximation.
+
+        Args:
+            other (ApacheLogAnalyser): The analyser to merge.
+        """
+        self.total_entries += other.total_entries
+        self.__total_requests += other.__total_requests
+        for name, aggregator in self.__aggregators.items():
+            aggregator.merge(other.__aggregators[name])
+
+    def get_state(self) -> dict:
+        """
+        Returns the statistics of the analyser in a JSON serializable form,
+        so the analysis can be saved and resumed later (see load_state).
+
+        Returns:
+            dict: The state of the analyser, with the state of each aggregator.
+        """
+        return {
+            "total_entries": self.total_entries,
+            "total_requests": self.__total_requests,
+            "aggregators": {name: aggregator.get_state() for name, aggregator in self.__aggregators.items()}
+        }
+
+    def load_state(self, state: dict):
+        """
+        Replaces the statistics of the analyser by a state returned by get_state.
+
+        Args:
+            state (dict): The state of an analyser.
+        """
+        self.total_entries = state["total_entries"]
+        self.__total_requests = state["total_requests"]
+        for name, aggregator in self.__aggregators.items():
+            aggregator.load_state(state["aggregators"][name])
 
     def get_complete_analysis(self, show_detail: bool) -> dict:
         analysis = {}
@@ -49,31 +193,19 @@ class ApacheLogAnalyser:
         # Detail of the analysis if asked
         if show_detail:
             analysis["analysis"] = {"filter": self.filter.to_dict()}
+        # Error bounds of the approximate statistics
+        if self.approximation is not None:
+            analysis["approximation"] = self.get_approximation_errors()
         analysis["stats"] = {}
         analysis["total_requests"] = self.get_total_requests()
-        # Analysis of the file
-        # Statistics related to clients
-        clients_stats = {}
-        clients_stats["total_unique_ip"] = self.get_total_unique_ip()
-        clients_stats["top_ips"] = self.get_top_ips(3)
-        analysis["stats"]["clients"] = clients_stats
-        # Statistics related to requests
-        requests_stats = {}
-        requests_stats["http_method_rate"] = self.get_http_method_rate()
-        requests_stats["top_urls"] = self.get_top_urls(3)
-        analysis["stats"]["requests"] = requests_stats
-        # Statistics related to responses 
-        responses_stats = {}
-        responses_stats["status_code_rate"] = self.get_status_code_rate()
-        responses_stats["status_code_classes_rate"] = self.get_status_code_classes_rate()
-        analysis["stats"]["responses"] = responses_stats
-        # Statistics related to metadatas
-        metadatas_stats = {}
-        metadatas_stats["os_rate"] = self.get_os_rate()
-        metadatas_stats["browser_rate"] = self.get_browser_rate()
-        metadatas_stats["type_device_rate"] = self.get_type_device_rate()
-        metadatas_stats["bot_rate"] = self.get_bot_rate()
-        analysis["stats"]["metadatas"] = metadatas_stats
+        # Analysis of the file, section by section (in the order of STATISTICS)
+        for section in STATISTICS:
+            if section not in self.stats:
+                continue
+            section_stats = {}
+            for aggregator in self.__sections[section]:
+                section_stats.update(aggregator.result(self.__total_requests))
+            analysis["stats"][section] = section_stats
         # Return the analysis
         return analysis
 
@@ -84,14 +216,30 @@ class ApacheLogAnalyser:
         Returns:
             int: The total number of requests.
         """
-        #Return the number of entries in the file
-        return len(self.valid_entries)
+        #Return the number of entries which passed the filter
+        return self.__total_requests
 
     def get_total_unique_ip(self) -> int:
+        return self.__aggregators["top_ips"].get_total_unique()
+
+    def get_approximation_errors(self) -> dict:
+        """
+        Returns the error bounds of the approximate statistics.
+        The bounds can be a bit tighter than the ones asked, they are
+        rounded to the precision of the estimators.
+
+        Returns:
+            dict: The relative standard error of the number of unique IPs,
+            and the maximum overestimation of the counts of the top IPs and URLs
+            (fraction of the requests and number of requests).
+        """
+        errors = self.__aggregators["top_ips"].get_errors(self.__total_requests)
+        return {
+            "unique_ip_relative_error": errors["unique_relative_error"],
+            "top_items_error": errors["top_error"],
+            "top_items_max_overestimation": errors["top_max_overestimation"]
+        }
 
-        unique_ip_count = Counter(entry.client_info.client_ip for entry in self.valid_entries)
-        return len(unique_ip_count.keys())
-    
     def get_top_ips(self, top_n: int) -> dict:
         """
         Returns the top 'n' IPs with the most requests.
@@ -102,17 +250,13 @@ class ApacheLogAnalyser:
         Returns:
             list: A sorted list of tuples, each containing an IP and the number of requests.
         """
-        ips = [entry.client_info.client_ip for entry in self.valid_entries]
-        return self.__get_top_items(ips, "ip", top_n)
+        return self.__aggregators["top_ips"].get_top(top_n, self.__total_requests)
 
     def get_http_method_rate(self) -> dict:
-        http_methods = [entry.request_info.method for entry in self.valid_entries]
-        http_methods_rate = self.__get_items_rate(http_methods, "method")
-        return http_methods_rate
+        return self.__aggregators["http_method_rate"].get_rate(self.__total_requests)
 
     def get_top_urls(self, top_n: int) -> dict:
-        urls = [entry.request_info.url for entry in self.valid_entries]
-        return self.__get_top_items(urls, "url", top_n)
+        return self.__aggregators["top_urls"].get_top(top_n, self.__total_requests)
 
     def get_status_code_rate(self) -> list:
         """
@@ -121,9 +265,7 @@ class ApacheLogAnalyser:
         Returns:
             list: A sorted list of dict containing the status code and its request count.
         """
-        status_code = [entry.response_info.status_code for entry in self.valid_entries]
-        status_code_rate = self.__get_items_rate(status_code, "code")
-        return sorted(status_code_rate, key=lambda x: x["code"])
+        return self.__aggregators["status_code_rate"].get_rate(self.__total_requests)
 
     def get_status_code_classes_rate(self) -> dict:
         """
@@ -132,26 +274,34 @@ class ApacheLogAnalyser:
         Returns:
             dict: A dict containing the request count and the percent for each classes.
         """
-        classes = [entry.response_info.get_status_code_class() for entry in self.valid_entries]
-        classes_rate = self.__get_items_rate(classes, "class")
-        return sorted(classes_rate, key= lambda x: x["class"], reverse=True)
+        return self.__aggregators["status_code_rate"].get_classes_rate(self.__total_requests)
 
     def get_browser_rate(self) -> dict:
-        browsers = [entry.metadata_info.get_browser() for entry in self.valid_entries]
-        return self.__get_items_rate(browsers, "browser")
-    
+        return self.__aggregators["browser_rate"].get_rate(self.__total_requests)
+
     def get_os_rate(self) -> dict:
-        os = [entry.metadata_info.get_os() for entry in self.valid_entries]
-        return self.__get_items_rate(os, "os")
-    
+        return self.__aggregators["os_rate"].get_rate(self.__total_requests)
+
     def get_type_device_rate(self) -> dict:
-        devices = [entry.metadata_info.get_type_device() for entry in self.valid_entries]
-        return self.__get_items_rate(devices, "type_device")
-    
+        return self.__aggregators["type_device_rate"].get_rate(self.__total_requests)
+
     def get_bot_rate(self) -> dict:
-        total_requests = self.get_total_requests()
-        bots_count = 0
-        for entry in self.valid_entries:
-            if entry.metadata_info.is_bot():
-                bots_count += 1
-        return {"total": bots_count, "percent": bots_count / total_requests * 100}
\ No newline at end of file
+        return self.__aggregators["bot_rate"].get_bot_rate(self.__total_requests)
+
+    def get_traffic(self) -> list:
+        """
+        Returns the requests, the bytes sent and the errors by period of time (see bucket_size).
+
+        Returns:
+            list: The dicts of the periods, in chronological order.
+        """
+        return self.__aggregators["buckets"].get_buckets()
+
+    def get_response_size_percentiles(self) -> dict:
+        """
+        Returns the estimated p50, p95 and p99 of the size of the responses.
+
+        Returns:
+            dict: The sizes in bytes, by percentile.
+        """
+        return self.__aggregators["percentiles"].get_percentiles()
@@ -0,0 +1,118 @@
+import os
+import json
+from hashlib import blake2b
+from analysis.apache_log_analyser import ApacheLogAnalyser
+from export.atomic_file import open_atomic
+
+class CheckpointException(Exception):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+
+class ApacheLogCheckpoint:
+    """
+    Class for saving and resuming the analysis of a log file which only grows.
+
+    The state file keeps the byte offset where the last analysis stopped,
+    the identity of the log file (device, inode, size and a fingerprint of
+    its first bytes) and the counters of the analyser. The next analysis
+    resumes at the saved offset and only parses the new lines. If the log
+    file was rotated or truncated, or if the filter or the statistics changed,
+    the analysis starts over from the beginning of the file.
+
+    Attributes:
+        state_path (str): The path of the state file.
+        resumed (bool): True if the last load resumed a saved analysis.
+    """
+
+    VERSION = 2
+
+    # Number of bytes at the start of the log file used to detect a truncation
+    FINGERPRINT_SIZE = 1024
+
+    def __init__(self, state_path: str):
+        absolute_path = os.path.abspath(state_path)
+        parent_directory = os.path.dirname(absolute_path)
+        if not os.path.isdir(parent_directory):
+            raise CheckpointException(f"The directory {parent_directory} doesn't exist.")
+        if not os.access(parent_directory, os.W_OK):
+            raise CheckpointException(f"No right to write in the directory {parent_directory}")
+        self.state_path = absolute_path
+        self.resumed = False
+
+    def load(self, log_path: str, analyser: ApacheLogAnalyser) -> int:
+        """
+        Loads the saved counters in the analyser if they are still valid for the log file.
+
+        Args:
+            log_path (str): The path of the log file.
+            analyser (ApacheLogAnalyser): An empty analyser, with the filter and the statistics of the run.
+
+        Returns:
+            int: The byte offset where the analysis must resume (0 to start over).
+        """
+        self.resumed = False
+        try:
+            with open(self.state_path, 'r') as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(state, dict) or state.get("version") != self.VERSION \
+                or "file" not in state or "analyser" not in state:
+            return 0
+        if state.get("config") != self.__get_config(analyser):
+            return 0
+        offset = state["offset"]
+        saved_identity = state["file"]
+        identity = self.__get_identity(log_path, offset)
+        # The file was rotated (other file) or truncated (smaller or other first bytes)
+        if (identity["device"], identity["inode"]) != (saved_identity["device"], saved_identity["inode"]):
+            return 0
+        if identity["size"] < saved_identity["size"] or identity["size"] < offset:
+            return 0
+        if identity["fingerprint"] != saved_identity["fingerprint"]:
+            return 0
+        analyser.load_state(state["analyser"])
+        self.resumed = True
+        return offset
+
+    def save(self, log_path: str, analyser: ApacheLogAnalyser, offset: int):
+        """
+        Saves the counters of the analyser and the offset where the analysis stopped.
+        The state file is replaced atomically.
+
+        Args:
+            log_path (str): The path of the log file.
+            analyser (ApacheLogAnalyser): The analyser of the file until the offset.
+            offset (int): The byte offset after the last line analysed.
+        """
+        state = {
+            "version": self.VERSION,
+            "config": self.__get_config(analyser),
+            "offset": offset,
+            "file": self.__get_identity(log_path, offset),
+            "analyser": analyser.get_state()
+        }
+        with open_atomic(self.state_path) as file:
+            json.dump(state, file)
+
+    def __get_config(self, analyser: ApacheLogAnalyser) -> dict:
+        return {
+            "path": os.path.abspath(analyser.file.path),
+            "filter": repr(analyser.filter.to_dict()),
+            "stats": list(analyser.stats),
+            "approximation": analyser.approximation,
+            "bucket_size": analyser.bucket_size
+        }
+
+    def __get_identity(self, log_path: str, offset: int) -> dict:
+        stat = os.stat(log_path)
+        fingerprint = blake2b(digest_size=16)
+        with open(log_path, 'rb') as file:
+            fingerprint.update(file.read(min(offset, self.FINGERPRINT_SIZE)))
+        return {
+            "device": stat.st_dev,
+            "inode": stat.st_ino,
+            "size": stat.st_size,
+            "fingerprint": fingerprint.hexdigest()
+        }
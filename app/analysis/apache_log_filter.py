@@ -1,38 +1,371 @@
-
-from datetime import datetime
+from calendar import timegm
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional, Tuple, Union
 from parse.apache_log_entry import ApacheLogEntry
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_log_columnar_file import ApacheLogColumnarFile, MISSING_OFFSET, MISSING_VALUE
 
 
 class ApacheLogFilter:
+    """
+    Class for filtering the entries of an Apache log file.
+
+    The filter is compiled into a list of predicates, one for each active
+    criterion, so pass_filter only runs the checks which are needed.
+    pass_raw_line can also reject a raw line before it is parsed, using
+    cheap text checks confirmed by the pattern of the parser: the lines it
+    keeps must still go through pass_filter.
+    get_columnar_indices selects the entries of a columnar file on its
+    columns, without building the entries.
+
+    Every criterion accepts a single value or several values (the entry
+    must match one of them):
+        - status_code: a code (404) or a range of codes ((400, 499)).
+        - timestamp: a datetime (the whole day) or a range (start, end), end excluded.
+          The dates are compared with the local time written in the log.
+        - client_ip: an IP.
+        - request_method: an HTTP method.
+        - url_prefix: the beginning of the URL.
+    """
 
-    def __init__(self, status_code: int, 
-                 timestamp: datetime, 
-                 client_ip: str, 
-                 request_method: str):
+    # Fields of the raw lines checked by pass_raw_line
+    RAW_LINE_FIELDS = ("ip", "method", "url", "status")
+
+    def __init__(self, status_code: Union[int, Tuple[int, int], Iterable, None],
+                 timestamp: Union[datetime, Tuple[datetime, datetime], None],
+                 client_ip: Union[str, Iterable[str], None],
+                 request_method: Union[str, Iterable[str], None],
+                 url_prefix: Union[str, Iterable[str], None] = None):
         self.filter_status_code = status_code
         self.filter_timestamp = timestamp
         self.filter_client_ip = client_ip
         self.filter_request_method = request_method
+        self.filter_url_prefix = url_prefix
+        self.__compile()
 
-    def pass_filter(self, entry: ApacheLogEntry) -> bool:
+    def __getstate__(self):
+        # The compiled predicates are bound methods, they are rebuilt after unpickling
+        state = self.__dict__.copy()
+        del state["_ApacheLogFilter__predicates"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__compile()
+
+    @staticmethod
+    def __as_tuple(values) -> Optional[tuple]:
+        if not values:
+            return None
+        if isinstance(values, (str, int, datetime)):
+            return (values,)
+        return tuple(values)
+
+    def __compile(self):
+        self.__status_ranges = None
         if self.filter_status_code:
-            if self.filter_status_code != entry.response_info.status_code:
-                return False
+            status_codes = self.filter_status_code
+            if isinstance(status_codes, tuple) and len(status_codes) == 2 \
+                    and all(isinstance(code, int) for code in status_codes):
+                status_codes = (status_codes,)
+            self.__status_ranges = tuple(
+                (code, code) if isinstance(code, int) else tuple(code)
+                for code in self.__as_tuple(status_codes)
+            )
+        self.__date_range = None
         if self.filter_timestamp:
-            if self.filter_timestamp != entry.request_info.timestamp:
+            if isinstance(self.filter_timestamp, datetime):
+                day = self.filter_timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+                self.__date_range = (day, day + timedelta(days=1))
+            else:
+                self.__date_range = tuple(self.filter_timestamp)
+        self.__client_ips = self.__as_tuple(self.filter_client_ip)
+        self.__client_ips = frozenset(self.__client_ips) if self.__client_ips else None
+        self.__request_methods = self.__as_tuple(self.filter_request_method)
+        self.__request_methods = frozenset(self.__request_methods) if self.__request_methods else None
+        self.__url_prefixes = self.__as_tuple(self.filter_url_prefix)
+        # Encoded values for the check of the raw lines not decoded
+        self.__raw_bytes_values = (
+            frozenset(ip.encode() for ip in self.__client_ips) if self.__client_ips else None,
+            frozenset(method.encode() for method in self.__request_methods) if self.__request_methods else None,
+            tuple(prefix.encode() for prefix in self.__url_prefixes) if self.__url_prefixes else None
+        )
+        # Patterns of the parser confirming the rejection of the raw lines, decoded or not
+        self.__raw_patterns = tuple(ApacheLogParser.get_pattern(self.RAW_LINE_FIELDS, binary)
+                                    for binary in (False, True))
+        # The cheapest checks run first
+        self.__predicates = []
+        if self.__client_ips:
+            self.__predicates.append(self.__pass_client_ip)
+        if self.__request_methods:
+            self.__predicates.append(self.__pass_request_method)
+        if self.__status_ranges:
+            self.__predicates.append(self.__pass_status_code)
+        if self.__url_prefixes:
+            self.__predicates.append(self.__pass_url_prefix)
+        if self.__date_range:
+            self.__predicates.append(self.__pass_timestamp)
+
+    def __pass_client_ip(self, entry: ApacheLogEntry) -> bool:
+        return entry.client_info.client_ip in self.__client_ips
+
+    def __pass_request_method(self, entry: ApacheLogEntry) -> bool:
+        return entry.request_info.method in self.__request_methods
+
+    def __pass_status_code(self, entry: ApacheLogEntry) -> bool:
+        status_code = entry.response_info.status_code
+        return status_code is not None and self.__pass_status_code_value(status_code)
+
+    def __pass_status_code_value(self, status_code: int) -> bool:
+        for low, high in self.__status_ranges:
+            if low <= status_code <= high:
+                return True
+        return False
+
+    def __pass_url_prefix(self, entry: ApacheLogEntry) -> bool:
+        url = entry.request_info.url
+        return url is not None and url.startswith(self.__url_prefixes)
+
+    def __pass_timestamp(self, entry: ApacheLogEntry) -> bool:
+        timestamp = entry.request_info.timestamp
+        if timestamp is None:
+            return False
+        start, end = self.__date_range
+        return start <= timestamp.replace(tzinfo=None) < end
+
+    def pass_filter(self, entry: ApacheLogEntry) -> bool:
+        for predicate in self.__predicates:
+            if not predicate(entry):
                 return False
+        return True
+
+    def get_date_range(self) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Returns the range of dates of the filter.
+
+        Returns:
+            Optional[Tuple[datetime, datetime]]: The start and the end (excluded) in local time,
+            None if the entries are not filtered by date.
+        """
+        return self.__date_range
+
+    def get_raw_line_filter(self) -> Optional[Callable[[Union[str, bytes]], bool]]:
+        """
+        Returns the check to run on the raw lines before they are parsed.
+
+        Returns:
+            Optional[Callable[[Union[str, bytes]], bool]]: pass_raw_line, or None if it can't reject any line.
+        """
+        if self.__client_ips or self.__request_methods or self.__status_ranges or self.__url_prefixes:
+            return self.pass_raw_line
+        return None
+
+    def pass_raw_line(self, line: Union[str, bytes]) -> bool:
+        """
+        Checks a raw line of the log before it is parsed.
+        The check is conservative: a line is only rejected if it surely
+        doesn't pass the filter, the lines kept must still be checked
+        with pass_filter once parsed. The cheap text checks only find the
+        candidates: a line is rejected once it is matched by the pattern of
+        the parser, so the malformed lines are kept and the parser raises
+        an InvalidFormatApacheLogException for them.
+
+        Args:
+            line (Union[str, bytes]): The raw line, decoded or not.
+
+        Returns:
+            bool: False if the line can be rejected.
+        """
+        if isinstance(line, str):
+            client_ips, request_methods, url_prefixes = \
+                self.__client_ips, self.__request_methods, self.__url_prefixes
+            space, request_separator, status_separator, no_request = " ", '] "', '" ', '-"'
+        else:
+            client_ips, request_methods, url_prefixes = self.__raw_bytes_values
+            space, request_separator, status_separator, no_request = b" ", b'] "', b'" ', b'-"'
+        # The IP is the first token of the line
+        if client_ips:
+            if line[:line.find(space)] not in client_ips:
+                return self.__pass_matched_line(line, "ip", client_ips)
+        if not (request_methods or self.__status_ranges or url_prefixes):
+            return True
+        # The request starts after the timestamp: '] "METHOD URL PROTOCOL"'
+        request_start = line.find(request_separator)
+        if request_start == -1:
+            return True
+        request_start += 3
+        if request_methods or url_prefixes:
+            if line.startswith(no_request, request_start):
+                # A request "-" has no method nor URL
+                if request_methods:
+                    return self.__pass_matched_line(line, "method", request_methods)
+                return self.__pass_matched_line(line, "url", url_prefixes)
+            method_end = line.find(space, request_start)
+            if method_end == -1:
+                return True
+            if request_methods:
+                if line[request_start:method_end] not in request_methods:
+                    return self.__pass_matched_line(line, "method", request_methods)
+            if url_prefixes:
+                if not line.startswith(url_prefixes, method_end + 1):
+                    return self.__pass_matched_line(line, "url", url_prefixes)
+        if self.__status_ranges:
+            # The status code follows the end of the request: '" 404 '
+            status_start = line.find(status_separator, request_start) + 2
+            status = line[status_start:status_start + 3]
+            if status_start > 1 and status.isdigit() and line[status_start + 3:status_start + 4] == space:
+                if not self.__pass_status_code_value(int(status)):
+                    return self.__pass_matched_line(line, "status", None)
+        return True
+
+    def __pass_matched_line(self, line: Union[str, bytes], field: str, values) -> bool:
+        # A line rejected by the text checks is matched like the parser does: it is
+        # only rejected if it is well-formed and the field matched doesn't pass either
+        matched = self.__raw_patterns[not isinstance(line, str)].match(line)
+        if not matched:
+            return True
+        value = matched.group(field)
+        if field == "status":
+            return self.__pass_status_code_value(int(value))
+        if field == "url":
+            return value is not None and value.startswith(values)
+        return value in values
+
+    def get_columnar_indices(self, file: ApacheLogColumnarFile) -> Iterable[int]:
+        """
+        Returns the indices of the entries of a columnar file which pass the filter.
+        The criteria are checked on the columns: the strings are compared by
+        their codes and the dates on the integer timestamps (local time).
+
+        Args:
+            file (ApacheLogColumnarFile): The file with its entries stored column-wise.
+
+        Returns:
+            Iterable[int]: The indices of the entries, in the order of the file.
+        """
+        indices = range(len(file.entries))
+        for values, column in ((self.__client_ips, file.client_ips), (self.__request_methods, file.methods)):
+            if values:
+                codes = {column.get_code(value) for value in values}
+                codes.discard(None)
+                column_codes = column.codes
+                indices = [index for index in indices if column_codes[index] in codes]
+        if self.__status_ranges:
+            column = file.status_codes
+            if all(high - low <= 1000 for low, high in self.__status_ranges):
+                # The status codes passing the filter, the missing ones (-1) never pass
+                status_codes = {code for low, high in self.__status_ranges for code in range(low, high + 1)}
+                indices = [index for index in indices if column[index] in status_codes]
+            else:
+                pass_status_code = self.__pass_status_code_value
+                indices = [index for index in indices
+                           if column[index] != MISSING_VALUE and pass_status_code(column[index])]
+        if self.__url_prefixes:
+            urls = file.urls.values
+            codes = {code for code in range(1, len(urls)) if urls[code].startswith(self.__url_prefixes)}
+            column_codes = file.urls.codes
+            indices = [index for index in indices if column_codes[index] in codes]
+        if self.__date_range:
+            # Local time of the entries in seconds, compared with the range in local time
+            start, end = (timegm(date.timetuple()) for date in self.__date_range)
+            timestamps, offsets = file.timestamps, file.timezone_offsets
+            indices = [
+                index for index in indices
+                if offsets[index] != MISSING_OFFSET and start <= timestamps[index] + offsets[index] < end
+            ]
+        return indices
+
+    def get_columnar_mask(self, file: ApacheLogColumnarFile):
+        """
+        Returns the mask of the entries of a columnar file which pass the filter,
+        computed with NumPy on whole columns (see ApacheLogNumpyBackend).
+        The criteria are checked like get_columnar_indices.
+
+        Args:
+            file (ApacheLogColumnarFile): The file with its entries stored column-wise.
+
+        Returns:
+            numpy.ndarray: The booleans of the entries, in the order of the file.
+        """
+        import numpy
+        mask = numpy.ones(len(file.entries), dtype=bool)
+        for values, column in ((self.__client_ips, file.client_ips), (self.__request_methods, file.methods)):
+            if values:
+                # Lookup table of the codes passing the filter
+                passing = numpy.zeros(len(column.values), dtype=bool)
+                for value in values:
+                    code = column.get_code(value)
+                    if code is not None:
+                        passing[code] = True
+                mask &= passing[numpy.asarray(column.codes)]
+        if self.__status_ranges:
+            status_codes = numpy.asarray(file.status_codes)
+            passing = numpy.zeros(len(mask), dtype=bool)
+            for low, high in self.__status_ranges:
+                passing |= (status_codes >= low) & (status_codes <= high) & (status_codes != MISSING_VALUE)
+            mask &= passing
+        if self.__url_prefixes:
+            urls = file.urls.values
+            passing = numpy.zeros(len(urls), dtype=bool)
+            for code in range(1, len(urls)):
+                if urls[code].startswith(self.__url_prefixes):
+                    passing[code] = True
+            mask &= passing[numpy.asarray(file.urls.codes)]
+        if self.__date_range:
+            # Local time of the entries in seconds, compared with the range in local time
+            start, end = (timegm(date.timetuple()) for date in self.__date_range)
+            offsets = numpy.asarray(file.timezone_offsets)
+            local_timestamps = numpy.asarray(file.timestamps) + offsets
+            mask &= (offsets != MISSING_OFFSET) & (local_timestamps >= start) & (local_timestamps < end)
+        return mask
+
+    def get_required_fields(self) -> set:
+        """
+        Returns the fields of the entries needed to apply the filter.
+
+        Returns:
+            set: The names of the fields (see ApacheLogParser.FIELDS).
+        """
+        fields = set()
+        if self.filter_status_code:
+            fields.add("status")
+        if self.filter_timestamp:
+            fields.add("timestamp")
         if self.filter_client_ip:
-            if self.filter_client_ip != entry.client_info.client_ip:
-                return False
+            fields.add("ip")
         if self.filter_request_method:
-            if self.filter_request_method != entry.request_info.method:
-                return False
-        return True
-    
+            fields.add("method")
+        if self.filter_url_prefix:
+            fields.add("url")
+        return fields
+
     def to_dict(self):
         return {
             "status_code": self.filter_status_code,
             "timestamp": self.filter_timestamp,
             "client_ip": self.filter_client_ip,
-            "request_method": self.filter_request_method
-        }
\ No newline at end of file
+            "request_method": self.filter_request_method,
+            "url_prefix": self.filter_url_prefix
+        }
+
+    @classmethod
+    def from_dict(cls, criteria: dict) -> "ApacheLogFilter":
+        """
+        Creates a filter from the criteria returned by to_dict, also once written
+        in JSON (the dates in the ISO 8601 format and the tuples as lists).
+
+        Args:
+            criteria (dict): The criteria of the filter, by name.
+
+        Returns:
+            ApacheLogFilter: The filter.
+        """
+        status_code = criteria["status_code"]
+        if isinstance(status_code, list):
+            status_code = [tuple(code) if isinstance(code, list) else code for code in status_code]
+        timestamp = criteria["timestamp"]
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        elif timestamp:
+            timestamp = tuple(datetime.fromisoformat(date) if isinstance(date, str) else date for date in timestamp)
+        return cls(status_code, timestamp, criteria["client_ip"], criteria["request_method"], criteria["url_prefix"])
@@ -0,0 +1,148 @@
+from typing import Any, Callable, Optional
+from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_columnar_file import ApacheLogColumnarFile, StringColumn, MISSING_OFFSET, MISSING_VALUE
+from data.metadata_info import MetadataInfo
+from analysis.apache_log_analyser import ApacheLogAnalyser
+from analysis.dd_sketch import DDSketch
+from analysis.apache_log_aggregators import (ApacheLogAggregator, ItemsRateAggregator, TopItemsAggregator,
+                                             BotRateAggregator, TrafficAggregator, ResponseSizeAggregator)
+
+
+class ApacheLogNumpyBackend:
+    """
+    Class for analysing the entries of a columnar file with NumPy, on whole columns.
+
+    The columns of an ApacheLogColumnarFile are viewed as NumPy arrays without
+    copy: the filter is a boolean mask (see ApacheLogFilter.get_columnar_mask)
+    and the statistics are computed with np.unique and sums over the selected
+    rows instead of updating the aggregators entry by entry. The strings are
+    only handled through their codes, the user agents are only parsed once
+    per distinct value.
+
+    The vectorized statistics are loaded in the aggregators of the analyser
+    (see ApacheLogAggregator.load_state) with the same items in the same order
+    (first occurrence), so the results are the same as the pure Python analysis.
+    The aggregators without vectorized version (the approximate ones and the
+    ones registered without column) are still updated entry by entry.
+
+    NumPy is an optional dependency, it is only imported by this backend.
+    """
+
+    def __init__(self):
+        import numpy
+        self.__numpy = numpy
+
+    @staticmethod
+    def is_available() -> bool:
+        """
+        Returns True if NumPy can be imported.
+        """
+        try:
+            import numpy
+        except ImportError:
+            return False
+        return True
+
+    def analyse_file(self, file: ApacheLogColumnarFile, analyser: ApacheLogAnalyser):
+        """
+        Updates the statistics of an analyser with the entries of a columnar file which pass its filter.
+
+        Args:
+            file (ApacheLogColumnarFile): The file with its entries stored column-wise.
+            analyser (ApacheLogAnalyser): The analyser updated.
+        """
+        numpy = self.__numpy
+        rows = numpy.flatnonzero(analyser.filter.get_columnar_mask(file))
+        # The statistics of the file are computed in a new analyser then merged,
+        # in the order of the files
+        file_analyser = ApacheLogAnalyser(ApacheLogFile(file.path), analyser.filter, analyser.stats,
+                                          analyser.approximation, analyser.bucket_size)
+        state = file_analyser.get_state()
+        state["total_entries"] = len(file.entries)
+        state["total_requests"] = len(rows)
+        fallback_aggregators = []
+        for aggregator in file_analyser.get_aggregators():
+            aggregator_state = self.__get_state(aggregator, file, rows)
+            if aggregator_state is None:
+                fallback_aggregators.append(aggregator)
+            else:
+                state["aggregators"][aggregator.name] = aggregator_state
+        file_analyser.load_state(state)
+        if fallback_aggregators:
+            updates = [aggregator.update for aggregator in fallback_aggregators]
+            for entry in file.get_entries(rows.tolist()):
+                for update in updates:
+                    update(entry)
+        analyser.merge(file_analyser)
+
+    def __get_state(self, aggregator: ApacheLogAggregator, file: ApacheLogColumnarFile, rows) -> Optional[Any]:
+        if isinstance(aggregator, ItemsRateAggregator) and aggregator.column is not None:
+            return self.__count_items(file, aggregator.column, rows, aggregator.column_key)
+        if isinstance(aggregator, TopItemsAggregator) and aggregator.column is not None \
+                and aggregator.approximation is None:
+            return self.__count_items(file, aggregator.column, rows)
+        if isinstance(aggregator, BotRateAggregator):
+            return sum(count for user_agent, count in self.__count_values(file.user_agents, rows)
+                       if MetadataInfo(None, user_agent).is_bot())
+        if isinstance(aggregator, TrafficAggregator):
+            return self.__get_traffic_state(file, rows, aggregator.bucket_size)
+        if isinstance(aggregator, ResponseSizeAggregator):
+            return self.__get_response_size_state(file, rows, aggregator.get_state())
+        return None
+
+    def __count_values(self, column, rows) -> list:
+        """
+        Returns the distinct values of a column in the selected rows with their
+        number of rows, in the order of their first occurrence.
+        """
+        numpy = self.__numpy
+        codes = numpy.asarray(column.codes if isinstance(column, StringColumn) else column)[rows]
+        unique_codes, first_rows, counts = numpy.unique(codes, return_index=True, return_counts=True)
+        order = numpy.argsort(first_rows, kind="stable")
+        unique_codes = unique_codes[order].tolist()
+        counts = counts[order].tolist()
+        if isinstance(column, StringColumn):
+            values = column.values
+            return [(values[code], count) for code, count in zip(unique_codes, counts)]
+        # Integer column, the missing values are None
+        return [(value if value != MISSING_VALUE else None, count) for value, count in zip(unique_codes, counts)]
+
+    def __count_items(self, file: ApacheLogColumnarFile, column: str, rows,
+                      column_key: Optional[Callable[[Any], Any]] = None) -> list:
+        # State of the counters: [item, count] pairs in the order of first occurrence
+        counts = {}
+        for value, count in self.__count_values(getattr(file, column), rows):
+            item = column_key(value) if column_key is not None else value
+            counts[item] = counts.get(item, 0) + count
+        return [[item, count] for item, count in counts.items()]
+
+    def __get_traffic_state(self, file: ApacheLogColumnarFile, rows, bucket_size: int) -> list:
+        numpy = self.__numpy
+        offsets = numpy.asarray(file.timezone_offsets)[rows]
+        dated = offsets != MISSING_OFFSET
+        local_timestamps = numpy.asarray(file.timestamps)[rows][dated] + offsets[dated]
+        starts = local_timestamps - local_timestamps % bucket_size
+        sizes = numpy.asarray(file.response_sizes)[rows][dated]
+        errors = numpy.asarray(file.status_codes)[rows][dated] >= 400
+        unique_starts, first_rows, inverse = numpy.unique(starts, return_index=True, return_inverse=True)
+        requests = numpy.bincount(inverse, minlength=len(unique_starts))
+        errors = numpy.bincount(inverse[errors], minlength=len(unique_starts))
+        # Integer sums of the sizes (a bincount with weights would sum floats)
+        bytes_sent = numpy.zeros(len(unique_starts), dtype=numpy.int64)
+        numpy.add.at(bytes_sent, inverse, numpy.maximum(sizes, 0))
+        order = numpy.argsort(first_rows, kind="stable")
+        return [
+            [start, count, size, error]
+            for start, count, size, error in zip(unique_starts[order].tolist(), requests[order].tolist(),
+                                                 bytes_sent[order].tolist(), errors[order].tolist())
+        ]
+
+    def __get_response_size_state(self, file: ApacheLogColumnarFile, rows, empty_state: dict) -> dict:
+        numpy = self.__numpy
+        # The responses without body ("-") have a size of 0
+        sizes = numpy.maximum(numpy.asarray(file.response_sizes)[rows], 0)
+        unique_sizes, counts = numpy.unique(sizes, return_counts=True)
+        sketch = DDSketch(empty_state["sizes"]["relative_accuracy"])
+        for size, count in zip(unique_sizes.tolist(), counts.tolist()):
+            sketch.add(size, count)
+        return {"total_bytes": int(sizes.sum()), "sizes": sketch.get_state()}
@@ -0,0 +1,143 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple, Union
+from data.metadata_info import MetadataInfo
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_log_file import ApacheLogFile
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser, BUCKET_SIZES
+
+
+def analyse_chunk(path: str,
+                  start: int,
+                  end: Optional[int],
+                  apache_log_filter: ApacheLogFilter,
+                  stats: Optional[Iterable[str]] = None,
+                  engine: str = "text",
+                  approximation: Optional[dict] = None,
+                  bucket_size: int = BUCKET_SIZES["hour"]) -> Tuple[ApacheLogAnalyser, int, int, int]:
+    """
+    Analyses a byte range of an Apache log file.
+    Runs in a worker process, the returned analyser only holds counters.
+
+    Args:
+        path (str): The path of the file.
+        start (int): The byte offset of the first line of the range.
+        end (Optional[int]): The byte offset of the end of the range (end of file if None).
+        apache_log_filter (ApacheLogFilter): The filter applied on the entries.
+        stats (Optional[Iterable[str]]): The sections of statistics computed (DEFAULT_STATISTICS if None).
+        engine (str): The engine reading the lines (see ApacheLogParser.ENGINES).
+        approximation (Optional[dict]): The error bounds of the approximate statistics (exact if None).
+        bucket_size (int): The duration of the buckets of the traffic, in seconds.
+
+    Returns:
+        Tuple[ApacheLogAnalyser, int, int, int]: The partial analysis of the range,
+        the number of lines read, and the hits and misses of the user agent cache
+        during the analysis.
+    """
+    cache_info = MetadataInfo.get_cache_info()
+    parser = ApacheLogParser(path,
+                             ApacheLogAnalyser.get_required_fields(apache_log_filter, stats),
+                             apache_log_filter.get_raw_line_filter(),
+                             engine)
+    analyser = ApacheLogAnalyser(ApacheLogFile(path), apache_log_filter, stats, approximation, bucket_size)
+    analyser.analyse_entries(parser.get_entries(start, end))
+    new_cache_info = MetadataInfo.get_cache_info()
+    return (analyser,
+            parser.total_lines,
+            new_cache_info.hits - cache_info.hits,
+            new_cache_info.misses - cache_info.misses)
+
+
+class ApacheLogParallelAnalyser:
+    """
+    Class for analysing Apache log files with several processes.
+
+    The uncompressed files are split in newline-aligned byte ranges, the
+    compressed files are analysed by one worker each (they are decompressed
+    in the worker). Only the offsets of the ranges are sent to the workers.
+    With the mmap engine, each worker maps the file and parses its range in place.
+    Each range or file is parsed and analysed in a process pool, then the
+    partial analyses are merged in the order of the files.
+
+    Attributes:
+        paths (List[str]): The paths of the files.
+        filter (ApacheLogFilter): The filter applied on the entries.
+        workers (int): The number of worker processes.
+        stats (Optional[Iterable[str]]): The sections of statistics computed (DEFAULT_STATISTICS if None).
+        engine (str): The engine reading the lines (see ApacheLogParser.ENGINES).
+        approximation (Optional[dict]): The error bounds of the approximate statistics (exact if None).
+        bucket_size (int): The duration of the buckets of the traffic, in seconds.
+        seek_tolerance (Optional[int]): If given, only the byte range of the date filter is read in
+            the uncompressed files (see ApacheLogParser.get_date_range_offsets), with this tolerance in seconds.
+        total_lines (int): The number of lines read by all the workers.
+        cache_hits (int): The hits of the user agent cache in all the workers.
+        cache_misses (int): The misses of the user agent cache in all the workers.
+    """
+
+    def __init__(self,
+                 paths: Union[str, List[str]],
+                 apache_log_filter: ApacheLogFilter,
+                 workers: int,
+                 stats: Optional[Iterable[str]] = None,
+                 engine: str = "text",
+                 approximation: Optional[dict] = None,
+                 bucket_size: int = BUCKET_SIZES["hour"],
+                 seek_tolerance: Optional[int] = None):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.filter = apache_log_filter
+        self.workers = workers
+        self.stats = stats
+        self.engine = engine
+        self.approximation = approximation
+        self.bucket_size = bucket_size
+        self.seek_tolerance = seek_tolerance
+        self.total_lines = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __get_tasks(self, start: int, end: Optional[int]) -> list:
+        tasks = []
+        # The workers are shared between the uncompressed files
+        chunks_per_file = max(1, self.workers // len(self.paths))
+        date_range = self.filter.get_date_range() if self.seek_tolerance is not None else None
+        for path in self.paths:
+            if ApacheLogParser.is_compressed(path):
+                tasks.append((path, 0, None))
+                continue
+            parser = ApacheLogParser(path)
+            file_start, file_end = (start, end) if len(self.paths) == 1 else (0, None)
+            if date_range is not None:
+                # Only the lines of the dates of the filter are split between the workers
+                file_start, file_end = parser.get_date_range_offsets(*date_range, self.seek_tolerance)
+            chunks = self.workers if len(self.paths) == 1 else chunks_per_file
+            tasks.extend((path, chunk_start, chunk_end)
+                         for chunk_start, chunk_end in parser.get_chunks(chunks, file_start, file_end))
+        return tasks
+
+    def get_analyser(self, start: int = 0, end: Optional[int] = None) -> ApacheLogAnalyser:
+        """
+        Analyses the files and returns the merged analyser.
+
+        Args:
+            start (int): The byte offset of the first line to analyse (single uncompressed file only).
+            end (Optional[int]): The byte offset where the analysis stops (end of file if None).
+
+        Returns:
+            ApacheLogAnalyser: The analyser of the files.
+        """
+        analyser = ApacheLogAnalyser(ApacheLogFile(self.paths[0]), self.filter, self.stats,
+                                     self.approximation, self.bucket_size)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(analyse_chunk, path, chunk_start, chunk_end,
+                                self.filter, self.stats, self.engine, self.approximation, self.bucket_size)
+                for path, chunk_start, chunk_end in self.__get_tasks(start, end)
+            ]
+            # Merge in the order of the files to keep the same order of the items
+            for future in futures:
+                partial_analyser, total_lines, cache_hits, cache_misses = future.result()
+                analyser.merge(partial_analyser)
+                self.total_lines += total_lines
+                self.cache_hits += cache_hits
+                self.cache_misses += cache_misses
+        return analyser
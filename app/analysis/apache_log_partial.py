@@ -0,0 +1,125 @@
+import json
+from typing import Iterable
+from parse.apache_log_file import ApacheLogFile
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser
+from export.exporter import Exporter
+
+class PartialException(Exception):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+
+class ApacheLogPartial:
+    """
+    Class for exchanging the partial analyses of the logs of several machines.
+
+    The complete analysis only gives the final totals and percents, which can't
+    be combined. A partial keeps the raw state of the analyser instead (exact
+    counters, sketches and summaries of the approximate statistics, traffic
+    buckets and totals, see ApacheLogAnalyser.get_state) with the configuration
+    of the analysis and a version tag. Each machine analyses its own logs and
+    exports a partial (output format partial), then the partials are merged
+    into the final analysis (main.py merge), in a time which only depends on
+    the size of the partials, not on the volume of the logs.
+
+    The partials can only be merged if they were computed with the same filter,
+    statistics, approximation and bucket size. The merge of partials can also
+    be exported as a partial, to merge them by levels.
+    """
+
+    FORMAT = "apache-log-partial"
+
+    VERSION = 1
+
+    @classmethod
+    def get_partial(cls, analyser: ApacheLogAnalyser) -> dict:
+        """
+        Returns the partial of an analyser, JSON serializable (see Exporter).
+
+        Args:
+            analyser (ApacheLogAnalyser): The analyser.
+
+        Returns:
+            dict: The format and version tag, the path of the files, the configuration
+            of the analysis and the state of the analyser.
+        """
+        return {
+            "format": cls.FORMAT,
+            "version": cls.VERSION,
+            "path": analyser.file.path,
+            "config": cls.__get_config(analyser),
+            "analyser": analyser.get_state()
+        }
+
+    @staticmethod
+    def __get_config(analyser: ApacheLogAnalyser) -> dict:
+        return {
+            # The filter as written in JSON, so the partials read from files can be compared
+            "filter": json.loads(Exporter.encode(analyser.filter.to_dict())),
+            "stats": list(analyser.stats),
+            "approximation": analyser.approximation,
+            "bucket_size": analyser.bucket_size
+        }
+
+    @classmethod
+    def load(cls, partial_path: str) -> dict:
+        """
+        Reads a partial exported in a file.
+
+        Args:
+            partial_path (str): The path of the file.
+
+        Returns:
+            dict: The partial.
+        """
+        try:
+            with open(partial_path, 'r') as file:
+                partial = json.load(file)
+        except OSError as ex:
+            raise PartialException(f"The partial {partial_path} can't be read: {ex}")
+        except ValueError:
+            raise PartialException(f"The partial {partial_path} isn't valid JSON.")
+        if not isinstance(partial, dict) or partial.get("format") != cls.FORMAT \
+                or not all(key in partial for key in ("path", "config", "analyser")):
+            raise PartialException(f"The file {partial_path} isn't a partial analysis.")
+        if partial.get("version") != cls.VERSION:
+            raise PartialException(f"The version {partial.get('version')} of the partial {partial_path} "
+                                   f"isn't supported (version {cls.VERSION} expected).")
+        return partial
+
+    @classmethod
+    def merge(cls, partials: Iterable[dict]) -> ApacheLogAnalyser:
+        """
+        Merges partials into an analyser, in the order given
+        (the first seen items keep the order of the partials).
+
+        Args:
+            partials (Iterable[dict]): The partials, computed with the same configuration.
+
+        Returns:
+            ApacheLogAnalyser: The analyser of all the files of the partials.
+        """
+        partials = list(partials)
+        if not partials:
+            raise PartialException("No partial to merge.")
+        config = partials[0]["config"]
+        for partial in partials[1:]:
+            for name, value in partial["config"].items():
+                if name == "stats" and sorted(value) == sorted(config["stats"]):
+                    continue
+                if value != config[name]:
+                    raise PartialException(f"The partials can't be merged: different {name}.")
+        # The paths of the files of all the partials
+        paths = []
+        for partial in partials:
+            paths.extend(partial["path"] if isinstance(partial["path"], list) else [partial["path"]])
+        filter = ApacheLogFilter.from_dict(config["filter"])
+        analyser = ApacheLogAnalyser(ApacheLogFile(paths[0] if len(paths) == 1 else paths), filter,
+                                     config["stats"], config["approximation"], config["bucket_size"])
+        for partial in partials:
+            partial_analyser = ApacheLogAnalyser(ApacheLogFile(partial["path"]), filter,
+                                                 config["stats"], config["approximation"], config["bucket_size"])
+            partial_analyser.load_state(partial["analyser"])
+            analyser.merge(partial_analyser)
+        return analyser
@@ -0,0 +1,313 @@
+import sys
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from time import perf_counter, process_time
+from typing import Iterable, Iterator, Optional
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_log_columnar_file import ApacheLogColumnarFile
+from data.metadata_info import MetadataInfo
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak memory isn't measured
+    resource = None
+
+
+class ApacheLogProfiler:
+    """
+    Class for measuring the time and the memory spent in each stage of an analysis.
+
+    The stages are the read of the lines, their parse, the filter, the analyse
+    (the aggregators and the results) and the export. They are interleaved when
+    the entries are streamed, so the profiler runs the analysis by batches of
+    lines: each stage handles a whole batch before the next one, and its wall
+    time, CPU time and number of lines are measured around the batch, without
+    slowing down the analyses which aren't profiled. With the mmap engine the
+    lines are read while they are parsed, the read is counted in the parse.
+    The raw line prefilter of the parser is also counted in the parse.
+
+    The memory of a stage is the growth of the peak resident memory of the
+    process while the stage runs: the stage which allocates the most at once
+    raises the peak, the ones which fit in the memory already used add 0.
+    The peak memory of the whole run is reported once with the totals.
+
+    The profile is written in the exported analysis, so the export stage
+    isn't in the profile: it is measured apart (see get_stage).
+
+    The profiler can also dump the cProfile statistics of the whole run
+    (readable with the pstats module) for a function level detail.
+
+    Attributes:
+        details (bool): Also measure each statistic and the hit rates of the caches.
+        dump_path (Optional[str]): The file where the cProfile statistics are dumped.
+    """
+
+    STAGES = ("read", "parse", "filter", "analyse", "export")
+
+    # Unit of the items handled by each stage
+    UNITS = {"read": "lines", "parse": "lines", "filter": "lines", "analyse": "lines", "export": "bytes"}
+
+    # Number of lines handled by a stage at once
+    BATCH_SIZE = 10000
+
+    def __init__(self, details: bool = False, dump_path: Optional[str] = None):
+        self.details = details
+        self.dump_path = dump_path
+        self.__stages = {stage: self.__new_timing() for stage in self.STAGES}
+        self.__statistics = {}
+        self.__timestamp_cache = {"hits": 0, "misses": 0, "fallbacks": 0}
+        self.__profile = None
+        self.__wall_start = None
+        self.__cpu_start = None
+        self.__wall_time = None
+        self.__cpu_time = None
+
+    @staticmethod
+    def __new_timing() -> dict:
+        return {"wall": 0.0, "cpu": 0.0, "items": 0, "peak_rss_increase": None}
+
+    @staticmethod
+    def get_peak_rss() -> Optional[int]:
+        """
+        Returns the peak resident memory of the process, in KiB.
+
+        Returns:
+            Optional[int]: The peak memory (None if it can't be measured).
+        """
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # In bytes on macOS, in KiB elsewhere
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+    def start(self):
+        """
+        Starts the measure of the whole run (and the cProfile statistics if asked).
+        """
+        if self.dump_path is not None:
+            import cProfile
+            self.__profile = cProfile.Profile()
+            self.__profile.enable()
+        self.__wall_start = perf_counter()
+        self.__cpu_start = process_time()
+
+    def stop(self):
+        """
+        Stops the measure of the whole run and dumps the cProfile statistics if asked.
+        """
+        self.__wall_time = perf_counter() - self.__wall_start
+        self.__cpu_time = process_time() - self.__cpu_start
+        if self.__profile is not None:
+            self.__profile.disable()
+            self.__profile.dump_stats(self.dump_path)
+            self.__profile = None
+
+    @contextmanager
+    def measure(self, stage: str, items: int = 0, statistic: Optional[str] = None):
+        """
+        Measures the time spent in a stage by the block of the with statement.
+
+        Args:
+            stage (str): The stage (see STAGES).
+            items (int): The number of items handled by the block (see UNITS).
+            statistic (Optional[str]): The aggregator run by the block, its time
+                and its items are also counted apart (the items aren't counted in the stage).
+        """
+        peak_rss_start = self.get_peak_rss()
+        wall_start = perf_counter()
+        cpu_start = process_time()
+        try:
+            yield
+        finally:
+            wall = perf_counter() - wall_start
+            cpu = process_time() - cpu_start
+            timings = [self.__stages[stage]]
+            if statistic is not None:
+                timings.append(self.__statistics.setdefault(statistic, self.__new_timing()))
+            else:
+                self.__stages[stage]["items"] += items
+            peak_rss_increase = self.get_peak_rss() - peak_rss_start if peak_rss_start is not None else None
+            for timing in timings:
+                timing["wall"] += wall
+                timing["cpu"] += cpu
+                if peak_rss_increase is not None:
+                    timing["peak_rss_increase"] = (timing["peak_rss_increase"] or 0) + peak_rss_increase
+            if statistic is not None:
+                timings[1]["items"] += items
+
+    def add_items(self, stage: str, items: int):
+        """
+        Adds items handled by a stage outside of measure.
+
+        Args:
+            stage (str): The stage (see STAGES).
+            items (int): The number of items (see UNITS).
+        """
+        self.__stages[stage]["items"] += items
+
+    def __get_batches(self, stage: str, items: Iterable) -> Iterator[list]:
+        iterator = iter(items)
+        while True:
+            with self.measure(stage):
+                batch = list(islice(iterator, self.BATCH_SIZE))
+            if not batch:
+                return
+            self.add_items(stage, len(batch))
+            yield batch
+
+    def analyse_file(self, parser: ApacheLogParser, analyser, start: int = 0, end: Optional[int] = None):
+        """
+        Parses a file and analyses its entries by batches, stage by stage.
+
+        Args:
+            parser (ApacheLogParser): The parser of the file.
+            analyser (ApacheLogAnalyser): The analyser updated with the entries.
+            start (int): The byte offset of the first line to analyse.
+            end (Optional[int]): The byte offset where the analysis stops (end of file if None).
+        """
+        if parser.engine == "mmap":
+            # The lines are read and parsed by the same pattern
+            for entries in self.__get_batches("parse", parser.get_entries(start, end)):
+                self.__analyse_batch(entries, analyser)
+        else:
+            for lines in self.__get_batches("read", parser.read_lines(start, end)):
+                with self.measure("parse", len(lines)):
+                    entries = list(parser.get_entries_from_lines(lines))
+                self.__analyse_batch(entries, analyser)
+        for name, count in parser.get_timestamp_cache_info().items():
+            self.__timestamp_cache[name] += count
+
+    def analyse_columnar_file(self, file: ApacheLogColumnarFile, filter, analyser):
+        """
+        Selects the entries of a columnar file on its columns and analyses them by batches.
+
+        Args:
+            file (ApacheLogColumnarFile): The parsed file (see ApacheLogCache).
+            filter (ApacheLogFilter): The filter selecting the entries.
+            analyser (ApacheLogAnalyser): The analyser updated with the entries.
+        """
+        with self.measure("filter", len(file.entries)):
+            indices = list(filter.get_columnar_indices(file))
+        for start in range(0, len(indices), self.BATCH_SIZE):
+            entries = list(file.get_entries(indices[start:start + self.BATCH_SIZE]))
+            self.__analyse_batch(entries, analyser)
+
+    def __analyse_batch(self, entries: list, analyser):
+        # The filter and each aggregator run on the whole batch so they are measured
+        # apart, the statistics are the same as ApacheLogAnalyser.analyse_entries
+        pass_filter = analyser.filter.pass_filter
+        with self.measure("filter", len(entries)):
+            passed = [entry for entry in entries if pass_filter(entry)]
+        analyser.add_totals(len(entries), len(passed))
+        self.add_items("analyse", len(passed))
+        for aggregator in analyser.get_aggregators():
+            with self.measure("analyse", len(passed), aggregator.name):
+                update = aggregator.update
+                for entry in passed:
+                    update(entry)
+
+    @staticmethod
+    def __get_rate(items: int, seconds: float) -> Optional[float]:
+        return round(items / seconds, 1) if seconds > 0 else None
+
+    def __get_timing(self, timing: dict, unit: str) -> dict:
+        return {
+            "wall_seconds": round(timing["wall"], 6),
+            "cpu_seconds": round(timing["cpu"], 6),
+            unit: timing["items"],
+            f"{unit}_per_second": self.__get_rate(timing["items"], timing["wall"]),
+            "peak_rss_increase_kb": timing["peak_rss_increase"]
+        }
+
+    def get_profile(self, total_lines: int) -> dict:
+        """
+        Returns the measures of the run, to put in the analysis.
+
+        Args:
+            total_lines (int): The number of lines of the files.
+
+        Returns:
+            dict: The whole run (with its peak memory) and each stage (wall time,
+            CPU time, items, items per second and growth of the peak memory during
+            the stage), with the details each statistic and the hit rates of the caches.
+        """
+        wall_time = self.__wall_time if self.__wall_time is not None else perf_counter() - self.__wall_start
+        cpu_time = self.__cpu_time if self.__cpu_time is not None else process_time() - self.__cpu_start
+        profile = {
+            "total": {
+                "wall_seconds": round(wall_time, 6),
+                "cpu_seconds": round(cpu_time, 6),
+                "lines": total_lines,
+                "lines_per_second": self.__get_rate(total_lines, wall_time),
+                "peak_rss_kb": self.get_peak_rss()
+            },
+            "stages": {
+                stage: self.__get_timing(timing, self.UNITS[stage])
+                for stage, timing in self.__stages.items() if stage != "export"
+            }
+        }
+        if self.details:
+            profile["statistics"] = {
+                name: self.__get_timing(timing, "lines")
+                for name, timing in self.__statistics.items()
+            }
+            user_agent_cache = MetadataInfo.get_cache_info()
+            profile["caches"] = {
+                "user_agents": self.__get_cache(user_agent_cache.hits, user_agent_cache.misses),
+                "timestamps": dict(self.__get_cache(self.__timestamp_cache["hits"],
+                                                    self.__timestamp_cache["misses"]),
+                                   fallbacks=self.__timestamp_cache["fallbacks"])
+            }
+        return profile
+
+    def get_stage(self, stage: str) -> dict:
+        """
+        Returns the measures of a stage, like in the profile
+        (for the export, which isn't in the profile).
+
+        Args:
+            stage (str): The stage (see STAGES).
+
+        Returns:
+            dict: The wall time, CPU time, items, items per second and growth of the peak memory of the stage.
+        """
+        return self.__get_timing(self.__stages[stage], self.UNITS[stage])
+
+    @staticmethod
+    def __get_cache(hits: int, misses: int) -> dict:
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else None}
+
+
+class ApacheLogNullProfiler(ApacheLogProfiler):
+    """
+    Profiler which measures nothing, used when the analysis isn't profiled.
+
+    The stages run directly on the whole stream of entries, without batches,
+    so the analysis runs at full speed and each stage is called once in main.py
+    whether the analysis is profiled or not.
+    """
+
+    def measure(self, stage: str, items: int = 0, statistic: Optional[str] = None):
+        """
+        Returns a context which measures nothing.
+        """
+        return nullcontext()
+
+    def add_items(self, stage: str, items: int):
+        """
+        Counts nothing.
+        """
+
+    def analyse_file(self, parser: ApacheLogParser, analyser, start: int = 0, end: Optional[int] = None):
+        """
+        Parses a file and analyses its entries while they are streamed.
+        """
+        analyser.analyse_entries(parser.get_entries(start, end))
+
+    def analyse_columnar_file(self, file: ApacheLogColumnarFile, filter, analyser):
+        """
+        Selects the entries of a columnar file on its columns and analyses them.
+        """
+        analyser.analyse_entries(file.get_entries(filter.get_columnar_indices(file)))
@@ -0,0 +1,106 @@
+from math import ceil, log
+from typing import Optional
+
+
+class DDSketch:
+    """
+    Class for estimating the quantiles of a stream of positive values in a compact memory (DDSketch).
+
+    The values are counted in buckets of logarithmic width: a quantile is
+    estimated with a relative error lower than the relative accuracy, and the
+    number of buckets only grows with the logarithm of the range of the values.
+    The values lower than 1 (empty responses) are counted apart. Two sketches
+    with the same relative accuracy can be merged.
+
+    Attributes:
+        relative_accuracy (float): The maximum relative error of the quantiles.
+        count (int): The number of values added.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self.__gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.__log_gamma = log(self.__gamma)
+        self.__zeros = 0
+        self.__buckets = {}
+
+    def add(self, value: float, count: int = 1):
+        """
+        Adds a value to the sketch.
+
+        Args:
+            value (float): The value (the negative values are counted as 0).
+            count (int): The number of times the value is added.
+        """
+        self.count += count
+        if value < 1:
+            self.__zeros += count
+            return
+        index = ceil(log(value) / self.__log_gamma)
+        buckets = self.__buckets
+        buckets[index] = buckets.get(index, 0) + count
+
+    def merge(self, other: "DDSketch"):
+        """
+        Adds the values of another sketch to this one.
+
+        Args:
+            other (DDSketch): A sketch with the same relative accuracy.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("The sketches don't have the same relative accuracy.")
+        self.count += other.count
+        self.__zeros += other.__zeros
+        for index, count in other.__buckets.items():
+            self.__buckets[index] = self.__buckets.get(index, 0) + count
+
+    def get_quantile(self, quantile: float) -> Optional[float]:
+        """
+        Returns the estimated value of a quantile.
+
+        Args:
+            quantile (float): The quantile, between 0 and 1 (0.5 for the median).
+
+        Returns:
+            Optional[float]: The estimated value, None if the sketch is empty.
+        """
+        if self.count == 0:
+            return None
+        rank = quantile * (self.count - 1)
+        seen = self.__zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.__buckets):
+            seen += self.__buckets[index]
+            if rank < seen:
+                # Middle of the bucket (gamma^(index - 1), gamma^index], in relative error
+                return 2 * self.__gamma ** index / (self.__gamma + 1)
+        return 2 * self.__gamma ** max(self.__buckets) / (self.__gamma + 1)
+
+    def get_state(self) -> dict:
+        """
+        Returns the sketch in a JSON serializable form (see load_state).
+
+        Returns:
+            dict: The state of the sketch.
+        """
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "zeros": self.__zeros,
+            "buckets": list(self.__buckets.items())
+        }
+
+    def load_state(self, state: dict):
+        """
+        Replaces the values of the sketch by a state returned by get_state.
+
+        Args:
+            state (dict): The state of a sketch with the same relative accuracy.
+        """
+        if state["relative_accuracy"] != self.relative_accuracy:
+            raise ValueError("The sketches don't have the same relative accuracy.")
+        self.count = state["count"]
+        self.__zeros = state["zeros"]
+        self.__buckets = dict(state["buckets"])
@@ -0,0 +1,115 @@
+from math import ceil, log, log2
+from hashlib import blake2b
+
+
+class HyperLogLog:
+    """
+    Class for estimating the number of distinct items of a stream in fixed memory.
+
+    Each item is hashed with a stable hash (blake2b, the same in every process
+    and every run) and only the registers of the estimator are kept, so the
+    memory doesn't depend on the number of items. Two estimators with the same
+    precision can be merged.
+
+    Attributes:
+        precision (int): The number of bits of the hash which select a register.
+        error (float): The relative standard error of the estimation.
+    """
+
+    MIN_PRECISION = 4
+    MAX_PRECISION = 18
+
+    def __init__(self, error: float = 0.01):
+        """
+        Initializes an empty estimator.
+
+        Args:
+            error (float): The relative standard error wanted, the precision
+                is chosen so the real error is lower or equal (if possible).
+        """
+        precision = ceil(log2((1.04 / error) ** 2))
+        self.precision = min(max(precision, self.MIN_PRECISION), self.MAX_PRECISION)
+        self.error = 1.04 / (2 ** self.precision) ** 0.5
+        self.__registers = bytearray(2 ** self.precision)
+        # Number of bits of the hash left after the index of the register
+        self.__remaining_bits = 64 - self.precision
+        self.__remaining_mask = (1 << self.__remaining_bits) - 1
+
+    @staticmethod
+    def get_hash(item) -> int:
+        """
+        Returns the stable 64 bits hash of an item.
+
+        Args:
+            item: The item (hashed from its text).
+
+        Returns:
+            int: The hash.
+        """
+        text = item if isinstance(item, str) else str(item)
+        return int.from_bytes(blake2b(text.encode(errors="replace"), digest_size=8).digest(), "big")
+
+    def add(self, item):
+        """
+        Adds an item to the estimator.
+
+        Args:
+            item: The item.
+        """
+        hash_value = self.get_hash(item)
+        index = hash_value >> self.__remaining_bits
+        # Position of the first bit set in the remaining bits
+        rank = self.__remaining_bits - (hash_value & self.__remaining_mask).bit_length() + 1
+        registers = self.__registers
+        if rank > registers[index]:
+            registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        """
+        Adds the items of another estimator to this one.
+
+        Args:
+            other (HyperLogLog): An estimator with the same precision.
+        """
+        if other.precision != self.precision:
+            raise ValueError("The estimators don't have the same precision.")
+        self.__registers = bytearray(map(max, self.__registers, other.__registers))
+
+    def count(self) -> int:
+        """
+        Returns the estimated number of distinct items.
+
+        Returns:
+            int: The estimation.
+        """
+        registers_number = len(self.__registers)
+        if registers_number >= 128:
+            alpha = 0.7213 / (1 + 1.079 / registers_number)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[registers_number]
+        estimate = alpha * registers_number ** 2 / sum(2.0 ** -register for register in self.__registers)
+        empty_registers = self.__registers.count(0)
+        # Linear counting is more accurate for the small cardinalities
+        if estimate <= 2.5 * registers_number and empty_registers:
+            estimate = registers_number * log(registers_number / empty_registers)
+        return round(estimate)
+
+    def get_state(self) -> dict:
+        """
+        Returns the estimator in a JSON serializable form (see load_state).
+
+        Returns:
+            dict: The state of the estimator.
+        """
+        return {"precision": self.precision, "registers": self.__registers.hex()}
+
+    def load_state(self, state: dict):
+        """
+        Replaces the registers of the estimator by a state returned by get_state.
+
+        Args:
+            state (dict): The state of an estimator with the same precision.
+        """
+        if state["precision"] != self.precision:
+            raise ValueError("The estimators don't have the same precision.")
+        self.__registers = bytearray.fromhex(state["registers"])
@@ -0,0 +1,154 @@
+from math import ceil
+from heapq import heapify, heappop, heappush, heapreplace, nlargest
+from itertools import count
+from typing import List, Tuple
+
+
+class SpaceSaving:
+    """
+    Class for finding the most frequent items of a stream in fixed memory (Space-Saving).
+
+    At most capacity items are monitored. When a new item comes and the
+    summary is full, the least frequent item is replaced by the new one,
+    which inherits its count: the count of an item is never underestimated
+    and is overestimated by at most its error, itself lower than
+    total / capacity. Two summaries with the same capacity can be merged.
+
+    Attributes:
+        capacity (int): The maximum number of items monitored.
+        error (float): The maximum overestimation of a count, as a fraction of the total.
+        total (int): The number of items added.
+    """
+
+    def __init__(self, error: float = 0.001):
+        """
+        Initializes an empty summary.
+
+        Args:
+            error (float): The maximum overestimation of a count wanted,
+                as a fraction of the number of items added.
+        """
+        self.capacity = ceil(1 / error)
+        self.error = 1 / self.capacity
+        self.total = 0
+        self.__counts = {}
+        self.__errors = {}
+        # Heap of the (count, order, item) of the monitored items, the counts may be outdated
+        self.__heap = []
+        self.__order = count()
+
+    def add(self, item):
+        """
+        Adds an item to the summary.
+
+        Args:
+            item: The item.
+        """
+        self.total += 1
+        counts = self.__counts
+        if item in counts:
+            counts[item] += 1
+            return
+        if len(counts) < self.capacity:
+            counts[item] = 1
+            self.__errors[item] = 0
+            heappush(self.__heap, (1, next(self.__order), item))
+            return
+        # Replace the least frequent item, the counts only grow so an entry
+        # of the heap is up to date when its count is the real one
+        heap = self.__heap
+        while True:
+            minimum_count, _, minimum_item = heap[0]
+            if counts[minimum_item] == minimum_count:
+                break
+            heapreplace(heap, (counts[minimum_item], next(self.__order), minimum_item))
+        heappop(heap)
+        del counts[minimum_item]
+        del self.__errors[minimum_item]
+        counts[item] = minimum_count + 1
+        self.__errors[item] = minimum_count
+        heappush(heap, (minimum_count + 1, next(self.__order), item))
+
+    def __get_minimum_count(self) -> int:
+        # Upper bound of the count of the items not monitored
+        if len(self.__counts) < self.capacity:
+            return 0
+        return min(self.__counts.values())
+
+    def merge(self, other: "SpaceSaving"):
+        """
+        Adds the items of another summary to this one.
+
+        Args:
+            other (SpaceSaving): A summary with the same capacity.
+        """
+        if other.capacity != self.capacity:
+            raise ValueError("The summaries don't have the same capacity.")
+        minimum_count = self.__get_minimum_count()
+        other_minimum_count = other.__get_minimum_count()
+        counts = {}
+        errors = {}
+        for item in list(self.__counts) + [item for item in other.__counts if item not in self.__counts]:
+            counts[item] = self.__counts.get(item, minimum_count) + other.__counts.get(item, other_minimum_count)
+            errors[item] = self.__errors.get(item, minimum_count) + other.__errors.get(item, other_minimum_count)
+        # Keep the most frequent items, in the order they were first seen
+        kept = set(nlargest(self.capacity, counts, key=counts.get))
+        self.__counts = {item: item_count for item, item_count in counts.items() if item in kept}
+        self.__errors = {item: errors[item] for item in self.__counts}
+        self.total += other.total
+        self.__rebuild_heap()
+
+    def __rebuild_heap(self):
+        self.__heap = [(item_count, next(self.__order), item) for item, item_count in self.__counts.items()]
+        heapify(self.__heap)
+
+    def most_common(self, top_n: int) -> List[Tuple[object, int]]:
+        """
+        Returns the most frequent items with their estimated counts, like Counter.most_common.
+
+        Args:
+            top_n (int): The number of items to return.
+
+        Returns:
+            List[Tuple[object, int]]: The items and their counts, the most frequent first.
+        """
+        return nlargest(top_n, self.__counts.items(), key=lambda item: item[1])
+
+    def get_error(self, item) -> int:
+        """
+        Returns the maximum overestimation of the count of a monitored item.
+
+        Args:
+            item: The item.
+
+        Returns:
+            int: The maximum overestimation.
+        """
+        return self.__errors[item]
+
+    def get_state(self) -> dict:
+        """
+        Returns the summary in a JSON serializable form (see load_state).
+
+        Returns:
+            dict: The state of the summary.
+        """
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "items": [[item, item_count, self.__errors[item]] for item, item_count in self.__counts.items()]
+        }
+
+    def load_state(self, state: dict):
+        """
+        Replaces the items of the summary by a state returned by get_state.
+
+        Args:
+            state (dict): The state of a summary with the same capacity.
+        """
+        if state["capacity"] != self.capacity:
+            raise ValueError("The summaries don't have the same capacity.")
+        self.total = state["total"]
+        self.__counts = {item: item_count for item, item_count, _ in state["items"]}
+        self.__errors = {item: error for item, _, error in state["items"]}
+        self.__rebuild_heap()
@@ -2,9 +2,14 @@
     CLI manage.
 """
 
+import os
 from argparse import ArgumentParser, Namespace
+from glob import glob
 from re import match
-from datetime import datetime
+from datetime import datetime, timedelta
+from analysis.apache_log_analyser import STATISTICS, DEFAULT_STATISTICS, DEFAULT_APPROXIMATION, BUCKET_SIZES
+from parse.apache_log_parser import ApacheLogParser
+from export.exporter import Exporter
 
 class CliArgumentException(Exception):
 
@@ -14,6 +19,8 @@ class CliArgumentException(Exception):
 
 class CliArgumentParser(ArgumentParser):
 
+    METHODS = ("GET", "POST", "PUT", "DELETE")
+
     def __init__(self, description: str):
         super().__init__(description=description, allow_abbrev=False)
         self.__set_arguments()
@@ -21,18 +28,57 @@ class CliArgumentParser(ArgumentParser):
     def __set_arguments(self):
         """Defines all command-line arguments."""
         # Required arguments
-        self.add_argument('file_path', help='Path of the Apache access.log')
+        self.add_argument('file_paths', nargs='+', metavar='file_path',
+                          help='Paths or glob patterns of the Apache access.log (.gz, .bz2 and .xz are read transparently)')
         # Optional arguments
         self.add_argument("-o", "--output", type=str, default="./apache_stats.json", help="Output file")
-        self.add_argument("-f", "--format", choices=["json"], default="json", help="Output format")
+        self.add_argument("-f", "--format", choices=Exporter.FORMATS, default="json",
+                          help="Output format (ndjson: one JSON record per line, "
+                               "partial: raw state of the analysis to merge with main.py merge).")
+        self.add_argument("--compact", action="store_true", help="Write the JSON without indentation (ndjson is always compact).")
         self.add_argument("-v", "--verbose", action="store_true", help="Enable verbose mode")
         self.add_argument("-n", "--nooverride", action="store_true", help="Force the creation of the output file.")
         self.add_argument("--details", action="store_true", help="Put the detail of analysis in the output file.")
-        # Filter arguments
-        self.add_argument("-s", "--status", type=int, help="")
-        self.add_argument("-d", "--date", type=str, help="DD/MM/YYYY")
-        self.add_argument("-i", "--ip", type=str, help="")
-        self.add_argument("-m", "--method", choices=["GET", "POST", "PUT", "DELETE"], type=str, help="")
+        self.add_argument("--stats", type=str, default=",".join(DEFAULT_STATISTICS),
+                          help=f"Statistics to compute, separated by commas ({','.join(STATISTICS)}).")
+        self.add_argument("--bucket", choices=BUCKET_SIZES, default="hour",
+                          help="Duration of the periods of the traffic statistics.")
+        self.add_argument("--approximate", action="store_true",
+                          help="Estimate the unique IPs and the top IPs and URLs in a fixed memory.")
+        self.add_argument("--unique-error", type=float, default=DEFAULT_APPROXIMATION["unique_error"],
+                          help="Relative standard error of the approximate number of unique IPs.")
+        self.add_argument("--top-error", type=float, default=DEFAULT_APPROXIMATION["top_error"],
+                          help="Maximum overestimation of the approximate top counts (fraction of the requests).")
+        self.add_argument("--cache", action="store_true",
+                          help="Keep the parsed files in binary cache files (path of the file + .cache).")
+        self.add_argument("--rebuild-cache", action="store_true",
+                          help="Parse the files again and replace their cache files (implies --cache).")
+        self.add_argument("--seek", action="store_true",
+                          help="With --date, seek the dates by bisection instead of reading the whole files "
+                               "(the files must be written in time order).")
+        self.add_argument("--seek-tolerance", type=int, default=60,
+                          help="Seconds of tolerance of --seek for the lines out of order.")
+        self.add_argument("--state", type=str, help="State file used to resume the analysis of a growing file.")
+        self.add_argument("--follow", action="store_true", help="Follow the lines appended to the file.")
+        self.add_argument("--interval", type=float, default=5.0, help="Seconds between two exports in follow mode.")
+        self.add_argument("--engine", choices=ApacheLogParser.ENGINES, default="text",
+                          help="Engine reading the lines (mmap: bytes parsing of the mapped file, "
+                               "only faster when few fields are parsed, like --stats responses).")
+        self.add_argument("--backend", choices=("python", "numpy"), default="python",
+                          help="Backend of the statistics (numpy: computed on whole columns, the files are kept in memory).")
+        self.add_argument("--profile", action="store_true",
+                          help="Measure the time and the memory of each stage, put in the analysis of the output file "
+                               "(the export time is printed).")
+        self.add_argument("--profile-dump", type=str,
+                          help="Dump the cProfile statistics of the run in this file (implies --profile).")
+        self.add_argument("-w", "--workers", type=int,
+                          help="Number of processes used to parse the files (default: one per file).")
+        # Filter arguments (several values can be given, separated by commas)
+        self.add_argument("-s", "--status", type=str, help="Status codes, classes or ranges (404,5xx,300-399)")
+        self.add_argument("-d", "--date", type=str, help="DD/MM/YYYY or DD/MM/YYYY-DD/MM/YYYY")
+        self.add_argument("-i", "--ip", type=str, help="IPv4 addresses")
+        self.add_argument("-m", "--method", type=str, help="HTTP methods (GET,POST,PUT,DELETE)")
+        self.add_argument("-u", "--url", type=str, help="Beginnings of the URLs")
 
     def parse(self) -> Namespace :
         """Parses arguments and performs basic validation if needed."""
@@ -41,21 +87,164 @@ class CliArgumentParser(ArgumentParser):
             args = self.parse_args()
         except Exception as ex:
             raise CliArgumentException(str(ex))
-        # Parse date filter if given
+        # Parse the filter arguments
+        self.parse_filter(args)
+        # Expand the glob patterns (if not done by the shell)
+        args.file_paths = self.get_file_paths(args.file_paths)
+        # The state and the follow mode need a single uncompressed file
+        if args.state or args.follow:
+            if len(args.file_paths) > 1 or ApacheLogParser.is_compressed(args.file_paths[0]):
+                raise CliArgumentException("--state and --follow need a single uncompressed file.")
+        # The cache holds complete files, it can't be used for a growing file
+        args.cache = args.cache or args.rebuild_cache
+        if args.cache and (args.state or args.follow):
+            raise CliArgumentException("--cache can't be used with --state or --follow.")
+        # The seek of the dates needs a date filter and reads only a part of the files
+        if args.seek and not args.date:
+            raise CliArgumentException("--seek needs a date filter (--date).")
+        if args.seek and (args.state or args.follow or args.cache):
+            raise CliArgumentException("--seek can't be used with --state, --follow or --cache.")
+        if args.seek_tolerance < 0:
+            raise CliArgumentException(f"The tolerance {args.seek_tolerance} isn't valid.")
+        # Check logic between file and format
+        if not args.output.endswith(f".{args.format}"):
+            raise CliArgumentException(f"The output file {args.output} isn't a {args.format} file.")
+        # Check logic for the statistics asked
+        args.stats = self.parse_stats(args.stats)
+        # Check logic for the approximate statistics (error bounds between 0 and 1)
+        for error in (args.unique_error, args.top_error):
+            if not 0 < error < 1:
+                raise CliArgumentException(f"The error bound {error} isn't valid.")
+        args.bucket_size = BUCKET_SIZES[args.bucket]
+        args.approximation = None
+        if args.approximate:
+            args.approximation = {"unique_error": args.unique_error, "top_error": args.top_error}
+        # Check logic for the follow mode
+        if args.interval <= 0:
+            raise CliArgumentException(f"The interval {args.interval} isn't valid.")
+        # The NumPy backend analyses whole files kept in memory
+        if args.backend == "numpy":
+            # The backend is only imported when it is asked, like in main.py
+            from analysis.apache_log_numpy_backend import ApacheLogNumpyBackend
+            if not ApacheLogNumpyBackend.is_available():
+                raise CliArgumentException("--backend numpy needs NumPy (pip install numpy).")
+            if args.state or args.follow or args.seek:
+                raise CliArgumentException("--backend numpy can't be used with --state, --follow or --seek.")
+        # The profile and the NumPy backend run in the main process (one worker by default)
+        args.profile = args.profile or args.profile_dump is not None
+        # The partial only holds the state of the statistics, not the profile
+        if args.format == "partial" and args.profile:
+            raise CliArgumentException("--profile can't be used with the partial format.")
+        if args.profile or args.backend == "numpy":
+            if args.workers is not None and args.workers > 1:
+                raise CliArgumentException("--profile and --backend numpy can't be used with several workers.")
+            args.workers = 1
+        # Check logic for the number of workers (one per file by default)
+        if args.workers is None:
+            args.workers = min(len(args.file_paths), os.cpu_count() or 1)
+        if args.workers < 1:
+            raise CliArgumentException(f"The number of workers {args.workers} isn't valid.")
+        return args
+
+    @staticmethod
+    def get_file_paths(patterns: list) -> list:
+        """
+        Expands the glob patterns of the files (if not done by the shell)
+        and checks the files exist.
+
+        Args:
+            patterns (list): The paths or glob patterns.
+
+        Returns:
+            list: The paths of the files, without duplicates.
+        """
+        file_paths = []
+        for pattern in patterns:
+            matches = sorted(glob(pattern)) if any(char in pattern for char in "*?[") else [pattern]
+            if not matches:
+                raise CliArgumentException(f"No file matches {pattern}.")
+            for file_path in matches:
+                if not os.path.isfile(file_path):
+                    raise CliArgumentException(f"The file {file_path} doesn't exist.")
+                if file_path not in file_paths:
+                    file_paths.append(file_path)
+        return file_paths
+
+    @staticmethod
+    def parse_stats(stats: str) -> list:
+        """
+        Parses and checks the sections of statistics asked, separated by commas.
+
+        Args:
+            stats (str): The sections (see STATISTICS).
+
+        Returns:
+            list: The names of the sections.
+        """
+        stats = [stat.strip() for stat in stats.split(",") if stat.strip()]
+        for stat in stats:
+            if stat not in STATISTICS:
+                raise CliArgumentException(f"The statistic {stat} doesn't exist.")
+        return stats
+
+    @classmethod
+    def parse_filter(cls, args: Namespace):
+        """
+        Parses and checks the filter arguments (status, date, ip, method and url),
+        they are replaced by the values expected by ApacheLogFilter.
+
+        Args:
+            args (Namespace): The arguments, the missing filters are None.
+        """
+        # Parse date filter if given (a day or a range of days)
         if args.date:
             try:
-                args.date = datetime.strptime(args.date, "%d/%m/%Y")
+                dates = [datetime.strptime(date, "%d/%m/%Y") for date in args.date.split("-")]
             except ValueError:
                 raise CliArgumentException("The format of the date filter isn't valid.")
-        # Check logic between file and format
-        if not args.output.endswith(f".{args.format}"):
-            raise CliArgumentException(f"The output file {args.output} isn't a {args.format} file.")
-        # Check logic for the status code if given
+            if len(dates) == 1:
+                args.date = dates[0]
+            elif len(dates) == 2 and dates[0] <= dates[1]:
+                args.date = (dates[0], dates[1] + timedelta(days=1))
+            else:
+                raise CliArgumentException("The format of the date filter isn't valid.")
+        # Check logic for the status codes if given
         if args.status:
-            if not 100 <= args.status <= 599:
-                raise CliArgumentException(f"The status code {args.status} isn't valid.")
-        # Check logic for the IP if given (only IPv4 are acceptable)
+            args.status = [cls.__parse_status(status) for status in cls.__split(args.status)]
+        # Check logic for the IPs if given (only IPv4 are acceptable)
         if args.ip:
-            if not bool(match(r"^((25[0-5]|(2[0-4]|1\d|[1-9]|)\d)\.?\b){4}$", args.ip)):
-                raise CliArgumentException(f"Only IPv4 can be used to filter.")
-        return args
\ No newline at end of file
+            args.ip = cls.__split(args.ip)
+            for ip in args.ip:
+                if not bool(match(r"^((25[0-5]|(2[0-4]|1\d|[1-9]|)\d)\.?\b){4}$", ip)):
+                    raise CliArgumentException(f"Only IPv4 can be used to filter.")
+        # Check logic for the HTTP methods if given
+        if args.method:
+            args.method = cls.__split(args.method)
+            for method in args.method:
+                if method not in cls.METHODS:
+                    raise CliArgumentException(f"The HTTP method {method} isn't valid.")
+        if args.url:
+            args.url = cls.__split(args.url)
+
+    @staticmethod
+    def __split(values: str) -> list:
+        return [value.strip() for value in values.split(",") if value.strip()]
+
+    @staticmethod
+    def __parse_status(status: str) -> tuple:
+        """
+        Parses a status code filter: a code (404), a class (4xx) or a range (400-499).
+        """
+        try:
+            if len(status) == 3 and status[1:].lower() == "xx":
+                low = int(status[0]) * 100
+                high = low + 99
+            elif "-" in status:
+                low, high = (int(code) for code in status.split("-"))
+            else:
+                low = high = int(status)
+        except ValueError:
+            raise CliArgumentException(f"The status code {status} isn't valid.")
+        if not 100 <= low <= high <= 599:
+            raise CliArgumentException(f"The status code {status} isn't valid.")
+        return (low, high)
@@ -0,0 +1,45 @@
+"""
+    CLI manage of the merge command.
+"""
+
+from argparse import ArgumentParser, Namespace
+from typing import List
+from export.exporter import Exporter
+from cli.cli_argument_parser import CliArgumentParser, CliArgumentException
+
+
+class MergeArgumentParser(ArgumentParser):
+    """
+    Parser of the arguments of the merge command (main.py merge ...),
+    which merges partial analyses into the final analysis (see ApacheLogPartial).
+    """
+
+    def __init__(self, description: str):
+        super().__init__(prog="main.py merge", description=description, allow_abbrev=False)
+        self.__set_arguments()
+
+    def __set_arguments(self):
+        """Defines all command-line arguments."""
+        # Required arguments
+        self.add_argument('partial_paths', nargs='+', metavar='partial_path',
+                          help='Paths or glob patterns of the partial analyses (exported with --format partial)')
+        # Optional arguments
+        self.add_argument("-o", "--output", type=str, default="./apache_stats.json", help="Output file")
+        self.add_argument("-f", "--format", choices=Exporter.FORMATS, default="json",
+                          help="Output format (partial: merged partial, to merge again).")
+        self.add_argument("--compact", action="store_true", help="Write the JSON without indentation (ndjson is always compact).")
+        self.add_argument("-v", "--verbose", action="store_true", help="Enable verbose mode")
+        self.add_argument("-n", "--nooverride", action="store_true", help="Force the creation of the output file.")
+        self.add_argument("--details", action="store_true", help="Put the detail of analysis in the output file.")
+
+    def parse(self, arguments: List[str]) -> Namespace:
+        """Parses arguments and performs basic validation if needed."""
+        try:
+            args = self.parse_args(arguments)
+        except Exception as ex:
+            raise CliArgumentException(str(ex))
+        args.partial_paths = CliArgumentParser.get_file_paths(args.partial_paths)
+        # Check logic between file and format
+        if not args.output.endswith(f".{args.format}"):
+            raise CliArgumentException(f"The output file {args.output} isn't a {args.format} file.")
+        return args
@@ -0,0 +1,57 @@
+"""
+    CLI manage of the serve command.
+"""
+
+from argparse import ArgumentParser, Namespace
+from typing import List
+from parse.apache_log_parser import ApacheLogParser
+from cli.cli_argument_parser import CliArgumentParser, CliArgumentException
+
+
+class ServeArgumentParser(ArgumentParser):
+    """
+    Parser of the arguments of the serve command (main.py serve ...),
+    which serves the analyses of the files kept in memory (see ApacheLogServer).
+    """
+
+    def __init__(self, description: str):
+        super().__init__(prog="main.py serve", description=description, allow_abbrev=False)
+        self.__set_arguments()
+
+    def __set_arguments(self):
+        """Defines all command-line arguments."""
+        # Required arguments
+        self.add_argument('file_paths', nargs='+', metavar='file_path',
+                          help='Paths or glob patterns of the Apache access.log (the compressed files are not followed)')
+        # Optional arguments
+        self.add_argument("--host", type=str, default="127.0.0.1", help="Address listened.")
+        self.add_argument("--port", type=int, default=8080, help="TCP port listened.")
+        self.add_argument("--socket", type=str, help="Unix socket listened instead of the TCP port.")
+        self.add_argument("--interval", type=float, default=1.0,
+                          help="Seconds between two reads of the lines appended to the files.")
+        self.add_argument("--memory", type=float,
+                          help="Memory budget of the entries in MiB, the oldest ones are evicted beyond it.")
+        self.add_argument("--threads", type=int, default=4, help="Number of queries analysed at the same time.")
+        self.add_argument("--engine", choices=ApacheLogParser.ENGINES, default="text",
+                          help="Engine reading the lines while the files are loaded.")
+        self.add_argument("-v", "--verbose", action="store_true", help="Enable verbose mode")
+
+    def parse(self, arguments: List[str]) -> Namespace:
+        """Parses arguments and performs basic validation if needed."""
+        try:
+            args = self.parse_args(arguments)
+        except Exception as ex:
+            raise CliArgumentException(str(ex))
+        args.file_paths = CliArgumentParser.get_file_paths(args.file_paths)
+        if not 0 <= args.port <= 65535:
+            raise CliArgumentException(f"The port {args.port} isn't valid.")
+        if args.interval <= 0:
+            raise CliArgumentException(f"The interval {args.interval} isn't valid.")
+        if args.threads < 1:
+            raise CliArgumentException(f"The number of threads {args.threads} isn't valid.")
+        # Memory budget in bytes
+        if args.memory is not None:
+            if args.memory <= 0:
+                raise CliArgumentException(f"The memory budget {args.memory} isn't valid.")
+            args.memory = int(args.memory * 1024 * 1024)
+        return args
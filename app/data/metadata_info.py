@@ -1,36 +1,84 @@
-
 from typing import Optional
-from user_agents.parsers import parse
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Maximum number of distinct user agents kept in the parsing cache
+USER_AGENT_CACHE_SIZE = 4096
+
+@dataclass(frozen=True)
+class UserAgentInfo:
+    os: Optional[str]
+    browser: Optional[str]
+    type_device: str
+    is_bot: bool
+
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
+def parse_user_agent(user_agent: str) -> UserAgentInfo:
+    """
+    Parses a user agent and classifies it.
+    The result is cached and shared by all the entries with the same user agent.
+    The user_agents library is only imported on the first call.
+
+    Args:
+        user_agent (str): The raw user agent.
+
+    Returns:
+        UserAgentInfo: The OS, browser, type of device and bot flag of the user agent.
+    """
+    from user_agents.parsers import parse
+    parsed = parse(user_agent)
+    if parsed.is_pc:
+        type_device = "PC"
+    elif parsed.is_tablet:
+        type_device = "Tablet"
+    elif parsed.is_mobile:
+        type_device = "Mobile"
+    else:
+        type_device = "Other"
+    return UserAgentInfo(parsed.os.family, parsed.browser.family, type_device, parsed.is_bot)
 
 class MetadataInfo:
 
     def __init__(self, referer: Optional[str], user_agent: Optional[str]):
         self.referer = referer
-        self.user_agent = parse(user_agent) if user_agent else None
+        self.user_agent = user_agent
+        self.__user_agent_info = None
+
+    @property
+    def user_agent_info(self) -> Optional[UserAgentInfo]:
+        """
+        The information of the user agent, parsed on the first access only.
+        """
+        if self.__user_agent_info is None and self.user_agent:
+            self.__user_agent_info = parse_user_agent(self.user_agent)
+        return self.__user_agent_info
+
+    @staticmethod
+    def get_cache_info():
+        """
+        Returns the statistics of the user agent parsing cache.
+
+        Returns:
+            CacheInfo: The hits, misses, maximum size and current size of the cache.
+        """
+        return parse_user_agent.cache_info()
 
     def get_os(self) -> Optional[str]:
-        if self.user_agent:
-            return self.user_agent.os.family
+        if self.user_agent_info:
+            return self.user_agent_info.os
         return None
-    
+
     def get_browser(self) -> Optional[str]:
-        if self.user_agent:
-            return self.user_agent.browser.family
+        if self.user_agent_info:
+            return self.user_agent_info.browser
         return None
-    
+
     def get_type_device(self) -> Optional[str]:
-        if self.user_agent:
-            if self.user_agent.is_pc:
-                return "PC"
-            elif self.user_agent.is_tablet:
-                return "Tablet"
-            elif self.user_agent.is_mobile:
-                return "Mobile"
-            else:
-                return "Other"
+        if self.user_agent_info:
+            return self.user_agent_info.type_device
         return None
-    
+
     def is_bot(self) -> Optional[bool]:
-        if self.user_agent:
-            return self.user_agent.is_bot
-        return None
\ No newline at end of file
+        if self.user_agent_info:
+            return self.user_agent_info.is_bot
+        return None
@@ -1,19 +1,17 @@
 
 from dataclasses import dataclass
 
+# Classes of the status codes, by hundred (the codes under 200 are 1xx, from 500 they are 5xx)
+STATUS_CODE_CLASSES = ("1xx", "1xx", "2xx", "3xx", "4xx", "5xx")
+
 @dataclass
 class ResponseInfo:
     status_code: int
     response_size: int
 
+    @staticmethod
+    def get_class_of_status_code(status_code: int) -> str:
+        return STATUS_CODE_CLASSES[min(max(status_code // 100, 0), 5)]
+
     def get_status_code_class(self):
-        if self.status_code >= 500:
-            return "5xx"
-        elif self.status_code >= 400:
-            return "4xx"
-        elif self.status_code >= 300:
-            return "3xx"
-        elif self.status_code >= 200:
-            return "2xx"
-        else:
-            return "1xx"
\ No newline at end of file
+        return self.get_class_of_status_code(self.status_code)
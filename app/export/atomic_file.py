@@ -0,0 +1,40 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+# The permissions of the new files (the temporary files are created private)
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+@contextmanager
+def open_atomic(path: str, mode: str = "w", buffering: int = -1) -> Iterator[IO]:
+    """
+    Opens a file to replace atomically: the datas are written in a temporary
+    file with a unique name in the same directory (path + "." + random + ".tmp")
+    which is renamed when it is closed, so the file is never read half written
+    and two writers of the same file never share their temporary file. If the
+    writing fails, the temporary file is removed and the file is left unchanged.
+
+    Args:
+        path (str): The path of the file to replace.
+        mode (str): The mode of the file, "w" (text) or "wb" (binary).
+        buffering (int): The size of the write buffer (default size if -1).
+
+    Returns:
+        Iterator[IO]: The temporary file, opened for writing.
+    """
+    descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", prefix=f"{os.path.basename(path)}.",
+                                                  dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(descriptor, mode, buffering=buffering) as file:
+            yield file
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temporary_path, FILE_MODE)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
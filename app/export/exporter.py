@@ -1,6 +1,8 @@
-
 import os
 import json
+from datetime import date, datetime
+from typing import Iterable, Iterator, Optional
+from export.atomic_file import open_atomic
 
 class ExportationException(Exception):
 
@@ -8,9 +10,41 @@ class ExportationException(Exception):
         super().__init__(*args)
 
 class Exporter:
+    """
+    Class for exporting the datas of an analysis in a file.
+
+    The datas are encoded and written incrementally, and the file is
+    replaced atomically: the datas are written in a temporary file then
+    renamed, so the output file is never read half written. The datetimes
+    (and dates) are written in the ISO 8601 format.
+
+    Formats:
+        - json: one JSON document, indented or compact.
+        - ndjson: one JSON record per line (see get_records), so the big
+          lists (buckets, top items...) can be streamed to other tools.
+        - partial: one compact JSON document, for the raw state of an analysis
+          merged later with others (see ApacheLogPartial).
+    """
+
+    FORMATS = ("json", "ndjson", "partial")
+
+    # Keys of the datas whose lists are always written as records in ndjson (see get_records)
+    RECORD_KEYS = ("stats",)
 
-    def __init__(self, export_path: str, override: bool):
+    # Size of the write buffer of the output file
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, export_path: str, override: bool, compact: bool = False):
+        """
+        Initializes a new exporter.
+
+        Args:
+            export_path (str): The path of the output file.
+            override (bool): Replace the output file if it already exists.
+            compact (bool): Write the JSON without indentation nor spaces.
+        """
         self.override_mode = override
+        self.compact = compact
         if self.__can_create_file(export_path):
             self.export_path = export_path
 
@@ -26,13 +60,152 @@ class Exporter:
             raise ExportationException(f"No right to write in the directory {parent_directory}")
         return True
 
+    @staticmethod
+    def __default(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    @classmethod
+    def encode(cls, datas) -> str:
+        """
+        Returns the datas encoded in compact JSON, like the exported files
+        (for example to send them, see ApacheLogServer).
+
+        Args:
+            datas (object) : the datas to encode
+
+        Returns:
+            str: The JSON document.
+        """
+        return json.dumps(datas, separators=(",", ":"), default=cls.__default)
+
+    def export(self, datas, format: str = "json"):
+        """
+        Export the given datas in the given format (see FORMATS).
+
+        Args:
+            datas (object) : the datas that will be included in the file
+            format (str) : the format of the file
+        """
+        if format == "ndjson":
+            self.export_to_ndjson(self.get_records(datas))
+        elif format == "json":
+            self.export_to_json(datas)
+        elif format == "partial":
+            encoder = json.JSONEncoder(separators=(",", ":"), default=self.__default)
+            self.__write(self.__iterencode_compact(datas, encoder))
+        else:
+            raise ExportationException(f"The format {format} isn't supported.")
+
     def export_to_json(self, datas):
         """
         Export the given datas in a json file.
-        The path of the file was given in the __init__
+        The path of the file was given in the __init__.
+        The file is replaced atomically.
 
         Args:
             datas (object) : the datas that will be included in the json file
         """
-        with open(self.export_path, 'w') as file:
-            json.dump(datas, file, indent=4)
\ No newline at end of file
+        if self.compact:
+            encoder = json.JSONEncoder(separators=(",", ":"), default=self.__default)
+            self.__write(self.__iterencode_compact(datas, encoder))
+        else:
+            encoder = json.JSONEncoder(indent=4, default=self.__default)
+            self.__write(encoder.iterencode(datas))
+
+    def export_to_ndjson(self, records: Iterable[dict]):
+        """
+        Export the given records in a ndjson file, one compact JSON record per line.
+        The records are written as they are given, so they can come from a generator.
+        The file is replaced atomically.
+
+        Args:
+            records (Iterable[dict]) : the records that will be included in the ndjson file
+        """
+        encode = json.JSONEncoder(separators=(",", ":"), default=self.__default).encode
+        self.__write(f"{encode(record)}\n" for record in records)
+
+    def __iterencode_compact(self, datas, encoder: json.JSONEncoder) -> Iterator[str]:
+        # The dictionaries are walked and the items of the lists are encoded
+        # one by one by the C encoder, which is much faster than the incremental
+        # encoder and never holds a whole list in memory
+        if isinstance(datas, dict) and datas:
+            separator = "{"
+            for key, value in datas.items():
+                yield f"{separator}{encoder.encode(self.__get_key(key))}:"
+                yield from self.__iterencode_compact(value, encoder)
+                separator = ","
+            yield "}"
+        elif isinstance(datas, (list, tuple)) and datas:
+            separator = "["
+            for value in datas:
+                yield separator
+                yield encoder.encode(value)
+                separator = ","
+            yield "]"
+        else:
+            yield encoder.encode(datas)
+
+    @staticmethod
+    def __get_key(key) -> str:
+        # Same conversion of the keys as the json module
+        if isinstance(key, str):
+            return key
+        if key is True:
+            return "true"
+        if key is False:
+            return "false"
+        if key is None:
+            return "null"
+        if isinstance(key, (int, float)):
+            return json.dumps(key)
+        raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+    def __write(self, chunks: Iterable[str]):
+        # The output file is never read half written
+        with open_atomic(self.export_path, 'w', self.BUFFER_SIZE) as file:
+            write = file.write
+            for chunk in chunks:
+                write(chunk)
+
+    @classmethod
+    def get_records(cls, datas: dict, name: Optional[str] = None) -> Iterator[dict]:
+        """
+        Yields the records of the datas written in a ndjson file.
+
+        The values of a dictionary which are neither dictionaries nor lists
+        of records are gathered in one record, the others are nested records
+        named with the path of their keys ("stats.traffic.buckets"). The lists
+        of records are the lists under RECORD_KEYS, even empty, so the keys
+        written as records never depend on the datas: each item of such a list
+        is one record (a value which isn't a dictionary is in its "value" key).
+        The name of a record is in its "record" key, the first one is "summary".
+
+        Args:
+            datas (dict): The datas to split in records.
+            name (Optional[str]): The name of the records of the datas.
+
+        Returns:
+            Iterator[dict]: The records.
+        """
+        values = {}
+        nested = []
+        in_records = name is not None and name.split(".", 1)[0] in cls.RECORD_KEYS
+        for key, value in datas.items():
+            if isinstance(value, dict) and value:
+                nested.append((key, value))
+            elif isinstance(value, list) and in_records:
+                nested.append((key, value))
+            else:
+                values[key] = value
+        if values or name is None:
+            yield {"record": name or "summary", **values}
+        for key, value in nested:
+            nested_name = f"{name}.{key}" if name else key
+            if isinstance(value, dict):
+                yield from cls.get_records(value, nested_name)
+            else:
+                for item in value:
+                    yield {"record": nested_name, **item} if isinstance(item, dict) \
+                        else {"record": nested_name, "value": item}
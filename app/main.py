@@ -1,14 +1,52 @@
 """
     Main file
 """
+import os
+import sys
+import time
 from cli.cli_argument_parser import *
 from parse.apache_log_parser import ApacheLogParser, InvalidFormatApacheLogException
 from analysis.apache_log_analyser import ApacheLogAnalyser
 from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_profiler import ApacheLogProfiler, ApacheLogNullProfiler
+from analysis.apache_log_checkpoint import ApacheLogCheckpoint, CheckpointException
+from analysis.apache_log_partial import ApacheLogPartial, PartialException
+from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_follower import ApacheLogFollower
+from parse.apache_log_cache import ApacheLogCache
+from data.metadata_info import MetadataInfo
 from export.exporter import Exporter, ExportationException
 
 if __name__ == "__main__":
     try:
+        # Serve the analyses of the files kept in memory (main.py serve ...)
+        if len(sys.argv) > 1 and sys.argv[1] == "serve":
+            # The modules of the server (asyncio) are only imported to serve
+            from cli.serve_argument_parser import ServeArgumentParser
+            from serve.apache_log_store import ApacheLogStore
+            from serve.apache_log_server import ApacheLogServer
+            args = ServeArgumentParser("Serve the analyses of Apache access logs kept in memory.").parse(sys.argv[2:])
+            server = ApacheLogServer(ApacheLogStore(args.file_paths, args.engine, args.memory),
+                                     args.host, args.port, args.socket, args.interval, args.threads, args.verbose)
+            try:
+                server.run()
+            except KeyboardInterrupt:
+                if (args.verbose):
+                    print("End of the server.")
+            sys.exit()
+        # Merge partial analyses into the final analysis (main.py merge ...)
+        if len(sys.argv) > 1 and sys.argv[1] == "merge":
+            from cli.merge_argument_parser import MergeArgumentParser
+            args = MergeArgumentParser("Merge partial analyses of Apache access logs.").parse(sys.argv[2:])
+            analyser = ApacheLogPartial.merge(ApacheLogPartial.load(path) for path in args.partial_paths)
+            if (args.verbose):
+                print(f"{len(args.partial_paths)} partials merged, {analyser.get_total_requests()} requests.")
+            exporter = Exporter(args.output, not args.nooverride, args.compact)
+            if args.format == "partial":
+                exporter.export(ApacheLogPartial.get_partial(analyser), args.format)
+            else:
+                exporter.export(analyser.get_complete_analysis(args.details), args.format)
+            sys.exit()
         #Arguments
         argument_parser = CliArgumentParser("Analyse Apache access log.")
         # Get arguments
@@ -16,22 +54,155 @@ if __name__ == "__main__":
         # Verbose mode
         if (args.verbose):
             print("Mode verbeux activé.")
-            print(f'File : {args.file_path}')
+            print(f'File : {", ".join(args.file_paths)}')
             print("Start of the analyse...")
-        # Analyse the file
-        # Parse Apache log file
-        apache_log_parser = ApacheLogParser(args.file_path)
-        apache_log_file = apache_log_parser.get_file_parsed()
-        if (args.verbose):
-            print(f"{len(apache_log_file.entries)} lines analysed.")
+        # Measure the stages of the analysis if asked (the null profiler measures nothing)
+        profiler = ApacheLogNullProfiler()
+        if args.profile:
+            profiler = ApacheLogProfiler(args.details, args.profile_dump)
+            profiler.start()
+        # Analyse the files
+        # The path of the analysis is a list if several files are analysed
+        path = args.file_paths[0] if len(args.file_paths) == 1 else args.file_paths
         # Filter for the analysis
-        filter = ApacheLogFilter(args.status, args.date, args.ip, args.method)
-        # Analyse the Apache log file parsed
-        analyser = ApacheLogAnalyser(apache_log_file, filter)
-        analysis = analyser.get_complete_analysis(args.details)
+        filter = ApacheLogFilter(args.status, args.date, args.ip, args.method, args.url)
+        analyser = ApacheLogAnalyser(ApacheLogFile(path), filter, args.stats, args.approximation, args.bucket_size)
+        # Only the fields needed by the filter and the statistics are parsed
+        fields = ApacheLogAnalyser.get_required_fields(filter, args.stats)
+        # Resume the analysis saved in the state file if given (single file only)
+        start = 0
+        end = None
+        if args.state or args.follow:
+            # The last line may still be written, only the complete lines are analysed
+            end = ApacheLogParser(path).get_end_of_complete_lines()
+        if args.state:
+            checkpoint = ApacheLogCheckpoint(args.state)
+            start = checkpoint.load(path, analyser)
+            if (args.verbose):
+                if checkpoint.resumed:
+                    print(f"Resume the analysis at byte {start}.")
+                else:
+                    print("No valid state for this file, start of a new analysis.")
+        if args.cache or args.backend == "numpy":
+            # Load the parsed files from their cache (parsed and cached if needed),
+            # or parse them in memory for the NumPy backend,
+            # the entries are selected on the columns then analysed
+            numpy_backend = None
+            if args.backend == "numpy":
+                # NumPy is only imported by the NumPy backend
+                from analysis.apache_log_numpy_backend import ApacheLogNumpyBackend
+                numpy_backend = ApacheLogNumpyBackend()
+            total_lines = 0
+            for file_path in args.file_paths:
+                if args.cache:
+                    cache = ApacheLogCache(file_path)
+                    with profiler.measure("read"):
+                        log_file = cache.get_file(args.rebuild_cache, args.engine)
+                    profiler.add_items("read", len(log_file.entries))
+                    if (args.verbose):
+                        if cache.loaded:
+                            print(f"Cache {cache.cache_path} loaded.")
+                        elif cache.saved:
+                            print(f"Cache {cache.cache_path} saved.")
+                        else:
+                            print(f"The cache {cache.cache_path} can't be saved.")
+                else:
+                    apache_log_parser = ApacheLogParser(file_path, engine=args.engine)
+                    with profiler.measure("parse"):
+                        log_file = apache_log_parser.get_file_parsed(columnar=True)
+                    profiler.add_items("parse", len(log_file.entries))
+                if numpy_backend is not None:
+                    with profiler.measure("analyse", len(log_file.entries)):
+                        numpy_backend.analyse_file(log_file, analyser)
+                else:
+                    profiler.analyse_columnar_file(log_file, filter, analyser)
+                total_lines += len(log_file.entries)
+            cache_info = MetadataInfo.get_cache_info()
+            cache_hits = cache_info.hits
+            cache_misses = cache_info.misses
+        elif args.workers > 1:
+            # Parse and analyse the files (or parts of the files) in several processes
+            # (the process pool is only imported with --workers)
+            from analysis.apache_log_parallel_analyser import ApacheLogParallelAnalyser
+            parallel_analyser = ApacheLogParallelAnalyser(args.file_paths, filter, args.workers,
+                                                          args.stats, args.engine, args.approximation,
+                                                          args.bucket_size,
+                                                          args.seek_tolerance if args.seek else None)
+            analyser.merge(parallel_analyser.get_analyser(start, end))
+            total_lines = parallel_analyser.total_lines
+            cache_hits = parallel_analyser.cache_hits
+            cache_misses = parallel_analyser.cache_misses
+        else:
+            total_lines = 0
+            for file_path in args.file_paths:
+                # Parse Apache log file (entries are streamed, not kept in memory)
+                # The lines surely rejected by the filter are skipped before parsing
+                apache_log_parser = ApacheLogParser(file_path, fields, filter.get_raw_line_filter(), args.engine)
+                file_start, file_end = start, end
+                if args.seek and not ApacheLogParser.is_compressed(file_path):
+                    # Only the lines of the dates of the filter are read
+                    file_start, file_end = apache_log_parser.get_date_range_offsets(
+                        *filter.get_date_range(), args.seek_tolerance)
+                # Analyse the Apache log file while it is parsed
+                profiler.analyse_file(apache_log_parser, analyser, file_start, file_end)
+                total_lines += apache_log_parser.total_lines
+            cache_info = MetadataInfo.get_cache_info()
+            cache_hits = cache_info.hits
+            cache_misses = cache_info.misses
+        if args.state:
+            checkpoint.save(path, analyser, end)
+        if (args.verbose):
+            print(f"{total_lines} lines analysed.")
+            print(f"User agent cache : {cache_hits} hits, {cache_misses} misses.")
         # Export the analysis (if --nooverride is given, disable override)
-        exporter = Exporter(args.output, not args.nooverride)
-        exporter.export_to_json(analysis)
+        exporter = Exporter(args.output, not args.nooverride, args.compact)
+        if args.format == "partial":
+            # Raw state of the analysis, merged later with the partials of other files (main.py merge)
+            exporter.export(ApacheLogPartial.get_partial(analyser), args.format)
+        else:
+            with profiler.measure("analyse"):
+                analysis = analyser.get_complete_analysis(args.details)
+            if args.profile:
+                # The profile is put in the analysis before its single export
+                analysis.setdefault("analysis", {})["profile"] = profiler.get_profile(total_lines)
+            with profiler.measure("export"):
+                exporter.export(analysis, args.format)
+            if args.profile:
+                profiler.stop()
+                profiler.add_items("export", os.path.getsize(args.output))
+                export = profiler.get_stage("export")
+                print(f"Export : {export['wall_seconds']} seconds, {export['bytes']} bytes "
+                      f"({export['bytes_per_second']} bytes per second).")
+        # Follow the lines appended to the file and export the analysis periodically
+        if args.follow:
+            if (args.verbose):
+                print(f"Follow the file, export every {args.interval} seconds (Ctrl+C to stop)...")
+            follower = ApacheLogFollower(
+                ApacheLogParser(path, fields, filter.get_raw_line_filter()), end)
+            try:
+                while True:
+                    time.sleep(args.interval)
+                    rotations = follower.rotations
+                    analyser.analyse_entries(follower.get_new_entries(stop_at_rotation=True))
+                    if follower.rotations != rotations:
+                        # The file was rotated or truncated: the analysis starts over
+                        # on the new file, like a new run (see ApacheLogCheckpoint)
+                        if (args.verbose):
+                            print("The file was rotated, start of a new analysis.")
+                        analyser = ApacheLogAnalyser(ApacheLogFile(path), filter, args.stats,
+                                                     args.approximation, args.bucket_size)
+                        analyser.analyse_entries(follower.get_new_entries())
+                    if args.state:
+                        checkpoint.save(path, analyser, follower.position)
+                    if args.format == "partial":
+                        exporter.export(ApacheLogPartial.get_partial(analyser), args.format)
+                    else:
+                        exporter.export(analyser.get_complete_analysis(args.details), args.format)
+            except KeyboardInterrupt:
+                if (args.verbose):
+                    print(f"End of the follow, {follower.parser.total_lines} new lines analysed.")
+            finally:
+                follower.close()
     # Error management
     except CliArgumentException as ex:
         print("/!\\ Error with the arguments given. /!\\")
@@ -39,6 +210,12 @@ if __name__ == "__main__":
     except InvalidFormatApacheLogException as ex:
         print("/!\\ Error with the Apache log file. /!\\")
         print(ex)
+    except CheckpointException as ex:
+        print("/!\\ Error with the state file. /!\\")
+        print(ex)
+    except PartialException as ex:
+        print("/!\\ Error with the partial analyses. /!\\")
+        print(ex)
     except ExportationException as ex:
         print("/!\\ Error in the analysis exportation /!\\")
         print(ex)
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Sequence
+from hashlib import blake2b
+from typing import Optional
+from export.atomic_file import open_atomic
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_log_columnar_file import ApacheLogColumnarFile, StringColumn
+
+
+class MappedStringValues(Sequence):
+    """
+    Class representing the distinct strings of a column stored in a cache file.
+
+    The strings are stored one after the other in UTF-8, with the offset of
+    their end. They are all decoded on the first access to the column only,
+    the code 0 is None.
+    """
+
+    def __init__(self, datas: memoryview, ends: memoryview):
+        self.__datas = datas
+        self.__ends = ends
+        self.__values = None
+
+    def __len__(self) -> int:
+        return len(self.__ends) + 1
+
+    def __getitem__(self, code: int) -> Optional[str]:
+        if self.__values is None:
+            self.__values = self.__decode()
+        return self.__values[code]
+
+    def __decode(self) -> list:
+        datas = bytes(self.__datas)
+        values = [None]
+        start = 0
+        for end in self.__ends:
+            values.append(str(datas[start:end], "utf-8", "surrogatepass"))
+            start = end
+        return values
+
+
+class ApacheLogCache:
+    """
+    Class for caching the parsed entries of an Apache log file in a binary columnar file.
+
+    The cache is a sidecar file next to the log (path of the log + ".cache")
+    which stores the columns of an ApacheLogColumnarFile: the integer columns
+    as raw arrays and the string columns as codes and distinct strings. It is
+    keyed by the path, the size, the modification time and a hash of the
+    content of the log (sampled blocks spread over the whole file). The next
+    runs map the cache in memory instead of parsing the log again: the integer
+    columns are read in place and the strings are only decoded when they are used.
+
+    Attributes:
+        log_path (str): The path of the log file.
+        cache_path (str): The path of the cache file.
+        loaded (bool): True if the last get_file loaded a valid cache.
+        saved (bool): True if the last get_file saved a new cache.
+    """
+
+    MAGIC = b"APLCACHE"
+    VERSION = 1
+
+    # Blocks of the log hashed to detect a change of its content
+    SAMPLE_SIZE = 64 * 1024
+    SAMPLES = 16
+
+    def __init__(self, log_path: str, cache_path: Optional[str] = None):
+        self.log_path = log_path
+        self.cache_path = cache_path if cache_path is not None else f"{log_path}.cache"
+        self.loaded = False
+        self.saved = False
+
+    def get_file(self, rebuild: bool = False, engine: str = "text") -> ApacheLogColumnarFile:
+        """
+        Returns the parsed log file, from the cache if it is valid, else the log
+        is parsed and the cache is saved (the analysis goes on if it can't be saved).
+
+        Args:
+            rebuild (bool): Parse the log even if the cache is valid.
+            engine (str): The engine reading the lines if the log is parsed (see ApacheLogParser.ENGINES).
+
+        Returns:
+            ApacheLogColumnarFile: The log file with its entries stored column-wise.
+        """
+        self.loaded = False
+        self.saved = False
+        key = self.get_key()
+        if not rebuild:
+            log_file = self.load(key)
+            if log_file is not None:
+                self.loaded = True
+                return log_file
+        log_file = ApacheLogParser(self.log_path, engine=engine).get_file_parsed(columnar=True)
+        try:
+            self.save(log_file, key)
+            self.saved = True
+        except OSError:
+            pass
+        return log_file
+
+    def get_key(self) -> dict:
+        """
+        Returns the key identifying the current content of the log file.
+
+        Returns:
+            dict: The absolute path, the size, the modification time and the content hash of the log.
+        """
+        stat = os.stat(self.log_path)
+        content_hash = blake2b(digest_size=16)
+        with open(self.log_path, 'rb') as file:
+            for index in range(self.SAMPLES):
+                file.seek(max(stat.st_size - self.SAMPLE_SIZE, 0) * index // (self.SAMPLES - 1))
+                content_hash.update(file.read(self.SAMPLE_SIZE))
+        return {
+            "path": os.path.abspath(self.log_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": content_hash.hexdigest()
+        }
+
+    def load(self, key: dict) -> Optional[ApacheLogColumnarFile]:
+        """
+        Maps the cache file in memory if it matches the key.
+
+        Args:
+            key (dict): The key of the log file (see get_key).
+
+        Returns:
+            Optional[ApacheLogColumnarFile]: The log file, None if the cache is missing,
+            invalid or outdated.
+        """
+        try:
+            with open(self.cache_path, 'rb') as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            header_size = len(self.MAGIC) + 8
+            if buffer[:len(self.MAGIC)] != self.MAGIC:
+                raise ValueError("Not a cache file.")
+            header_length, = struct.unpack("<Q", buffer[len(self.MAGIC):header_size])
+            header = json.loads(buffer[header_size:header_size + header_length])
+            if header.get("version") != self.VERSION or header.get("key") != key \
+                    or header.get("byteorder") != sys.byteorder:
+                raise ValueError("Outdated cache file.")
+            # The blocks start after the header, aligned on 8 bytes
+            data_start = header_size + header_length
+            datas = memoryview(buffer)[data_start + (-data_start % 8):]
+            columns = {}
+            for name, column in header["columns"].items():
+                codes = self.__get_array(datas, column["codes"])
+                if "ends" in column:
+                    values = MappedStringValues(self.__get_array(datas, column["datas"]),
+                                                self.__get_array(datas, column["ends"]))
+                    columns[name] = StringColumn(values, codes)
+                else:
+                    columns[name] = codes
+            return ApacheLogColumnarFile.from_columns(self.log_path, columns)
+        except (KeyError, TypeError, ValueError, struct.error):
+            return None
+
+    @staticmethod
+    def __get_array(datas: memoryview, description: list) -> memoryview:
+        typecode, itemsize, offset, length = description
+        if array(typecode).itemsize != itemsize:
+            raise ValueError("Incompatible cache file.")
+        if offset + length > len(datas):
+            raise ValueError("Truncated cache file.")
+        return datas[offset:offset + length].cast(typecode)
+
+    def save(self, log_file: ApacheLogColumnarFile, key: dict):
+        """
+        Saves the columns of a log file in the cache file.
+        The cache file is replaced atomically.
+
+        Args:
+            log_file (ApacheLogColumnarFile): The parsed log file.
+            key (dict): The key of the log file (see get_key).
+        """
+        # The offsets of the blocks are relative to the end of the header, they are aligned on 8 bytes
+        blocks = []
+        offset = 0
+        def add_block(typecode: str, datas: bytes) -> list:
+            nonlocal offset
+            description = [typecode, array(typecode).itemsize, offset, len(datas)]
+            blocks.append(datas)
+            padding = -len(datas) % 8
+            if padding:
+                blocks.append(bytes(padding))
+            offset += len(datas) + padding
+            return description
+        columns = {}
+        for name in ApacheLogColumnarFile.STRING_COLUMNS:
+            column = getattr(log_file, name)
+            encoded = [value.encode("utf-8", "surrogatepass") for value in column.values[1:]]
+            ends = array("q")
+            end = 0
+            for value in encoded:
+                end += len(value)
+                ends.append(end)
+            columns[name] = {
+                "codes": add_block("I", array("I", column.codes).tobytes()),
+                "ends": add_block("q", ends.tobytes()),
+                "datas": add_block("B", b"".join(encoded))
+            }
+        for name, typecode in ApacheLogColumnarFile.INTEGER_COLUMNS.items():
+            columns[name] = {"codes": add_block(typecode, array(typecode, getattr(log_file, name)).tobytes())}
+        header = {
+            "version": self.VERSION,
+            "key": key,
+            "byteorder": sys.byteorder,
+            "entries": len(log_file.entries),
+            "columns": columns
+        }
+        encoded_header = json.dumps(header).encode()
+        header_end = len(self.MAGIC) + 8 + len(encoded_header)
+        with open_atomic(self.cache_path, 'wb') as file:
+            file.write(self.MAGIC)
+            file.write(struct.pack("<Q", len(encoded_header)))
+            file.write(encoded_header)
+            file.write(bytes(-header_end % 8))
+            for block in blocks:
+                file.write(block)
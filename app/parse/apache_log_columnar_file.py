@@ -0,0 +1,303 @@
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional, Sequence as SequenceType
+from parse.apache_log_entry import ApacheLogEntry
+from data.client_info import ClientInfo
+from data.request_info import RequestInfo
+from data.response_info import ResponseInfo
+from data.metadata_info import MetadataInfo
+
+# Value stored in the integer columns when the field is missing
+MISSING_VALUE = -1
+# Value stored in the timezone offset column when the timestamp is missing
+MISSING_OFFSET = -(2 ** 31)
+
+class StringColumn:
+    """
+    Class representing a column of strings stored as dictionary codes.
+
+    Every distinct string is stored once, the column only keeps the
+    code of the string of each entry. The code 0 is reserved for None.
+
+    Attributes:
+        values (Sequence): The distinct strings, indexed by their code.
+        codes (Sequence[int]): The code of the string of each entry.
+    """
+
+    def __init__(self, values: Optional[SequenceType] = None, codes: Optional[SequenceType[int]] = None):
+        """
+        Initializes an empty column, or a column from existing values and codes
+        (for example read from a cache, see ApacheLogCache). Only the empty
+        columns can be appended.
+
+        Args:
+            values (Optional[Sequence]): The distinct strings, None first.
+            codes (Optional[Sequence[int]]): The code of the string of each entry.
+        """
+        if values is None:
+            self.values = [None]
+            self.codes = array("I")
+            self.__index = {None: 0}
+        else:
+            self.values = values
+            self.codes = codes
+            # The index of the strings is only built if a code is looked up
+            self.__index = None
+
+    def append(self, value: Optional[str]):
+        """
+        Adds the string of a new entry.
+
+        Args:
+            value (Optional[str]): The string of the entry.
+        """
+        code = self.__index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.__index[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def get_code(self, value: Optional[str]) -> Optional[int]:
+        """
+        Returns the code of a string, or None if no entry has this string.
+        """
+        if self.__index is None:
+            self.__index = {string: code for code, string in enumerate(self.values)}
+        return self.__index.get(value)
+
+    def get_snapshot(self, length: int) -> "StringColumn":
+        """
+        Returns a column with the first entries of this one, which isn't changed
+        by the next appends (the codes and the list of the strings are copied,
+        not the strings themselves).
+
+        Args:
+            length (int): The number of entries of the snapshot.
+
+        Returns:
+            StringColumn: The snapshot, it can't be appended.
+        """
+        return StringColumn(self.values[:], self.codes[:length])
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        return self.values[self.codes[index]]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class ApacheLogEntryView:
+    """
+    Class representing a lightweight view on an entry of an ApacheLogColumnarFile.
+
+    The view only keeps the index of the entry, the information objects
+    (ClientInfo, RequestInfo, ResponseInfo and MetadataInfo) are built from
+    the columns when they are first accessed, so the view has the same
+    attributes as an ApacheLogEntry.
+    """
+
+    __slots__ = ("file", "index", "__client_info", "__request_info", "__response_info", "__metadata_info")
+
+    def __init__(self, file: "ApacheLogColumnarFile", index: int):
+        self.file = file
+        self.index = index
+        self.__client_info = None
+        self.__request_info = None
+        self.__response_info = None
+        self.__metadata_info = None
+
+    @property
+    def client_info(self) -> ClientInfo:
+        if self.__client_info is None:
+            file, index = self.file, self.index
+            self.__client_info = ClientInfo(file.client_ips[index], file.rfc_ids[index], file.remote_users[index])
+        return self.__client_info
+
+    @property
+    def request_info(self) -> RequestInfo:
+        if self.__request_info is None:
+            file, index = self.file, self.index
+            self.__request_info = RequestInfo(file.methods[index], file.urls[index],
+                                              file.protocols[index], file.get_timestamp(index))
+        return self.__request_info
+
+    @property
+    def response_info(self) -> ResponseInfo:
+        if self.__response_info is None:
+            file, index = self.file, self.index
+            status_code = file.status_codes[index]
+            response_size = file.response_sizes[index]
+            self.__response_info = ResponseInfo(status_code if status_code != MISSING_VALUE else None,
+                                                response_size if response_size != MISSING_VALUE else None)
+        return self.__response_info
+
+    @property
+    def metadata_info(self) -> MetadataInfo:
+        if self.__metadata_info is None:
+            file, index = self.file, self.index
+            self.__metadata_info = MetadataInfo(file.referers[index], file.user_agents[index])
+        return self.__metadata_info
+
+
+class ApacheLogColumnarEntries(Sequence):
+    """
+    Class representing the entries of an ApacheLogColumnarFile as a sequence of views.
+    """
+
+    def __init__(self, file: "ApacheLogColumnarFile"):
+        self.file = file
+
+    def __len__(self) -> int:
+        return len(self.file.status_codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ApacheLogEntryView(self.file, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return ApacheLogEntryView(self.file, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield ApacheLogEntryView(self.file, index)
+
+
+class ApacheLogColumnarFile:
+    """
+    Class representing an Apache log file with its entries stored column-wise.
+
+    This class is an alternative to ApacheLogFile when the entries must be kept
+    in memory. Instead of one object graph per line, every field is stored in a
+    column: the integers in arrays (timestamps as epoch seconds) and the strings
+    as dictionary codes (see StringColumn). The entries are read through
+    lightweight views with the same attributes as ApacheLogEntry.
+
+    Attributes:
+        path (str): The path of the file.
+        entries (ApacheLogColumnarEntries): The views on the entries of the file.
+    """
+
+    # Columns of the file: the string columns and the integer columns with their typecode
+    STRING_COLUMNS = ("client_ips", "rfc_ids", "remote_users", "methods", "urls",
+                      "protocols", "referers", "user_agents")
+    INTEGER_COLUMNS = {"timestamps": "q", "timezone_offsets": "i", "status_codes": "i", "response_sizes": "q"}
+
+    def __init__(self, path):
+        self.path = path
+        self.client_ips = StringColumn()
+        self.rfc_ids = StringColumn()
+        self.remote_users = StringColumn()
+        self.methods = StringColumn()
+        self.urls = StringColumn()
+        self.protocols = StringColumn()
+        self.timestamps = array("q")
+        self.timezone_offsets = array("i")
+        self.status_codes = array("i")
+        self.response_sizes = array("q")
+        self.referers = StringColumn()
+        self.user_agents = StringColumn()
+        self.__timezones = {}
+
+    @classmethod
+    def from_columns(cls, path: str, columns: dict) -> "ApacheLogColumnarFile":
+        """
+        Creates a file from existing columns (for example read from a cache, see ApacheLogCache).
+
+        Args:
+            path (str): The path of the file.
+            columns (dict): The columns by name, StringColumn for the STRING_COLUMNS
+                and sequences of integers for the INTEGER_COLUMNS.
+
+        Returns:
+            ApacheLogColumnarFile: The file, its entries can't be appended.
+        """
+        file = cls(path)
+        for name in cls.STRING_COLUMNS + tuple(cls.INTEGER_COLUMNS):
+            setattr(file, name, columns[name])
+        return file
+
+    def get_snapshot(self) -> "ApacheLogColumnarFile":
+        """
+        Returns a file with the current entries of this one, which isn't changed
+        by the next calls of add_entry (see StringColumn.get_snapshot),
+        so it can be read by a thread while the entries are appended by another one.
+        The caller must make sure no entry is added during the copy.
+
+        Returns:
+            ApacheLogColumnarFile: The snapshot, its entries can't be appended.
+        """
+        length = len(self.status_codes)
+        columns = {name: getattr(self, name).get_snapshot(length) for name in self.STRING_COLUMNS}
+        columns.update({name: getattr(self, name)[:length] for name in self.INTEGER_COLUMNS})
+        return self.from_columns(self.path, columns)
+
+    @property
+    def entries(self) -> ApacheLogColumnarEntries:
+        return ApacheLogColumnarEntries(self)
+
+    def get_entries(self, indices: Iterable[int]) -> Iterator[ApacheLogEntryView]:
+        """
+        Yields the views on the entries at the given indices.
+
+        Args:
+            indices (Iterable[int]): The indices of the entries (see ApacheLogFilter.get_columnar_indices).
+
+        Returns:
+            Iterator[ApacheLogEntryView]: The views on the entries.
+        """
+        for index in indices:
+            yield ApacheLogEntryView(self, index)
+
+    def add_entry(self, entry: ApacheLogEntry):
+        """
+        Add a new entry.
+
+        Args:
+            entry (ApacheLogEntry): The entry of the Apache log.
+        """
+        client_info = entry.client_info
+        self.client_ips.append(client_info.client_ip)
+        self.rfc_ids.append(client_info.rfc_id)
+        self.remote_users.append(client_info.remote_user)
+        request_info = entry.request_info
+        self.methods.append(request_info.method)
+        self.urls.append(request_info.url)
+        self.protocols.append(request_info.protocol)
+        timestamp = request_info.timestamp
+        if timestamp is not None:
+            self.timestamps.append(int(timestamp.timestamp()))
+            self.timezone_offsets.append(int(timestamp.utcoffset().total_seconds()))
+        else:
+            self.timestamps.append(0)
+            self.timezone_offsets.append(MISSING_OFFSET)
+        response_info = entry.response_info
+        status_code = response_info.status_code
+        response_size = response_info.response_size
+        self.status_codes.append(status_code if status_code is not None else MISSING_VALUE)
+        self.response_sizes.append(response_size if response_size is not None else MISSING_VALUE)
+        metadata_info = entry.metadata_info
+        self.referers.append(metadata_info.referer)
+        self.user_agents.append(metadata_info.user_agent)
+
+    def get_timestamp(self, index: int) -> Optional[datetime]:
+        """
+        Returns the aware datetime of an entry, rebuilt from the epoch and timezone columns.
+
+        Args:
+            index (int): The index of the entry.
+
+        Returns:
+            Optional[datetime]: The timestamp of the entry (None if missing).
+        """
+        offset = self.timezone_offsets[index]
+        if offset == MISSING_OFFSET:
+            return None
+        tz = self.__timezones.get(offset)
+        if tz is None:
+            tz = timezone(timedelta(seconds=offset))
+            self.__timezones[offset] = tz
+        return datetime.fromtimestamp(self.timestamps[index], tz)
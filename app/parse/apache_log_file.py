@@ -1,5 +1,4 @@
-
-from typing import List
+from typing import Iterable, Optional
 from parse.apache_log_entry import ApacheLogEntry
 
 class ApacheLogFile:
@@ -7,21 +6,23 @@ class ApacheLogFile:
     Class representing an Apache log file containing multiple log entries.
 
     This class encapsulates the information about a Apache log file.
+    The entries can either be kept in memory (list) or be streamed
+    from a generator, in which case they can only be iterated once.
 
     Attributes:
         path (str): The path of the file.
-        entries (List[ApacheLogEntry]): The list of the entries founded in the file.
+        entries (Iterable[ApacheLogEntry]): The entries founded in the file.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, entries: Optional[Iterable[ApacheLogEntry]] = None):
         self.path = path
-        self.entries = []
+        self.entries = entries if entries is not None else []
 
-    def add_entry(self, entry: List[ApacheLogEntry]):
+    def add_entry(self, entry: ApacheLogEntry):
         """
         Add a new entry.
 
         Args:
             entry (LogEntry): The entry of the Apache log.
         """
-        self.entries.append(entry)
\ No newline at end of file
+        self.entries.append(entry)
@@ -0,0 +1,97 @@
+import os
+from typing import Iterator
+from parse.apache_log_entry import ApacheLogEntry
+from parse.apache_log_parser import ApacheLogParser
+
+class ApacheLogFollower:
+    """
+    Class for following an Apache log file while lines are appended (like tail -f).
+
+    The file is kept open, each call of get_new_entries returns the entries of
+    the complete lines appended since the previous call. A last line without
+    newline is kept until it is complete. If the file is rotated (the path
+    points to another file) or truncated, the new file is followed from its
+    beginning.
+
+    Attributes:
+        parser (ApacheLogParser): The parser of the lines.
+        position (int): The byte offset after the last complete line read.
+        rotations (int): The number of rotations or truncations detected.
+    """
+
+    # Maximum number of bytes read at once
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, parser: ApacheLogParser, start: int = 0):
+        self.parser = parser
+        self.position = start
+        self.rotations = 0
+        self.__file = None
+        self.__open(start)
+
+    def __open(self, start: int):
+        if self.__file is not None:
+            self.__file.close()
+        self.__file = open(self.parser.path, 'rb')
+        self.__file.seek(start)
+        self.__buffer = b""
+        self.position = start
+
+    def __is_rotated(self) -> bool:
+        try:
+            stat = os.stat(self.parser.path)
+        except FileNotFoundError:
+            # The new file isn't created yet
+            return False
+        opened_stat = os.fstat(self.__file.fileno())
+        if (stat.st_dev, stat.st_ino) != (opened_stat.st_dev, opened_stat.st_ino):
+            return True
+        return stat.st_size < self.position + len(self.__buffer)
+
+    def get_new_entries(self, stop_at_rotation: bool = False) -> Iterator[ApacheLogEntry]:
+        """
+        Yields the entries of the lines appended since the last call.
+
+        Args:
+            stop_at_rotation (bool): Stop after the last lines of the old file if the file
+                was rotated (rotations is incremented), the lines of the new file are
+                yielded by the next call. So the entries of both files can be told apart.
+
+        Returns:
+            Iterator[ApacheLogEntry]: The new entries.
+        """
+        return self.parser.get_entries_from_lines(self.__read_new_lines(stop_at_rotation))
+
+    def __read_new_lines(self, stop_at_rotation: bool) -> Iterator[str]:
+        if self.__is_rotated():
+            # Finish the lines of the old file before following the new one
+            yield from self.__read_available_lines()
+            self.rotations += 1
+            self.__open(0)
+            if stop_at_rotation:
+                return
+        yield from self.__read_available_lines()
+
+    def __read_available_lines(self) -> Iterator[str]:
+        while True:
+            data = self.__file.read(self.READ_SIZE)
+            if not data:
+                return
+            data = self.__buffer + data
+            last_newline = data.rfind(b"\n")
+            if last_newline == -1:
+                self.__buffer = data
+                continue
+            self.__buffer = data[last_newline + 1:]
+            for line in data[:last_newline].split(b"\n"):
+                self.position += len(line) + 1
+                # The invalid UTF-8 bytes are replaced, like in the parser
+                yield line.decode(errors="replace") + "\n"
+
+    def close(self):
+        """
+        Closes the file followed.
+        """
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
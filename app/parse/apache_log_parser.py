@@ -1,8 +1,15 @@
 
 import os
-from re import compile
-from datetime import datetime
+import bz2
+import gzip
+import lzma
+import mmap
+from datetime import datetime, timedelta
+from re import compile, Pattern
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+from parse.apache_timestamp_decoder import ApacheTimestampDecoder
 from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_columnar_file import ApacheLogColumnarFile
 from parse.apache_log_entry import ApacheLogEntry
 from data.client_info import ClientInfo
 from data.request_info import RequestInfo
@@ -13,6 +20,11 @@ class InvalidFormatApacheLogException(Exception):
 
     def __init__(self, line):
         super().__init__(f'The format of the line "{line}" is invalid.')
+        self.line = line
+
+    def __reduce__(self):
+        # Keep the message unchanged when sent back by a worker process
+        return (self.__class__, (self.line,))
 
 class ApacheLogParser:
 
@@ -23,50 +35,435 @@ class ApacheLogParser:
         r'\s?("(?P<referer>.*?)" "(?P<user_agent>.*?)")?'
     )
 
-    def __init__(self, path: str):
+    # Fields which can be extracted from a line (names of the groups of LOG_PATTERN)
+    FIELDS = ("ip", "rfc", "user", "timestamp", "method", "url", "protocol",
+              "status", "size", "referer", "user_agent")
+
+    # Patterns specialised to a set of fields
+    __patterns = {}
+
+    # Functions opening the compressed files, by extension
+    COMPRESSIONS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+    # Engines reading the lines: decoded text lines or bytes regex over the memory-mapped file
+    ENGINES = ("text", "mmap")
+
+    # Timestamp of a raw line, used to seek a date in the file
+    TIMESTAMP_PATTERN = compile(rb'\d{2}/[A-Za-z]{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4}')
+
+    # Size of the byte range under which the seek of a date reads the lines one by one
+    SEEK_SCAN_SIZE = 64 * 1024
+
+    def __init__(self, path: str,
+                 fields: Optional[Iterable[str]] = None,
+                 line_filter: Optional[Callable[[Union[str, bytes]], bool]] = None,
+                 engine: str = "text"):
+        """
+        Initializes a new Apache log parser.
+
+        Args:
+            path (str): The path of the Apache log file.
+            fields (Optional[Iterable[str]]): The fields needed (see FIELDS), all if None.
+                The other fields are not extracted nor converted and are None in the entries.
+            line_filter (Optional[Callable[[Union[str, bytes]], bool]]): A check run on the raw lines
+                before they are parsed (see ApacheLogFilter.pass_raw_line),
+                the lines rejected are skipped. The mmap engine gives it bytes.
+            engine (str): The engine reading the lines (see ENGINES). The mmap engine
+                runs a bytes pattern over the memory-mapped file and only decodes the
+                captured fields, the invalid UTF-8 bytes are replaced. Each field is
+                decoded apart, so the mmap engine is only faster than the text engine
+                when few fields are needed (the status codes only for example).
+                The compressed files are always read by the text engine.
+        """
         #Check if file exists
         if not os.path.isfile(path):
             raise FileNotFoundError(f"Le fichier {path} est introuvable.")
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine}.")
         self.path = path
+        self.engine = "text" if self.is_compressed(path) else engine
+        self.fields = frozenset(fields) if fields is not None else frozenset(self.FIELDS)
+        self.line_filter = line_filter
+        self.total_lines = 0
+        self.__pattern = self.get_pattern(self.fields, self.engine == "mmap")
+        self.__timestamp_decoder = ApacheTimestampDecoder()
+
+    @classmethod
+    def is_compressed(cls, path: str) -> bool:
+        """
+        Returns True if the file is compressed (see COMPRESSIONS).
+        A compressed file is read transparently but can't be split in byte ranges.
+        """
+        return os.path.splitext(path)[1].lower() in cls.COMPRESSIONS
+
+    def __open(self):
+        extension = os.path.splitext(self.path)[1].lower()
+        return self.COMPRESSIONS.get(extension, open)(self.path, 'rb')
+
+    @classmethod
+    def get_pattern(cls, fields: Iterable[str], binary: bool = False) -> Pattern:
+        """
+        Returns a compiled pattern which only captures the given fields.
+        The lines are validated the same way as LOG_PATTERN, but the groups
+        of the unneeded fields are not captured and the referer and user agent
+        part is skipped if they are not needed.
+
+        Args:
+            fields (Iterable[str]): The fields to capture.
+            binary (bool): Return a pattern matching bytes instead of str, which
+                matches a whole line with its newline (see the mmap engine).
+
+        Returns:
+            Pattern: The compiled pattern.
+        """
+        fields = frozenset(fields)
+        if fields >= frozenset(cls.FIELDS) and not binary:
+            return cls.LOG_PATTERN
+        pattern = cls.__patterns.get((fields, binary))
+        if pattern is None:
+            def group(name, regex):
+                return f'(?P<{name}>{regex})' if name in fields else regex
+            not_space = r'\S+'
+            regex = (
+                group("ip", not_space) + ' ' + group("rfc", not_space) + ' ' + group("user", not_space)
+                + r' \[?' + group("timestamp", r'.+?') + r'\]?'
+                + ' "(?:' + group("method", not_space) + ' ' + group("url", not_space)
+                + ' ' + group("protocol", not_space) + '|-)"'
+                + ' ' + group("status", r'\d+') + ' ' + group("size", not_space)
+            )
+            if "referer" in fields or "user_agent" in fields:
+                regex += r'\s?(?:"' + group("referer", r'.*?') + '" "' + group("user_agent", r'.*?') + '")?'
+            if fields >= frozenset(cls.FIELDS):
+                regex = cls.LOG_PATTERN.pattern
+            if binary:
+                # The bytes pattern runs over the whole file: a line is matched
+                # from its start to its newline and never goes over the next one
+                regex = '(?m)^(?:' + regex.replace(r'\s?', r'[^\S\n]?') + r')[^\n]*(?:\n|\Z)'
+                pattern = compile(regex.encode())
+            else:
+                pattern = compile(regex)
+            cls.__patterns[(fields, binary)] = pattern
+        return pattern
+
+    def get_file_parsed(self, columnar: bool = False):
+        """
+        Returns the Apache log file with all its entries kept in memory.
+
+        Args:
+            columnar (bool): Store the entries column-wise (ApacheLogColumnarFile)
+                instead of one object graph per line (ApacheLogFile).
+
+        Returns:
+            ApacheLogFile | ApacheLogColumnarFile: The Apache log file parsed.
+        """
+        return self.__parse_file(columnar)
+
+    def get_file_streamed(self, start: int = 0, end: Optional[int] = None) -> ApacheLogFile:
+        """
+        Returns the Apache log file with its entries streamed from a generator.
+        The entries are parsed on demand and never kept in memory,
+        so they can only be iterated once.
+
+        Args:
+            start (int): The byte offset of the first line to parse.
+            end (Optional[int]): The byte offset where the parsing stops (end of file if None).
+
+        Returns:
+            ApacheLogFile: The Apache log file with streamed entries.
+        """
+        return ApacheLogFile(self.path, self.get_entries(start, end))
+
+    def get_entries(self, start: int = 0, end: Optional[int] = None) -> Iterator[ApacheLogEntry]:
+        """
+        Yields the entries of the file one by one.
+        The number of lines read is counted in total_lines.
+        A byte range can be given to parse only a part of the file,
+        the offsets must be aligned on the start of a line (see get_chunks).
+        The compressed files are decompressed on the fly (see COMPRESSIONS),
+        their offsets are positions in the decompressed datas.
+
+        Args:
+            start (int): The byte offset of the first line to parse.
+            end (Optional[int]): The byte offset where the parsing stops (end of file if None).
+
+        Returns:
+            Iterator[ApacheLogEntry]: The entries of the file.
+        """
+        if self.engine == "mmap":
+            return self.__get_entries_mapped(start, end)
+        return self.get_entries_from_lines(self.read_lines(start, end))
+
+    def get_entries_from_lines(self, lines: Iterable[str]) -> Iterator[ApacheLogEntry]:
+        """
+        Yields the entries of the given lines of the file one by one.
+        The number of lines read is counted in total_lines.
+
+        Args:
+            lines (Iterable[str]): The raw lines.
+
+        Returns:
+            Iterator[ApacheLogEntry]: The entries of the lines.
+        """
+        line_filter = self.line_filter
+        for line in lines:
+            self.total_lines += 1
+            if line_filter is not None and not line_filter(line):
+                continue
+            yield self.__parse_line(line)
 
-    def get_file_parsed(self):
-        return self.__parse_file()
+    def read_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """
+        Yields the raw lines of the file one by one, decoded but not parsed
+        (see get_entries_from_lines). The lines aren't counted in total_lines.
+        The invalid UTF-8 bytes are replaced, like in the mmap engine.
 
-    def __parse_file(self) -> ApacheLogFile:
+        Args:
+            start (int): The byte offset of the first line to read.
+            end (Optional[int]): The byte offset where the reading stops (end of file if None).
+
+        Returns:
+            Iterator[str]: The lines, with their newline.
+        """
         #Check if file exists
         if not os.path.isfile(self.path):
             raise FileNotFoundError()
-        #Get lines of the file
-        log_file = ApacheLogFile(self.path)
-        with open(self.path, 'r') as file:
+        with self.__open() as file:
+            if start:
+                file.seek(start)
+            position = start
             for line in file:
-                log_file.add_entry(self.__parse_line(line))
+                if end is not None and position >= end:
+                    break
+                position += len(line)
+                yield line.decode(errors="replace")
+
+    def __get_entries_mapped(self, start: int, end: Optional[int]) -> Iterator[ApacheLogEntry]:
+        #Check if file exists
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError()
+        with open(self.path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            end = size if end is None else min(end, size)
+            if start >= end:
+                # An empty file can't be mapped
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                position = start
+                if self.line_filter is None:
+                    # The pattern scans the mapped datas line after line, without copying them
+                    for matched in self.__pattern.finditer(buffer, start, end):
+                        if matched.start() != position:
+                            # The line at position was skipped by the pattern
+                            break
+                        position = matched.end()
+                        self.total_lines += 1
+                        yield self.__get_entry_mapped(matched)
+                else:
+                    match = self.__pattern.match
+                    line_filter = self.line_filter
+                    while position < end:
+                        line_end = buffer.find(b"\n", position, end)
+                        line_end = end if line_end == -1 else line_end + 1
+                        self.total_lines += 1
+                        # Only the lines kept by the filter are matched
+                        if line_filter(buffer[position:line_end]):
+                            matched = match(buffer, position, line_end)
+                            if not matched:
+                                break
+                            yield self.__get_entry_mapped(matched)
+                        position = line_end
+                if position < end:
+                    line_end = buffer.find(b"\n", position, end)
+                    line = buffer[position:end if line_end == -1 else line_end]
+                    raise InvalidFormatApacheLogException(line.decode(errors="replace").rstrip())
+
+    def __get_entry_mapped(self, matched) -> ApacheLogEntry:
+        # Only the captured fields are decoded, the invalid UTF-8 bytes are replaced
+        return self.__get_entry({
+            name: value.decode(errors="replace")
+            for name, value in matched.groupdict().items() if value is not None
+        })
+
+    def get_timestamp_cache_info(self) -> dict:
+        """
+        Returns the statistics of the memoization of the timestamp decoder.
+
+        Returns:
+            dict: The timestamps decoded from a memoized second or minute (hits),
+            the ones whose minute was decoded (misses) and the ones decoded by strptime (fallbacks).
+        """
+        decoder = self.__timestamp_decoder
+        return {"hits": decoder.hits, "misses": decoder.misses, "fallbacks": decoder.fallbacks}
+
+    def get_chunks(self, number: int, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Splits the file in byte ranges of about the same size.
+        Every range starts at the beginning of a line and ends after a newline
+        (or at the end of the file), so the ranges can be parsed independently.
+
+        Args:
+            number (int): The number of ranges wanted.
+            start (int): The byte offset where the first range starts (start of a line).
+            end (Optional[int]): The byte offset where the last range ends (end of file if None).
+
+        Returns:
+            List[Tuple[int, int]]: The (start, end) byte offsets of each range, in file order.
+        """
+        if end is None:
+            end = os.path.getsize(self.path)
+        offsets = [start]
+        with open(self.path, 'rb') as file:
+            for index in range(1, number):
+                offset = max(start + (end - start) * index // number, offsets[-1])
+                if offset >= end:
+                    break
+                #Move the offset after the next newline
+                file.seek(offset - 1 if offset > 0 else 0)
+                file.readline()
+                offset = file.tell()
+                if offset > offsets[-1] and offset < end:
+                    offsets.append(offset)
+        offsets.append(max(end, start))
+        return [(offsets[index], offsets[index + 1]) for index in range(len(offsets) - 1)]
+
+    def get_end_of_complete_lines(self) -> int:
+        """
+        Returns the byte offset after the last newline of the file.
+        A last line without newline may still be written, so it is excluded.
+
+        Returns:
+            int: The offset of the end of the last complete line.
+        """
+        end = os.path.getsize(self.path)
+        with open(self.path, 'rb') as file:
+            while end > 0:
+                block_start = max(end - 65536, 0)
+                file.seek(block_start)
+                block = file.read(end - block_start)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    return block_start + newline + 1
+                end = block_start
+        return 0
+
+    def get_date_range_offsets(self, start: datetime, end: datetime, tolerance: int = 60) -> Tuple[int, int]:
+        """
+        Returns the byte range of the lines between two dates, for a file written in time order.
+        The range is found by bisection: the reader seeks to a byte offset, goes to
+        the start of the next line and reads its timestamp, so only a few blocks of
+        the file are read. The dates are compared with the local time written in the log.
+        The range is widened by a tolerance window, so the lines a bit out of order
+        are kept: the entries must still be filtered by date.
+
+        Args:
+            start (datetime): The start of the range (naive local time).
+            end (datetime): The end of the range, excluded (naive local time).
+            tolerance (int): The tolerance window, in seconds.
+
+        Returns:
+            Tuple[int, int]: The byte offsets of the first line of the range and of the end of the range.
+
+        Raises:
+            ValueError: If the file is compressed (it can't be read at a byte offset).
+        """
+        if self.is_compressed(self.path):
+            raise ValueError(f"The compressed file {self.path} can't be seeked.")
+        size = os.path.getsize(self.path)
+        window = timedelta(seconds=tolerance)
+        with open(self.path, 'rb') as file:
+            start_offset = self.__seek_date(file, start - window, 0, size)
+            end_offset = self.__seek_date(file, end + window, start_offset, size)
+        return start_offset, end_offset
+
+    def __seek_date(self, file, date: datetime, low: int, high: int) -> int:
+        # Offset of the first line from low with a date greater or equal (high if none).
+        # low is always the start of a line after lines before the date, high the
+        # start of a line at or after the date (or the end of the file).
+        while high - low > self.SEEK_SCAN_SIZE:
+            middle = (low + high) // 2
+            line_start, line_end, line_date = self.__read_dated_line(file, middle, high)
+            if line_date is None:
+                # No dated line in the second half, the first half is read line by line
+                break
+            if line_date < date:
+                low = line_end
+            else:
+                high = line_start
+        file.seek(low)
+        position = low
+        while position < high:
+            line = file.readline()
+            if not line:
+                break
+            line_date = self.__get_line_date(line)
+            if line_date is not None and line_date >= date:
+                return position
+            position += len(line)
+        return high
+
+    def __read_dated_line(self, file, offset: int, high: int) -> Tuple[int, int, Optional[datetime]]:
+        # Start, end and local date of the first dated line starting from offset (before high)
+        if offset > 0:
+            # Resync on the start of the next line
+            file.seek(offset - 1)
+            file.readline()
+        else:
+            file.seek(0)
+        line_start = file.tell()
+        while line_start < high:
+            line = file.readline()
+            if not line:
+                break
+            line_date = self.__get_line_date(line)
+            if line_date is not None:
+                return line_start, line_start + len(line), line_date
+            line_start += len(line)
+        return line_start, line_start, None
+
+    def __get_line_date(self, line: bytes) -> Optional[datetime]:
+        match = self.TIMESTAMP_PATTERN.search(line)
+        if not match:
+            return None
+        try:
+            return self.__timestamp_decoder.decode(match.group().decode(errors="replace")).replace(tzinfo=None)
+        except ValueError:
+            return None
+
+    def __parse_file(self, columnar: bool):
+        #Get lines of the file
+        log_file = ApacheLogColumnarFile(self.path) if columnar else ApacheLogFile(self.path)
+        for entry in self.get_entries():
+            log_file.add_entry(entry)
         return log_file
 
     def __parse_line(self, line: str) -> ApacheLogEntry:
         #Analyse of the line
-        match =  self.LOG_PATTERN.match(line)
+        match =  self.__pattern.match(line)
         if not match:
-            raise InvalidFormatApacheLogException()
-        #Get the datas of the line
-        datas_line = match.groupdict()
+            raise InvalidFormatApacheLogException(line.rstrip())
+        #Get the datas of the line (only the fields captured by the pattern)
+        return self.__get_entry(match.groupdict())
+
+    def __get_entry(self, datas_line: dict) -> ApacheLogEntry:
         #Get the information of the client
-        client_ip = datas_line["ip"]
-        rfc_id = datas_line["rfc"]
-        remote_user = datas_line["user"]
+        client_ip = datas_line.get("ip")
+        rfc_id = datas_line.get("rfc")
+        remote_user = datas_line.get("user")
         client_info = ClientInfo(client_ip, rfc_id, remote_user)
         #Get the information of the request of the client
-        method = datas_line["method"]
-        url = datas_line["url"]
-        protocol = datas_line["protocol"]
-        timestamp = datetime.strptime(datas_line["timestamp"], "%d/%b/%Y:%H:%M:%S %z") if datas_line["timestamp"] else None
+        method = datas_line.get("method")
+        url = datas_line.get("url")
+        protocol = datas_line.get("protocol")
+        timestamp = self.__timestamp_decoder.decode(datas_line["timestamp"]) if datas_line.get("timestamp") else None
         request_info = RequestInfo(method, url, protocol, timestamp)
         #Get the information of the response of the server
-        status_code = int(datas_line["status"]) if datas_line["status"] != "-" else None
-        response_size = int(datas_line["size"]) if datas_line["size"] != "-" else None
+        status = datas_line.get("status")
+        size = datas_line.get("size")
+        status_code = int(status) if status is not None and status != "-" else None
+        response_size = int(size) if size is not None and size != "-" else None
         response_info = ResponseInfo(status_code, response_size)
         #Get the metadatas of the request
-        referer = datas_line["referer"]
-        user_agent = datas_line["user_agent"]
+        referer = datas_line.get("referer")
+        user_agent = datas_line.get("user_agent")
         metadata_info = MetadataInfo(referer, user_agent)
         return ApacheLogEntry(client_info, request_info, response_info, metadata_info)
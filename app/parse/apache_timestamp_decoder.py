@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+class ApacheTimestampDecoder:
+    """
+    Class for decoding the timestamps of an Apache log file.
+
+    The timestamps have a fixed format ("%d/%b/%Y:%H:%M:%S %z"), so the fields
+    are sliced at fixed offsets instead of using datetime.strptime.
+    Adjacent lines usually share the same minute, so the decoded prefix
+    (date, hour, minute) and the timezone of the previous timestamp are memoized.
+    Timestamps with an unexpected format fallback on datetime.strptime.
+
+    Attributes:
+        hits (int): The timestamps decoded from a memoized second or minute.
+        misses (int): The timestamps whose minute was decoded.
+        fallbacks (int): The timestamps decoded by datetime.strptime.
+    """
+
+    FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+    MONTHS = {
+        "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+        "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12
+    }
+
+    def __init__(self):
+        self.__last_timestamp = None
+        self.__last_datetime = None
+        self.__last_prefix = None
+        self.__last_suffix = None
+        self.__last_fields = None
+        self.__timezones = {}
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def decode(self, timestamp: str) -> datetime:
+        """
+        Decodes a timestamp of an Apache log file.
+
+        Args:
+            timestamp (str): The timestamp (for example "10/Oct/2000:13:55:36 -0700").
+
+        Returns:
+            datetime: The aware datetime of the timestamp.
+
+        Raises:
+            ValueError: If the timestamp doesn't match the Apache format.
+        """
+        # Same second as the previous line
+        if timestamp == self.__last_timestamp:
+            self.hits += 1
+            return self.__last_datetime
+        if len(timestamp) != 26:
+            self.fallbacks += 1
+            return datetime.strptime(timestamp, self.FORMAT)
+        second = timestamp[18:20]
+        if not second.isdigit() or timestamp[17] != ":" or timestamp[20] != " ":
+            self.fallbacks += 1
+            return datetime.strptime(timestamp, self.FORMAT)
+        # "DD/Mon/YYYY:HH:MM" is the prefix and "+HHMM" is the suffix
+        prefix = timestamp[:17]
+        suffix = timestamp[21:]
+        if prefix != self.__last_prefix or suffix != self.__last_suffix:
+            try:
+                fields = self.__decode_prefix(prefix, suffix)
+            except (KeyError, ValueError):
+                self.fallbacks += 1
+                return datetime.strptime(timestamp, self.FORMAT)
+            self.__last_prefix = prefix
+            self.__last_suffix = suffix
+            self.__last_fields = fields
+            self.misses += 1
+        else:
+            self.hits += 1
+        year, month, day, hour, minute, tz = self.__last_fields
+        result = datetime(year, month, day, hour, minute, int(second), tzinfo=tz)
+        self.__last_timestamp = timestamp
+        self.__last_datetime = result
+        return result
+
+    def __decode_prefix(self, prefix: str, suffix: str) -> tuple:
+        if prefix[2] != "/" or prefix[6] != "/" or prefix[11] != ":" or prefix[14] != ":":
+            raise ValueError(prefix)
+        for digits in (prefix[0:2], prefix[7:11], prefix[12:14], prefix[15:17]):
+            if not digits.isdigit():
+                raise ValueError(prefix)
+        fields = (int(prefix[7:11]), self.MONTHS[prefix[3:6]], int(prefix[0:2]),
+                  int(prefix[12:14]), int(prefix[15:17]), self.__get_timezone(suffix))
+        # Check the fields are a valid date
+        datetime(*fields[:5])
+        return fields
+
+    def __get_timezone(self, suffix: str) -> timezone:
+        tz = self.__timezones.get(suffix)
+        if tz is None:
+            # The minutes of the offset are checked like strptime does (00 to 59)
+            if suffix[0] not in "+-" or not suffix[1:].isdigit() or suffix[3] > "5":
+                raise ValueError(suffix)
+            offset = timedelta(hours=int(suffix[1:3]), minutes=int(suffix[3:5]))
+            tz = timezone(-offset if suffix[0] == "-" else offset)
+            self.__timezones[suffix] = tz
+        return tz
@@ -0,0 +1,211 @@
+import os
+import asyncio
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from time import perf_counter
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+from cli.cli_argument_parser import CliArgumentParser, CliArgumentException
+from parse.apache_log_file import ApacheLogFile
+from analysis.apache_log_analyser import ApacheLogAnalyser, DEFAULT_STATISTICS, BUCKET_SIZES
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_numpy_backend import ApacheLogNumpyBackend
+from export.exporter import Exporter
+from serve.apache_log_store import ApacheLogStore
+
+class ApacheLogServer:
+    """
+    Class serving the analyses of the entries of an ApacheLogStore over HTTP.
+
+    The server runs on asyncio, on a TCP port or on a Unix socket, and answers:
+        - GET /analysis: the analysis of the entries in memory (same JSON as
+          ApacheLogAnalyser.get_complete_analysis), with the parameters status,
+          date, ip, method, url (same syntax as the filters of the command line),
+          stats, bucket and details (true or false).
+        - GET /status: the state of the store (see ApacheLogStore.get_status).
+
+    The files are loaded then followed by a thread of ingestion, and the queries
+    are analysed by a pool of threads on the chunks of the store (with NumPy if it
+    is installed, see ApacheLogNumpyBackend), so the event loop is never blocked
+    and the queries don't wait for the ingestion. The queries received while the
+    files are loaded are analysed on the entries already loaded.
+
+    Attributes:
+        store (ApacheLogStore): The entries in memory.
+        host (str): The address listened.
+        port (int): The TCP port listened.
+        socket_path (Optional[str]): The Unix socket listened instead of the TCP port.
+        interval (float): Seconds between two reads of the lines appended to the files.
+        threads (int): Number of queries analysed at the same time.
+        verbose (bool): Print the requests and the errors of the ingestion.
+    """
+
+    # Parameters of the queries of /analysis
+    PARAMETERS = ("status", "date", "ip", "method", "url", "stats", "bucket", "details")
+
+    # Maximum size of the head of a request, in bytes
+    MAX_REQUEST_SIZE = 16 * 1024
+
+    def __init__(self, store: ApacheLogStore,
+                 host: str = "127.0.0.1",
+                 port: int = 8080,
+                 socket_path: Optional[str] = None,
+                 interval: float = 1.0,
+                 threads: int = 4,
+                 verbose: bool = False):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.interval = interval
+        self.threads = threads
+        self.verbose = verbose
+        self.__numpy_backend = ApacheLogNumpyBackend() if ApacheLogNumpyBackend.is_available() else None
+
+    def run(self):
+        """
+        Loads the files and serves the queries until the process is interrupted.
+        """
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.store.close()
+
+    async def serve(self):
+        """
+        Starts the ingestion and serves the queries forever.
+        """
+        self.__ingestion_executor = ThreadPoolExecutor(1)
+        self.__query_executor = ThreadPoolExecutor(self.threads)
+        try:
+            if self.socket_path is not None:
+                server = await asyncio.start_unix_server(self.__handle, self.socket_path,
+                                                         limit=self.MAX_REQUEST_SIZE)
+                address = self.socket_path
+            else:
+                server = await asyncio.start_server(self.__handle, self.host, self.port,
+                                                    limit=self.MAX_REQUEST_SIZE)
+                address = f"http://{self.host}:{self.port}"
+            if self.verbose:
+                print(f"Serve the analyses on {address} (Ctrl+C to stop)...")
+            ingestion = asyncio.create_task(self.__ingest())
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                ingestion.cancel()
+        finally:
+            self.__ingestion_executor.shutdown(wait=False, cancel_futures=True)
+            self.__query_executor.shutdown(wait=False, cancel_futures=True)
+            if self.socket_path is not None and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def __ingest(self):
+        loop = asyncio.get_running_loop()
+        started = perf_counter()
+        await loop.run_in_executor(self.__ingestion_executor, self.store.load)
+        if self.verbose:
+            lines = sum(file["lines"] for file in self.store.get_status()["files"].values())
+            print(f"{lines} lines loaded in {perf_counter() - started:.2f} seconds.")
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await loop.run_in_executor(self.__ingestion_executor, self.store.poll)
+            except Exception as ex:
+                # The files are read again at the next interval
+                if self.verbose:
+                    print(f"Error while reading the new lines: {ex}")
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+            status, body = await self.__respond(request_line)
+            if self.verbose:
+                print(f"{request_line} {status.value}")
+            writer.write(
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def __respond(self, request_line: str) -> tuple:
+        try:
+            method, target, _ = request_line.split(" ")
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, self.__encode({"error": "The request isn't valid."})
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, self.__encode({"error": f"The method {method} isn't allowed."})
+        url = urlsplit(target)
+        loop = asyncio.get_running_loop()
+        # The store and the analyses are read outside of the event loop
+        if url.path == "/status":
+            status = await loop.run_in_executor(self.__query_executor, self.store.get_status)
+            return HTTPStatus.OK, self.__encode(status)
+        if url.path == "/analysis":
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                analysis = await loop.run_in_executor(self.__query_executor, self.get_analysis, query)
+                return HTTPStatus.OK, await loop.run_in_executor(self.__query_executor, self.__encode, analysis)
+            except CliArgumentException as ex:
+                return HTTPStatus.BAD_REQUEST, self.__encode({"error": str(ex)})
+            except Exception as ex:
+                return HTTPStatus.INTERNAL_SERVER_ERROR, self.__encode({"error": str(ex)})
+        return HTTPStatus.NOT_FOUND, self.__encode({"error": f"The path {url.path} doesn't exist."})
+
+    @staticmethod
+    def __encode(datas) -> bytes:
+        return Exporter.encode(datas).encode()
+
+    def get_analysis(self, query: dict) -> dict:
+        """
+        Analyses the entries in memory which pass the filter of a query.
+
+        Args:
+            query (dict): The parameters of the query by name (see PARAMETERS),
+                the missing ones take the defaults of the command line.
+
+        Returns:
+            dict: The complete analysis (see ApacheLogAnalyser.get_complete_analysis),
+            with the state of the store and the duration of the query in the detail.
+        """
+        started = perf_counter()
+        for name in query:
+            if name not in self.PARAMETERS:
+                raise CliArgumentException(f"The parameter {name} doesn't exist.")
+        args = Namespace(**{name: query.get(name) or None for name in ("status", "date", "ip", "method", "url")})
+        CliArgumentParser.parse_filter(args)
+        stats = CliArgumentParser.parse_stats(query.get("stats", ",".join(DEFAULT_STATISTICS)))
+        bucket = query.get("bucket", "hour")
+        if bucket not in BUCKET_SIZES:
+            raise CliArgumentException(f"The bucket {bucket} doesn't exist.")
+        details = query.get("details", "false").lower()
+        if details not in ("true", "false", "1", "0"):
+            raise CliArgumentException(f"The value {details} of details isn't valid.")
+        details = details in ("true", "1")
+        # Analysis of the chunks, in the order of the files and of the lines
+        files = self.store.get_files()
+        paths = [path for path, chunks in files]
+        filter = ApacheLogFilter(args.status, args.date, args.ip, args.method, args.url)
+        analyser = ApacheLogAnalyser(ApacheLogFile(paths[0] if len(paths) == 1 else paths),
+                                     filter, stats, None, BUCKET_SIZES[bucket])
+        for path, chunks in files:
+            for chunk in chunks:
+                if self.__numpy_backend is not None:
+                    self.__numpy_backend.analyse_file(chunk, analyser)
+                else:
+                    analyser.analyse_entries(chunk.get_entries(filter.get_columnar_indices(chunk)))
+        analysis = analyser.get_complete_analysis(details)
+        if details:
+            analysis["analysis"]["store"] = self.store.get_status()
+            analysis["analysis"]["query_seconds"] = round(perf_counter() - started, 6)
+        return analysis
@@ -0,0 +1,200 @@
+import sys
+import threading
+from collections import deque
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+from parse.apache_log_entry import ApacheLogEntry
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_log_follower import ApacheLogFollower
+from parse.apache_log_columnar_file import ApacheLogColumnarFile
+
+class ApacheLogStore:
+    """
+    Class keeping the entries of a set of Apache log files in memory while lines are appended.
+
+    The entries of each file are stored column-wise in chunks (see
+    ApacheLogColumnarFile): the full chunks are sealed and never changed
+    again, the last one is appended by the ingestion. The files are parsed
+    once (see load), then the new lines are read by followers (see poll and
+    ApacheLogFollower), the compressed files can't grow so they are only loaded.
+
+    The ingestion and the queries run in different threads: get_files returns
+    the sealed chunks and a snapshot of the last ones, so a query reads
+    chunks which aren't changed any more and the lock is only held while the
+    entries are appended by small batches or copied.
+
+    If a memory budget is given, the oldest sealed chunks are evicted when the
+    estimated memory of the chunks goes over it, the queries then only see the
+    most recent entries (see get_status). The budget should hold several chunks
+    (a chunk takes a few MiB), the last chunks are never evicted.
+
+    Attributes:
+        file_paths (List[str]): The paths of the files.
+        engine (str): The engine reading the lines while the files are loaded (see ApacheLogParser.ENGINES).
+        memory_budget (Optional[int]): The maximum memory of the entries, in bytes (no limit if None).
+        loaded (bool): True once all the files are loaded.
+    """
+
+    # Number of entries of a chunk
+    CHUNK_SIZE = 50000
+
+    # Number of entries appended while the lock is held
+    BATCH_SIZE = 1000
+
+    def __init__(self, file_paths: Iterable[str], engine: str = "text", memory_budget: Optional[int] = None):
+        self.file_paths = list(file_paths)
+        self.engine = engine
+        self.memory_budget = memory_budget
+        self.loaded = False
+        self.__lock = threading.Lock()
+        self.__files = {
+            path: {"chunks": [], "live": ApacheLogColumnarFile(path), "lines": 0, "evicted_lines": 0}
+            for path in self.file_paths
+        }
+        # Sealed chunks with their estimated memory, in the order of the ingestion
+        self.__sealed = deque()
+        self.__sealed_memory = 0
+        self.__followers = {}
+
+    def load(self):
+        """
+        Parses the files, then follows the lines appended to the uncompressed ones.
+        """
+        for path in self.file_paths:
+            parser = ApacheLogParser(path, engine=self.engine)
+            if ApacheLogParser.is_compressed(path):
+                self.__add_entries(path, parser.get_entries())
+                continue
+            # The last line may still be written, only the complete lines are loaded
+            end = parser.get_end_of_complete_lines()
+            self.__add_entries(path, parser.get_entries(0, end))
+            self.__followers[path] = ApacheLogFollower(ApacheLogParser(path), end)
+        self.loaded = True
+
+    def poll(self) -> int:
+        """
+        Adds the entries of the lines appended to the files since the last call.
+
+        Returns:
+            int: The number of new entries.
+        """
+        total = 0
+        for path, follower in self.__followers.items():
+            total += self.__add_entries(path, follower.get_new_entries())
+        return total
+
+    def __add_entries(self, path: str, entries: Iterable[ApacheLogEntry]) -> int:
+        file = self.__files[path]
+        entries = iter(entries)
+        total = 0
+        while True:
+            # The lines are parsed outside of the lock
+            batch = list(islice(entries, self.BATCH_SIZE))
+            if not batch:
+                break
+            with self.__lock:
+                for entry in batch:
+                    file["live"].add_entry(entry)
+                    if len(file["live"].status_codes) >= self.CHUNK_SIZE:
+                        self.__seal(file)
+                file["lines"] += len(batch)
+            total += len(batch)
+        with self.__lock:
+            self.__evict()
+        return total
+
+    def __seal(self, file: dict):
+        chunk = file["live"]
+        memory = self.get_memory(chunk)
+        file["chunks"].append(chunk)
+        file["live"] = ApacheLogColumnarFile(chunk.path)
+        self.__sealed.append((file, chunk, memory))
+        self.__sealed_memory += memory
+        self.__evict()
+
+    def __evict(self):
+        if self.memory_budget is None:
+            return
+        # Only the sealed chunks are evicted, the last chunks are always kept
+        live_memory = sum(self.get_memory(file["live"]) for file in self.__files.values())
+        while self.__sealed and self.__sealed_memory + live_memory > self.memory_budget:
+            file, chunk, memory = self.__sealed.popleft()
+            file["chunks"].remove(chunk)
+            file["evicted_lines"] += len(chunk.status_codes)
+            self.__sealed_memory -= memory
+
+    @staticmethod
+    def get_memory(chunk: ApacheLogColumnarFile) -> int:
+        """
+        Returns the estimated memory of a chunk: its integer columns, its codes
+        and its distinct strings.
+
+        Args:
+            chunk (ApacheLogColumnarFile): The chunk.
+
+        Returns:
+            int: The memory, in bytes.
+        """
+        memory = 0
+        for name in ApacheLogColumnarFile.INTEGER_COLUMNS:
+            column = getattr(chunk, name)
+            memory += len(column) * column.itemsize
+        for name in ApacheLogColumnarFile.STRING_COLUMNS:
+            column = getattr(chunk, name)
+            memory += len(column.codes) * column.codes.itemsize
+            # The list of the strings, the strings and their index
+            memory += sum(sys.getsizeof(value) for value in column.values if value is not None)
+            memory += len(column.values) * 8 * 4
+        return memory
+
+    def get_files(self) -> List[Tuple[str, List[ApacheLogColumnarFile]]]:
+        """
+        Returns the chunks of the files, which aren't changed by the ingestion.
+
+        Returns:
+            List[Tuple[str, List[ApacheLogColumnarFile]]]: The path and the chunks
+            of each file, in the order of the files and of the lines.
+        """
+        with self.__lock:
+            files = []
+            for path, file in self.__files.items():
+                chunks = list(file["chunks"])
+                if len(file["live"].status_codes):
+                    chunks.append(file["live"].get_snapshot())
+                files.append((path, chunks))
+            return files
+
+    def get_status(self) -> dict:
+        """
+        Returns the state of the store.
+
+        Returns:
+            dict: The lines, the lines in memory and the lines evicted of each file,
+            and the estimated memory of the entries with the budget.
+        """
+        with self.__lock:
+            files = {}
+            for path, file in self.__files.items():
+                follower = self.__followers.get(path)
+                files[path] = {
+                    "lines": file["lines"],
+                    "resident_lines": file["lines"] - file["evicted_lines"],
+                    "evicted_lines": file["evicted_lines"],
+                    "chunks": len(file["chunks"]) + 1,
+                    "followed": follower is not None,
+                    "rotations": follower.rotations if follower is not None else 0
+                }
+            memory = self.__sealed_memory + sum(self.get_memory(file["live"]) for file in self.__files.values())
+            return {
+                "loaded": self.loaded,
+                "files": files,
+                "memory_bytes": memory,
+                "memory_budget_bytes": self.memory_budget
+            }
+
+    def close(self):
+        """
+        Closes the files followed.
+        """
+        for follower in self.__followers.values():
+            follower.close()
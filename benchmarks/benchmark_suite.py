@@ -0,0 +1,355 @@
+"""
+    Reproducible benchmark suite of the hot paths: parsing, timestamp decoding,
+    user agent parsing, filtering, every aggregator of the statistics and the export.
+
+    The log is generated by SyntheticLogGenerator (always the same for a seed), each
+    benchmark runs in its own process so its peak RSS is measured apart, and the
+    results are written in JSON to compare them between commits.
+
+    Usage: python benchmark_suite.py [-o results.json] [--compare baseline.json]
+                                     [--lines N] [--ips N] [--urls N] [--malformed RATIO]
+                                     [--seed N] [--repeat N] [--only NAME,...]
+"""
+import os
+import re
+import sys
+import json
+import time
+import platform
+import tempfile
+import subprocess
+from argparse import ArgumentParser, SUPPRESS
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIRECTORY, "..", "app"))
+from log_generator import SyntheticLogGenerator
+from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_timestamp_decoder import ApacheTimestampDecoder
+from data.metadata_info import MetadataInfo, parse_user_agent
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser, STATISTICS, BUCKET_SIZES, DEFAULT_APPROXIMATION
+from analysis.apache_log_aggregators import create_aggregators
+from analysis.apache_log_numpy_backend import ApacheLogNumpyBackend
+from analysis.apache_log_profiler import ApacheLogProfiler
+from export.exporter import Exporter
+
+
+def get_entries(log_path: str) -> list:
+    return list(ApacheLogParser(log_path).get_entries())
+
+
+def get_lines(log_path: str) -> list:
+    with open(log_path) as file:
+        return file.readlines()
+
+
+def get_analysis(log_path: str) -> dict:
+    analyser = ApacheLogAnalyser(ApacheLogFile(log_path, get_entries(log_path)),
+                                 ApacheLogFilter(None, None, None, None),
+                                 STATISTICS, bucket_size=BUCKET_SIZES["minute"])
+    return analyser.get_complete_analysis(True)
+
+
+def count(iterable) -> int:
+    return sum(1 for _ in iterable)
+
+
+def bench_parse(engine: str, fields: Optional[tuple] = None):
+    def run(log_path: str) -> int:
+        return count(ApacheLogParser(log_path, fields, engine=engine).get_entries())
+    return None, run
+
+
+def bench_parse_columnar():
+    def run(log_path: str) -> int:
+        return len(ApacheLogParser(log_path).get_file_parsed(columnar=True).entries)
+    return None, run
+
+
+def bench_timestamps(decoder: bool):
+    def setup(log_path: str) -> list:
+        pattern = re.compile(r"\[([^\]]+)\]")
+        timestamps = [pattern.search(line).group(1) for line in get_lines(log_path)]
+        # Both decoders must return the same datetimes
+        decoder_check = ApacheTimestampDecoder()
+        for timestamp in timestamps[:1000]:
+            assert decoder_check.decode(timestamp) == datetime.strptime(timestamp, ApacheTimestampDecoder.FORMAT)
+        return timestamps
+    def run(timestamps: list) -> int:
+        if decoder:
+            # A new decoder for each run so the memoization starts empty
+            decode = ApacheTimestampDecoder().decode
+            for timestamp in timestamps:
+                decode(timestamp)
+        else:
+            for timestamp in timestamps:
+                datetime.strptime(timestamp, ApacheTimestampDecoder.FORMAT)
+        return len(timestamps)
+    return setup, run
+
+
+def bench_user_agents():
+    def setup(log_path: str) -> list:
+        # The parsing cache is emptied so every run parses the distinct user agents again
+        parse_user_agent.cache_clear()
+        return [entry.metadata_info.user_agent for entry in get_entries(log_path)]
+    def run(user_agents: list) -> int:
+        for user_agent in user_agents:
+            metadata_info = MetadataInfo(None, user_agent)
+            metadata_info.get_os()
+            metadata_info.get_browser()
+            metadata_info.get_type_device()
+        return len(user_agents)
+    return setup, run
+
+
+# Filter of the filtering benchmarks, with several criteria active
+BENCHMARK_FILTER = ((200, 399), None, None, ("GET", "POST"), "/page/1")
+
+
+def bench_filter():
+    def run(entries: list) -> int:
+        pass_filter = ApacheLogFilter(*BENCHMARK_FILTER).pass_filter
+        for entry in entries:
+            pass_filter(entry)
+        return len(entries)
+    return get_entries, run
+
+
+def bench_raw_line_filter():
+    def run(lines: list) -> int:
+        pass_raw_line = ApacheLogFilter(*BENCHMARK_FILTER).pass_raw_line
+        for line in lines:
+            pass_raw_line(line)
+        return len(lines)
+    return get_lines, run
+
+
+def bench_aggregator(section: str, name: str, approximation: Optional[dict] = None):
+    def setup(log_path: str) -> list:
+        parse_user_agent.cache_clear()
+        return get_entries(log_path)
+    def run(entries: list) -> int:
+        options = {"approximation": approximation, "bucket_size": BUCKET_SIZES["hour"]}
+        aggregator = next(aggregator for aggregator in create_aggregators(section, options)
+                          if aggregator.name == name)
+        update = aggregator.update
+        for entry in entries:
+            update(entry)
+        aggregator.result(len(entries))
+        return len(entries)
+    return setup, run
+
+
+def bench_analyser():
+    def setup(log_path: str) -> list:
+        parse_user_agent.cache_clear()
+        return get_entries(log_path)
+    def run(entries: list) -> int:
+        analyser = ApacheLogAnalyser(ApacheLogFile("", entries), ApacheLogFilter(None, None, None, None), STATISTICS)
+        analyser.get_complete_analysis(False)
+        return len(entries)
+    return setup, run
+
+
+def bench_columnar_analyser(backend: str):
+    def setup(log_path: str):
+        parse_user_agent.cache_clear()
+        return ApacheLogParser(log_path).get_file_parsed(columnar=True)
+    def run(file) -> int:
+        analyser = ApacheLogAnalyser(ApacheLogFile(file.path), ApacheLogFilter(None, None, None, None), STATISTICS)
+        if backend == "numpy":
+            ApacheLogNumpyBackend().analyse_file(file, analyser)
+        else:
+            analyser.analyse_entries(file.get_entries(analyser.filter.get_columnar_indices(file)))
+        analyser.get_complete_analysis(False)
+        return len(file.entries)
+    return setup, run
+
+
+def bench_export(format: str = "json", compact: bool = False):
+    def run(analysis: dict) -> int:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"analysis.{format}")
+            Exporter(path, True, compact).export(analysis, format)
+            return os.path.getsize(path)
+    return get_analysis, run
+
+
+def get_benchmarks() -> Dict[str, Tuple[str, Callable]]:
+    """
+    Returns the benchmarks by name, with the unit of the items they process.
+    A benchmark is a function returning its setup (not timed, it takes the path
+    of the log, None to give the path itself to the run) and its run (timed,
+    it returns the number of items processed).
+
+    Returns:
+        Dict[str, Tuple[str, Callable]]: The unit and the function of each benchmark.
+    """
+    benchmarks = {
+        "parse_text": ("lines", lambda: bench_parse("text")),
+        "parse_mmap": ("lines", lambda: bench_parse("mmap")),
+        "parse_status_only": ("lines", lambda: bench_parse("text", ("status",))),
+        "parse_columnar": ("lines", bench_parse_columnar),
+        "timestamp_strptime": ("timestamps", lambda: bench_timestamps(False)),
+        "timestamp_decoder": ("timestamps", lambda: bench_timestamps(True)),
+        "user_agents": ("user agents", bench_user_agents),
+        "filter": ("entries", bench_filter),
+        "raw_line_filter": ("lines", bench_raw_line_filter),
+    }
+    options = {"approximation": None, "bucket_size": BUCKET_SIZES["hour"]}
+    for section in STATISTICS:
+        for aggregator in create_aggregators(section, options):
+            benchmarks[f"aggregator_{aggregator.name}"] = (
+                "entries", lambda section=section, name=aggregator.name: bench_aggregator(section, name)
+            )
+    # The aggregators which are replaced by sketches in the approximate mode
+    for section, name in (("clients", "top_ips"), ("requests", "top_urls")):
+        benchmarks[f"aggregator_{name}_approximate"] = (
+            "entries", lambda section=section, name=name: bench_aggregator(section, name, DEFAULT_APPROXIMATION)
+        )
+    benchmarks["analyser"] = ("entries", bench_analyser)
+    # Analysis of a columnar file by the pure Python and the NumPy backends
+    benchmarks["columnar_analyser_python"] = ("entries", lambda: bench_columnar_analyser("python"))
+    if ApacheLogNumpyBackend.is_available():
+        benchmarks["columnar_analyser_numpy"] = ("entries", lambda: bench_columnar_analyser("numpy"))
+    benchmarks["export_json"] = ("bytes", bench_export)
+    benchmarks["export_json_compact"] = ("bytes", lambda: bench_export("json", True))
+    benchmarks["export_ndjson"] = ("bytes", lambda: bench_export("ndjson"))
+    return benchmarks
+
+
+def run_benchmark(name: str, log_path: str, repeat: int) -> dict:
+    """
+    Runs a benchmark in the current process, the best time of the runs is kept.
+
+    Args:
+        name (str): The name of the benchmark.
+        log_path (str): The path of the log.
+        repeat (int): The number of runs.
+
+    Returns:
+        dict: The items processed, the best time, the rate and the peak RSS (setup included).
+    """
+    unit, benchmark = get_benchmarks()[name]
+    setup, run = benchmark()
+    best = None
+    for _ in range(repeat):
+        datas = setup(log_path) if setup is not None else log_path
+        start = time.perf_counter()
+        items = run(datas)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del datas
+    return {
+        "unit": unit,
+        "items": items,
+        "seconds": round(best, 6),
+        "items_per_second": round(items / best, 1) if best else None,
+        "peak_rss_kb": ApacheLogProfiler.get_peak_rss()
+    }
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARKS_DIRECTORY, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(generator: SyntheticLogGenerator, names: list, repeat: int) -> dict:
+    """
+    Generates the log then runs every benchmark in a new process.
+
+    Args:
+        generator (SyntheticLogGenerator): The generator of the log.
+        names (list): The names of the benchmarks.
+        repeat (int): The number of runs of each benchmark.
+
+    Returns:
+        dict: The environment, the parameters of the log and the results of the benchmarks.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, "access.log")
+        generator.write(log_path)
+        for name in names:
+            process = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run", name, log_path, "--repeat", str(repeat)],
+                capture_output=True, text=True
+            )
+            if process.returncode != 0:
+                raise RuntimeError(f"The benchmark {name} failed:\n{process.stderr}")
+            results[name] = json.loads(process.stdout)
+            print(f"{name}: {results[name]['items_per_second']} {results[name]['unit']}/s, "
+                  f"peak RSS {results[name]['peak_rss_kb']} KiB", file=sys.stderr)
+    return {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "log": generator.get_parameters(),
+        "repeat": repeat,
+        "benchmarks": results
+    }
+
+
+def compare(results: dict, baseline: dict):
+    """
+    Prints the rate of each benchmark against a baseline (a ratio under 1 is a regression).
+
+    Args:
+        results (dict): The results of the suite.
+        baseline (dict): The results of the suite on another commit.
+    """
+    if results["log"] != baseline["log"]:
+        print("Warning: the logs of the results and of the baseline aren't the same.", file=sys.stderr)
+    print(f"{'benchmark':<32}{'baseline':>14}{'current':>14}{'ratio':>8}{'RSS ratio':>11}")
+    for name, result in results["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None or not old["items_per_second"] or not result["items_per_second"]:
+            print(f"{name:<32}{'-':>14}{result['items_per_second'] or '-':>14}")
+            continue
+        ratio = result["items_per_second"] / old["items_per_second"]
+        rss_ratio = (f"{result['peak_rss_kb'] / old['peak_rss_kb']:.2f}"
+                     if result["peak_rss_kb"] and old["peak_rss_kb"] else "-")
+        print(f"{name:<32}{old['items_per_second']:>14.0f}{result['items_per_second']:>14.0f}"
+              f"{ratio:>8.2f}{rss_ratio:>11}")
+
+
+if __name__ == "__main__":
+    argument_parser = ArgumentParser(description="Run the benchmarks on a synthetic Apache log.")
+    argument_parser.add_argument("-o", "--output", type=str, help="JSON file of the results (stdout if not given)")
+    argument_parser.add_argument("--compare", type=str, help="JSON file of results to compare with")
+    argument_parser.add_argument("--lines", type=int, default=200000, help="Number of lines of the log")
+    argument_parser.add_argument("--ips", type=int, default=1000, help="Number of distinct IPs")
+    argument_parser.add_argument("--urls", type=int, default=500, help="Number of distinct URLs")
+    argument_parser.add_argument("--malformed", type=float, default=0.01, help="Fraction of malformed lines")
+    argument_parser.add_argument("--seed", type=int, default=1, help="Seed of the log generator")
+    argument_parser.add_argument("--repeat", type=int, default=3, help="Runs of each benchmark (best time kept)")
+    argument_parser.add_argument("--only", type=str, help="Names of the benchmarks to run, separated by commas")
+    argument_parser.add_argument("--run", nargs=2, metavar=("NAME", "LOG"), help=SUPPRESS)
+    args = argument_parser.parse_args()
+    if args.run:
+        # Run of a single benchmark in the process started by run_suite
+        print(json.dumps(run_benchmark(args.run[0], args.run[1], args.repeat)))
+        sys.exit(0)
+    names = list(get_benchmarks())
+    if args.only:
+        unknown = set(args.only.split(",")) - set(names)
+        if unknown:
+            argument_parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+        names = [name for name in names if name in args.only.split(",")]
+    generator = SyntheticLogGenerator(args.lines, args.ips, args.urls, None, args.malformed, args.seed)
+    results = run_suite(generator, names, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
@@ -0,0 +1,127 @@
+"""
+    Deterministic generator of synthetic Apache access logs, used by the benchmarks.
+
+    Usage: python log_generator.py OUTPUT [--lines N] [--ips N] [--urls N] [--malformed RATIO] [--seed N]
+"""
+import random
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, Optional
+
+# User agents of the generated lines, with their weight in the mix
+USER_AGENTS = {
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36": 40,
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/16.0 Mobile/15E148 Safari/604.1": 20,
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0": 10,
+    "Googlebot/2.1 (+http://www.google.com/bot.html)": 10,
+    "curl/7.68.0": 10,
+    "-": 10
+}
+
+METHODS = {"GET": 60, "POST": 20, "PUT": 10, "DELETE": 10}
+
+STATUS_CODES = {200: 70, 301: 5, 304: 5, 404: 12, 500: 5, 503: 3}
+
+
+class SyntheticLogGenerator:
+    """
+    Class for generating Apache access log lines (combined format), always the same for a seed.
+
+    The lines are in time order, a few lines per second. The malformed lines
+    are the degraded lines written by Apache which the parser must still
+    accept: requests "-" (connection closed before the request), lines
+    without referer and user agent (common format) and responses without size.
+
+    Attributes:
+        lines (int): The number of lines.
+        ips (int): The number of distinct client IPs.
+        urls (int): The number of distinct URLs.
+        user_agents (Dict[str, int]): The user agents with their weight in the mix.
+        malformed_ratio (float): The fraction of malformed lines.
+        seed (int): The seed of the random generator.
+    """
+
+    def __init__(self, lines: int = 100000, ips: int = 1000, urls: int = 500,
+                 user_agents: Optional[Dict[str, int]] = None, malformed_ratio: float = 0.01,
+                 seed: int = 1):
+        self.lines = lines
+        self.ips = ips
+        self.urls = urls
+        self.user_agents = user_agents if user_agents is not None else USER_AGENTS
+        self.malformed_ratio = malformed_ratio
+        self.seed = seed
+
+    def get_parameters(self) -> dict:
+        """
+        Returns the parameters of the generator (to reproduce the log).
+
+        Returns:
+            dict: The parameters.
+        """
+        return {
+            "lines": self.lines,
+            "ips": self.ips,
+            "urls": self.urls,
+            "user_agents": len(self.user_agents),
+            "malformed_ratio": self.malformed_ratio,
+            "seed": self.seed
+        }
+
+    def get_lines(self) -> Iterator[str]:
+        """
+        Yields the lines of the log, with their newline.
+
+        Returns:
+            Iterator[str]: The lines.
+        """
+        generator = random.Random(self.seed)
+        ips = [f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}" for index in range(self.ips)]
+        urls = [f"/page/{index}" for index in range(self.urls)]
+        user_agents, user_agent_weights = list(self.user_agents), list(self.user_agents.values())
+        methods, method_weights = list(METHODS), list(METHODS.values())
+        status_codes, status_code_weights = list(STATUS_CODES), list(STATUS_CODES.values())
+        date = datetime(2025, 3, 1, tzinfo=timezone(timedelta(hours=1)))
+        for _ in range(self.lines):
+            date += timedelta(seconds=generator.randint(0, 2))
+            # A few IPs and URLs send most of the requests
+            ip = ips[min(int(generator.paretovariate(1.2)) - 1, self.ips - 1)]
+            url = urls[min(int(generator.paretovariate(1.2)) - 1, self.urls - 1)]
+            timestamp = date.strftime("%d/%b/%Y:%H:%M:%S %z")
+            method = generator.choices(methods, method_weights)[0]
+            status_code = generator.choices(status_codes, status_code_weights)[0]
+            size = generator.randint(0, 50000)
+            user_agent = generator.choices(user_agents, user_agent_weights)[0]
+            if generator.random() < self.malformed_ratio:
+                kind = generator.randrange(3)
+                if kind == 0:
+                    yield f'{ip} - - [{timestamp}] "-" 408 -\n'
+                elif kind == 1:
+                    yield f'{ip} - - [{timestamp}] "{method} {url} HTTP/1.1" {status_code} {size}\n'
+                else:
+                    yield f'{ip} - - [{timestamp}] "{method} {url} HTTP/1.1" {status_code} - "-" "{user_agent}"\n'
+            else:
+                yield f'{ip} - - [{timestamp}] "{method} {url} HTTP/1.1" {status_code} {size} "-" "{user_agent}"\n'
+
+    def write(self, path: str):
+        """
+        Writes the log in a file.
+
+        Args:
+            path (str): The path of the file.
+        """
+        with open(path, 'w') as file:
+            file.writelines(self.get_lines())
+
+
+if __name__ == "__main__":
+    argument_parser = ArgumentParser(description="Generate a synthetic Apache access log.")
+    argument_parser.add_argument("output", help="Path of the generated log")
+    argument_parser.add_argument("--lines", type=int, default=100000, help="Number of lines")
+    argument_parser.add_argument("--ips", type=int, default=1000, help="Number of distinct IPs")
+    argument_parser.add_argument("--urls", type=int, default=500, help="Number of distinct URLs")
+    argument_parser.add_argument("--malformed", type=float, default=0.01, help="Fraction of malformed lines")
+    argument_parser.add_argument("--seed", type=int, default=1, help="Seed of the random generator")
+    args = argument_parser.parse_args()
+    SyntheticLogGenerator(args.lines, args.ips, args.urls, None, args.malformed, args.seed).write(args.output)
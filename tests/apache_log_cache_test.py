@@ -0,0 +1,90 @@
+import os
+import pytest
+from parse.apache_log_cache import ApacheLogCache
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_log_file import ApacheLogFile
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser, STATISTICS
+
+
+def get_state(log_file) -> dict:
+    # State of the analysis of a columnar file, like main.py with --cache
+    apache_log_filter = ApacheLogFilter(None, None, None, None, None)
+    analyser = ApacheLogAnalyser(ApacheLogFile(log_file.path), apache_log_filter, STATISTICS)
+    analyser.analyse_entries(log_file.get_entries(apache_log_filter.get_columnar_indices(log_file)))
+    return analyser.get_state()
+
+
+def test_round_trip(log_path):
+    parsed_state = get_state(ApacheLogParser(log_path).get_file_parsed(columnar=True))
+    cache = ApacheLogCache(log_path)
+    assert get_state(cache.get_file()) == parsed_state
+    assert cache.saved and not cache.loaded
+    assert os.path.isfile(cache.cache_path)
+    # No temporary file is left next to the cache
+    assert sorted(os.listdir(os.path.dirname(cache.cache_path))) \
+        == sorted([os.path.basename(log_path), os.path.basename(cache.cache_path)])
+    # The next run maps the cache instead of parsing the log
+    cache = ApacheLogCache(log_path)
+    assert get_state(cache.get_file()) == parsed_state
+    assert cache.loaded and not cache.saved
+
+
+@pytest.mark.parametrize("keep_mtime", [False, True])
+def test_stale_cache(log_path, keep_mtime):
+    ApacheLogCache(log_path).get_file()
+    stat = os.stat(log_path)
+    # The same number of bytes is changed in the log (the size doesn't change)
+    with open(log_path, 'r+b') as file:
+        file.seek(stat.st_size // 2)
+        file.write(b" " * 100)
+    if keep_mtime:
+        os.utime(log_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    cache = ApacheLogCache(log_path)
+    log_file = cache.get_file()
+    assert not cache.loaded and cache.saved
+    assert get_state(log_file) == get_state(ApacheLogParser(log_path).get_file_parsed(columnar=True))
+
+
+def test_appended_log(log_path):
+    cache = ApacheLogCache(log_path)
+    lines = len(cache.get_file().entries)
+    with open(log_path, 'a') as file:
+        file.write('10.0.0.1 - - [01/Mar/2025:10:00:00 +0100] "GET / HTTP/1.1" 200 10 "-" "curl/7.68.0"\n')
+    log_file = cache.get_file()
+    assert not cache.loaded and cache.saved
+    assert len(log_file.entries) == lines + 1
+
+
+def test_rebuild(log_path):
+    ApacheLogCache(log_path).get_file()
+    cache = ApacheLogCache(log_path)
+    cache.get_file(rebuild=True)
+    assert not cache.loaded and cache.saved
+
+
+@pytest.mark.parametrize("corruption", ["empty", "garbage", "header", "truncated"])
+def test_corrupt_cache(log_path, corruption):
+    parsed_state = get_state(ApacheLogParser(log_path).get_file_parsed(columnar=True))
+    cache = ApacheLogCache(log_path)
+    cache.get_file()
+    with open(cache.cache_path, 'rb') as file:
+        content = file.read()
+    if corruption == "empty":
+        content = b""
+    elif corruption == "garbage":
+        content = os.urandom(len(content))
+    elif corruption == "header":
+        # The magic is kept, the header isn't valid JSON anymore
+        content = content[:20] + b"\xff" * 20 + content[40:]
+    else:
+        content = content[:len(content) // 2]
+    with open(cache.cache_path, 'wb') as file:
+        file.write(content)
+    # The corrupt cache is ignored, the log is parsed again and the cache replaced
+    cache = ApacheLogCache(log_path)
+    assert get_state(cache.get_file()) == parsed_state
+    assert not cache.loaded and cache.saved
+    cache = ApacheLogCache(log_path)
+    cache.get_file()
+    assert cache.loaded
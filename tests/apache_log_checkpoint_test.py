@@ -0,0 +1,103 @@
+import os
+import json
+import shutil
+import pytest
+from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_parser import ApacheLogParser
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser
+from analysis.apache_log_checkpoint import ApacheLogCheckpoint
+
+
+def get_analyser(log_path: str) -> ApacheLogAnalyser:
+    return ApacheLogAnalyser(ApacheLogFile(log_path), ApacheLogFilter(None, None, None, None, None))
+
+
+def analyse(log_path: str, analyser: ApacheLogAnalyser, start: int, end: int):
+    analyser.analyse_entries(ApacheLogParser(log_path).get_entries(start, end))
+
+
+@pytest.fixture
+def checkpoint_path(log_path, tmp_path) -> str:
+    """
+    Path of a state file saved after the analysis of the first half of the log.
+    """
+    path = str(tmp_path / "state.json")
+    middle = ApacheLogParser(log_path).get_chunks(2)[0][1]
+    analyser = get_analyser(log_path)
+    analyse(log_path, analyser, 0, middle)
+    ApacheLogCheckpoint(path).save(log_path, analyser, middle)
+    return path
+
+
+def test_resume(log_path, checkpoint_path):
+    middle = ApacheLogParser(log_path).get_chunks(2)[0][1]
+    checkpoint = ApacheLogCheckpoint(checkpoint_path)
+    analyser = get_analyser(log_path)
+    assert checkpoint.load(log_path, analyser) == middle
+    assert checkpoint.resumed
+    # The resumed analysis is the analysis of the whole file
+    analyse(log_path, analyser, middle, None)
+    whole_analyser = get_analyser(log_path)
+    analyse(log_path, whole_analyser, 0, None)
+    assert analyser.get_state() == whole_analyser.get_state()
+
+
+def test_resume_grown_file(log_path, checkpoint_path):
+    with open(log_path, 'a') as file:
+        file.write('10.0.0.1 - - [02/Mar/2025:10:00:00 +0100] "GET / HTTP/1.1" 200 10 "-" "curl/7.68.0"\n')
+    checkpoint = ApacheLogCheckpoint(checkpoint_path)
+    assert checkpoint.load(log_path, get_analyser(log_path)) > 0
+    assert checkpoint.resumed
+
+
+def check_start_over(log_path: str, checkpoint_path: str):
+    checkpoint = ApacheLogCheckpoint(checkpoint_path)
+    analyser = get_analyser(log_path)
+    assert checkpoint.load(log_path, analyser) == 0
+    assert not checkpoint.resumed
+    assert analyser.get_total_requests() == 0
+
+
+def test_changed_inode(log_path, checkpoint_path):
+    # The log is rotated: a new file with the same content
+    shutil.copyfile(log_path, f"{log_path}.new")
+    os.replace(f"{log_path}.new", log_path)
+    check_start_over(log_path, checkpoint_path)
+
+
+def test_truncated_file(log_path, checkpoint_path):
+    os.truncate(log_path, 1000)
+    check_start_over(log_path, checkpoint_path)
+
+
+def test_changed_fingerprint(log_path, checkpoint_path):
+    # The first bytes are rewritten in place: same inode and size
+    with open(log_path, 'r+b') as file:
+        file.write(b"192.168.0.1")
+    check_start_over(log_path, checkpoint_path)
+
+
+def test_changed_config(log_path, checkpoint_path):
+    analyser = ApacheLogAnalyser(ApacheLogFile(log_path), ApacheLogFilter(200, None, None, None, None))
+    assert ApacheLogCheckpoint(checkpoint_path).load(log_path, analyser) == 0
+
+
+def test_invalid_state(log_path, checkpoint_path):
+    with open(checkpoint_path, 'w') as file:
+        file.write("{")
+    check_start_over(log_path, checkpoint_path)
+
+
+def test_failed_save(log_path, checkpoint_path, monkeypatch):
+    with open(checkpoint_path, 'r') as file:
+        state = file.read()
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(json, "dump", fail)
+    with pytest.raises(OSError):
+        ApacheLogCheckpoint(checkpoint_path).save(log_path, get_analyser(log_path), 0)
+    # The saved state is kept and the temporary file removed
+    assert not [name for name in os.listdir(os.path.dirname(checkpoint_path)) if name.endswith(".tmp")]
+    with open(checkpoint_path, 'r') as file:
+        assert file.read() == state
@@ -0,0 +1,60 @@
+import pytest
+from parse.apache_log_parser import ApacheLogParser, InvalidFormatApacheLogException
+from analysis.apache_log_filter import ApacheLogFilter
+
+VALID_LINE = '10.0.0.2 - - [01/Mar/2025:10:00:01 +0100] "GET /index HTTP/1.1" 404 20 "-" "curl/7.68.0"\n'
+NO_REQUEST_LINE = '10.0.0.3 - - [01/Mar/2025:10:00:02 +0100] "-" 408 - "-" "-"\n'
+
+FILTERS = [
+    (404, None, None, None, None),
+    ((200, 299), None, None, None, None),
+    (None, None, ("10.0.0.1", "10.0.0.2"), None, None),
+    (None, None, None, "POST", None),
+    (None, None, None, None, ("/page/1", "/page/2")),
+    (None, None, None, None, "4"),
+    ((400, 599), None, None, ("GET", "HEAD"), "/page"),
+]
+
+
+def get_entries(path: str, apache_log_filter: ApacheLogFilter, engine: str, prefilter: bool) -> list:
+    line_filter = apache_log_filter.get_raw_line_filter() if prefilter else None
+    entries = ApacheLogParser(path, line_filter=line_filter, engine=engine).get_entries()
+    return [(entry.client_info.client_ip, entry.request_info.url, entry.response_info.status_code)
+            for entry in entries if apache_log_filter.pass_filter(entry)]
+
+
+@pytest.mark.parametrize("engine", ApacheLogParser.ENGINES)
+@pytest.mark.parametrize("criteria", FILTERS)
+def test_prefilter_same_entries(log_path, engine, criteria):
+    # The log has requests "-" and lines without referer nor user agent
+    apache_log_filter = ApacheLogFilter(*criteria)
+    assert get_entries(log_path, apache_log_filter, engine, True) \
+        == get_entries(log_path, apache_log_filter, engine, False)
+
+
+@pytest.mark.parametrize("engine", ApacheLogParser.ENGINES)
+@pytest.mark.parametrize("criteria", FILTERS)
+@pytest.mark.parametrize("malformed_line", ['10.0.0.9 - - [01/Mar/2025:10:00:03 +0100] "GET /page/1 HTTP/1.1" abc 20\n',
+                                            '10.0.0.9 - - [01/Mar/2025:10:00:03 +0100] "POST /admin" 200 20\n',
+                                            'garbage\n'])
+def test_prefilter_malformed_line(tmp_path, engine, criteria, malformed_line):
+    # A malformed line is never rejected by the prefilter, the parser raises on it
+    path = tmp_path / "access.log"
+    path.write_text(VALID_LINE + malformed_line + VALID_LINE)
+    with pytest.raises(InvalidFormatApacheLogException):
+        get_entries(str(path), ApacheLogFilter(*criteria), engine, True)
+
+
+@pytest.mark.parametrize("encode", [False, True])
+def test_prefilter_no_request(encode):
+    line = NO_REQUEST_LINE.encode() if encode else NO_REQUEST_LINE
+    # A request "-" has no URL: the status after it isn't checked as a URL
+    assert not ApacheLogFilter(None, None, None, None, "4").pass_raw_line(line)
+    assert not ApacheLogFilter(None, None, None, None, "/").pass_raw_line(line)
+    assert not ApacheLogFilter(None, None, None, "GET", None).pass_raw_line(line)
+    assert ApacheLogFilter(408, None, None, None, None).pass_raw_line(line)
+    assert not ApacheLogFilter(404, None, None, None, None).pass_raw_line(line)
+
+
+def test_no_prefilter():
+    assert ApacheLogFilter(None, None, None, None, None).get_raw_line_filter() is None
@@ -0,0 +1,39 @@
+import pytest
+from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_parser import ApacheLogParser
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser
+from analysis.apache_log_parallel_analyser import ApacheLogParallelAnalyser
+
+STATS = ["clients", "requests", "responses", "metadatas", "traffic", "response_sizes"]
+
+
+def get_state(paths: list, apache_log_filter: ApacheLogFilter, engine: str) -> dict:
+    # State of the analysis of the files in one process, like main.py without --workers
+    path = paths[0] if len(paths) == 1 else paths
+    analyser = ApacheLogAnalyser(ApacheLogFile(path), apache_log_filter, STATS)
+    for file_path in paths:
+        parser = ApacheLogParser(file_path, ApacheLogAnalyser.get_required_fields(apache_log_filter, STATS),
+                                 apache_log_filter.get_raw_line_filter(), engine)
+        analyser.analyse_entries(parser.get_entries())
+    return analyser.get_state()
+
+
+@pytest.mark.parametrize("engine", ApacheLogParser.ENGINES)
+@pytest.mark.parametrize("workers", [2, 3])
+def test_workers_same_analysis(log_path, engine, workers):
+    apache_log_filter = ApacheLogFilter(None, None, None, None, None)
+    parallel_analyser = ApacheLogParallelAnalyser(log_path, apache_log_filter, workers, STATS, engine)
+    assert parallel_analyser.get_analyser().get_state() == get_state([log_path], apache_log_filter, engine)
+    assert parallel_analyser.total_lines == 2000
+
+
+def test_workers_same_filtered_analysis(log_path, tmp_path):
+    # Two files (the second one is a copy), with a filter checked on the raw lines
+    copy_path = str(tmp_path / "copy.log")
+    with open(log_path, 'rb') as source, open(copy_path, 'wb') as copy:
+        copy.write(source.read())
+    apache_log_filter = ApacheLogFilter((200, 299), None, None, "GET", None)
+    parallel_analyser = ApacheLogParallelAnalyser([log_path, copy_path], apache_log_filter, 4, STATS)
+    assert parallel_analyser.get_analyser().get_state() \
+        == get_state([log_path, copy_path], apache_log_filter, "text")
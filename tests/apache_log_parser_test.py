@@ -0,0 +1,174 @@
+import os
+import gzip
+import pytest
+from datetime import datetime, timedelta
+from parse.apache_log_parser import ApacheLogParser
+from parse.apache_log_follower import ApacheLogFollower
+
+# A line with bytes which aren't valid UTF-8 in the URL and the user agent
+INVALID_UTF8_LINE = (b'10.0.0.1 - - [01/Mar/2025:10:00:00 +0100] "GET /caf\xff HTTP/1.1" 200 10 "-" '
+                     b'"agent\xfe"\n')
+VALID_LINE = b'10.0.0.2 - - [01/Mar/2025:10:00:01 +0100] "GET /index HTTP/1.1" 404 20 "-" "curl/7.68.0"\n'
+
+
+def get_urls(entries) -> list:
+    return [(entry.request_info.url, entry.metadata_info.user_agent) for entry in entries]
+
+
+@pytest.mark.parametrize("engine", ApacheLogParser.ENGINES)
+def test_invalid_utf8_replaced(tmp_path, engine):
+    path = tmp_path / "access.log"
+    path.write_bytes(VALID_LINE + INVALID_UTF8_LINE + VALID_LINE)
+    entries = list(ApacheLogParser(str(path), engine=engine).get_entries())
+    assert get_urls(entries)[1] == ("/caf�", "agent�")
+    assert len(entries) == 3
+
+
+def test_invalid_utf8_compressed(tmp_path):
+    path = tmp_path / "access.log.gz"
+    with gzip.open(path, 'wb') as file:
+        file.write(INVALID_UTF8_LINE + VALID_LINE)
+    assert get_urls(ApacheLogParser(str(path)).get_entries())[0] == ("/caf�", "agent�")
+
+
+def test_invalid_utf8_followed(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_bytes(VALID_LINE)
+    follower = ApacheLogFollower(ApacheLogParser(str(path)), len(VALID_LINE))
+    try:
+        with open(path, 'ab') as file:
+            file.write(INVALID_UTF8_LINE + VALID_LINE)
+        entries = list(follower.get_new_entries())
+        assert get_urls(entries) == [("/caf�", "agent�"), ("/index", "curl/7.68.0")]
+        assert follower.position == path.stat().st_size
+    finally:
+        follower.close()
+
+
+def check_chunks(path: str, chunks: list, start: int, end: int):
+    with open(path, 'rb') as file:
+        content = file.read()
+    # The chunks follow each other from start to end
+    assert chunks[0][0] == start and chunks[-1][1] == end
+    assert all(chunks[index][1] == chunks[index + 1][0] for index in range(len(chunks) - 1))
+    for chunk_start, chunk_end in chunks:
+        assert chunk_start < chunk_end
+        # Every chunk starts at the beginning of a line and ends after a newline (or at the end)
+        assert chunk_start == 0 or content[chunk_start - 1:chunk_start] == b"\n"
+        assert chunk_end == len(content) or content[chunk_end - 1:chunk_end] == b"\n"
+
+
+@pytest.mark.parametrize("number", [1, 2, 3, 7, 16, 5000])
+def test_chunks(log_path, number):
+    parser = ApacheLogParser(log_path)
+    size = os.path.getsize(log_path)
+    chunks = parser.get_chunks(number)
+    assert len(chunks) <= number
+    check_chunks(log_path, chunks, 0, size)
+    # The lines of the chunks are the lines of the file
+    lines = [line for chunk in chunks for line in parser.read_lines(*chunk)]
+    assert lines == list(parser.read_lines())
+
+
+def test_chunks_of_range(log_path):
+    parser = ApacheLogParser(log_path)
+    start, end = parser.get_chunks(3)[1]
+    check_chunks(log_path, parser.get_chunks(4, start, end), start, end)
+
+
+def test_chunks_without_last_newline(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_bytes(VALID_LINE * 10 + VALID_LINE[:-1])
+    chunks = ApacheLogParser(str(path)).get_chunks(4)
+    check_chunks(str(path), chunks, 0, path.stat().st_size)
+
+
+def test_end_of_complete_lines(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_bytes(b"")
+    assert ApacheLogParser(str(path)).get_end_of_complete_lines() == 0
+    path.write_bytes(VALID_LINE[:20])
+    assert ApacheLogParser(str(path)).get_end_of_complete_lines() == 0
+    path.write_bytes(VALID_LINE * 3000 + VALID_LINE[:20])
+    assert ApacheLogParser(str(path)).get_end_of_complete_lines() == len(VALID_LINE) * 3000
+    path.write_bytes(VALID_LINE * 2)
+    assert ApacheLogParser(str(path)).get_end_of_complete_lines() == len(VALID_LINE) * 2
+
+
+def write_dated_log(path, dates: list):
+    with open(path, 'w') as file:
+        for index, date in enumerate(dates):
+            file.write(f'10.0.0.{index % 250} - - [{date.strftime("%d/%b/%Y:%H:%M:%S")} +0100] '
+                       f'"GET /page/{index} HTTP/1.1" 200 {index} "-" "curl/7.68.0"\n')
+
+
+def get_dated_offsets(path) -> list:
+    # Byte offset and date of each line
+    offsets = []
+    position = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            date = datetime.strptime(line.split(b"[")[1][:20].decode(), "%d/%b/%Y:%H:%M:%S")
+            offsets.append((position, date))
+            position += len(line)
+    return offsets
+
+
+FIRST_DATE = datetime(2025, 3, 1, 10, 0, 0)
+
+
+@pytest.mark.parametrize("scan_size", [64 * 1024, 512])
+def test_seek_date_range(tmp_path, monkeypatch, scan_size):
+    # A small scan size forces the bisection down to a few lines
+    monkeypatch.setattr(ApacheLogParser, "SEEK_SCAN_SIZE", scan_size)
+    path = tmp_path / "access.log"
+    write_dated_log(path, [FIRST_DATE + timedelta(seconds=index) for index in range(5000)])
+    start, end = FIRST_DATE + timedelta(seconds=1000), FIRST_DATE + timedelta(seconds=3000)
+    offsets = get_dated_offsets(path)
+    # The range starts and ends at the lines of the tolerance window
+    start_offset, end_offset = ApacheLogParser(str(path)).get_date_range_offsets(start, end, 60)
+    assert start_offset == offsets[1000 - 60][0]
+    assert end_offset == offsets[3000 + 60][0]
+    assert ApacheLogParser(str(path)).get_date_range_offsets(start, end, 0) == (offsets[1000][0], offsets[3000][0])
+
+
+def test_seek_date_before_start(tmp_path):
+    path = tmp_path / "access.log"
+    write_dated_log(path, [FIRST_DATE + timedelta(seconds=index) for index in range(5000)])
+    parser = ApacheLogParser(str(path))
+    assert parser.get_date_range_offsets(datetime(2025, 1, 1), datetime(2025, 1, 2)) == (0, 0)
+    # A range which starts before the file starts from the first line
+    start_offset, end_offset = parser.get_date_range_offsets(datetime(2025, 1, 1), FIRST_DATE + timedelta(hours=1))
+    assert start_offset == 0
+    assert end_offset == get_dated_offsets(path)[3600 + 60][0]
+
+
+def test_seek_date_after_end(tmp_path):
+    path = tmp_path / "access.log"
+    write_dated_log(path, [FIRST_DATE + timedelta(seconds=index) for index in range(5000)])
+    size = os.path.getsize(path)
+    parser = ApacheLogParser(str(path))
+    assert parser.get_date_range_offsets(datetime(2025, 4, 1), datetime(2025, 4, 2)) == (size, size)
+    # A range which ends after the file ends up to the end of the file
+    assert parser.get_date_range_offsets(FIRST_DATE, datetime(2025, 4, 1))[1] == size
+
+
+@pytest.mark.parametrize("scan_size", [64 * 1024, 512])
+def test_seek_date_out_of_order(tmp_path, monkeypatch, scan_size):
+    monkeypatch.setattr(ApacheLogParser, "SEEK_SCAN_SIZE", scan_size)
+    path = tmp_path / "access.log"
+    # Every 7th line is written 45 seconds late, within the tolerance
+    write_dated_log(path, [FIRST_DATE + timedelta(seconds=index - (45 if index % 7 == 0 else 0))
+                           for index in range(5000)])
+    start, end = FIRST_DATE + timedelta(seconds=1000), FIRST_DATE + timedelta(seconds=3000)
+    start_offset, end_offset = ApacheLogParser(str(path)).get_date_range_offsets(start, end, 60)
+    # All the lines of the range are in the byte range
+    for offset, date in get_dated_offsets(path):
+        if start <= date < end:
+            assert start_offset <= offset < end_offset
+
+
+def test_seek_date_empty_file(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_bytes(b"")
+    assert ApacheLogParser(str(path)).get_date_range_offsets(FIRST_DATE, FIRST_DATE + timedelta(days=1)) == (0, 0)
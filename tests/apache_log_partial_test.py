@@ -0,0 +1,83 @@
+import json
+import pytest
+from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_parser import ApacheLogParser
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser, STATISTICS, DEFAULT_APPROXIMATION, BUCKET_SIZES
+from analysis.apache_log_partial import ApacheLogPartial, PartialException
+from export.exporter import Exporter
+
+
+def get_analyser(path, approximation=None, bucket_size=BUCKET_SIZES["hour"]) -> ApacheLogAnalyser:
+    paths = path if isinstance(path, list) else [path]
+    analyser = ApacheLogAnalyser(ApacheLogFile(path), ApacheLogFilter(None, None, None, "GET", None),
+                                 STATISTICS, approximation, bucket_size)
+    for file_path in paths:
+        analyser.analyse_entries(ApacheLogParser(file_path).get_entries())
+    return analyser
+
+
+def export_partial(analyser: ApacheLogAnalyser, path: str) -> str:
+    Exporter(path, True).export(ApacheLogPartial.get_partial(analyser), "partial")
+    return path
+
+
+def get_state(analyser: ApacheLogAnalyser) -> dict:
+    # The state as written in JSON, like the partials read from files
+    return json.loads(Exporter.encode(analyser.get_state()))
+
+
+@pytest.fixture
+def split_paths(log_path, tmp_path) -> list:
+    """
+    Paths of the log split in three files, like the logs of three machines.
+    """
+    paths = []
+    with open(log_path, 'rb') as file:
+        for index, (start, end) in enumerate(ApacheLogParser(log_path).get_chunks(3)):
+            file.seek(start)
+            path = str(tmp_path / f"access_{index}.log")
+            with open(path, 'wb') as split_file:
+                split_file.write(file.read(end - start))
+            paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("approximation", [None, DEFAULT_APPROXIMATION])
+def test_merge_split_files(log_path, split_paths, approximation):
+    partials = [ApacheLogPartial.load(export_partial(get_analyser(path, approximation), f"{path}.partial"))
+                for path in split_paths]
+    analyser = ApacheLogPartial.merge(partials)
+    assert analyser.file.path == split_paths
+    assert get_state(analyser) == get_state(get_analyser(log_path, approximation))
+    assert analyser.get_complete_analysis(True)["stats"] \
+        == get_analyser(split_paths, approximation).get_complete_analysis(True)["stats"]
+
+
+def test_merge_by_levels(log_path, split_paths, tmp_path):
+    partials = [ApacheLogPartial.get_partial(get_analyser(path)) for path in split_paths]
+    first_level = export_partial(ApacheLogPartial.merge(partials[:2]), str(tmp_path / "level.partial"))
+    analyser = ApacheLogPartial.merge([ApacheLogPartial.load(first_level), partials[2]])
+    assert get_state(analyser) == get_state(get_analyser(log_path))
+
+
+@pytest.mark.parametrize("options", [{"approximation": DEFAULT_APPROXIMATION},
+                                     {"approximation": {"unique_error": 0.05, "top_error": 0.001}},
+                                     {"bucket_size": BUCKET_SIZES["minute"]}])
+def test_merge_mismatch(split_paths, options):
+    partials = [ApacheLogPartial.get_partial(get_analyser(split_paths[0])),
+                ApacheLogPartial.get_partial(get_analyser(split_paths[1], **options))]
+    with pytest.raises(PartialException):
+        ApacheLogPartial.merge(partials)
+
+
+def test_load_invalid(tmp_path):
+    path = tmp_path / "invalid.partial"
+    path.write_text('{"format": "apache-log-partial", "version": 0, "path": "", "config": {}, "analyser": {}}')
+    with pytest.raises(PartialException):
+        ApacheLogPartial.load(str(path))
+    path.write_text("{")
+    with pytest.raises(PartialException):
+        ApacheLogPartial.load(str(path))
+    with pytest.raises(PartialException):
+        ApacheLogPartial.merge([])
@@ -0,0 +1,36 @@
+import pytest
+from parse.apache_log_file import ApacheLogFile
+from parse.apache_log_parser import ApacheLogParser
+from analysis.apache_log_filter import ApacheLogFilter
+from analysis.apache_log_analyser import ApacheLogAnalyser, STATISTICS
+from analysis.apache_log_profiler import ApacheLogProfiler, ApacheLogNullProfiler
+
+
+def get_state(log_path: str, profiler: ApacheLogProfiler, engine: str, columnar: bool) -> dict:
+    apache_log_filter = ApacheLogFilter((200, 399), None, None, None, None)
+    analyser = ApacheLogAnalyser(ApacheLogFile(log_path), apache_log_filter, STATISTICS)
+    parser = ApacheLogParser(log_path, engine=engine)
+    if columnar:
+        profiler.analyse_columnar_file(parser.get_file_parsed(columnar=True), apache_log_filter, analyser)
+    else:
+        profiler.analyse_file(parser, analyser)
+    return analyser.get_state()
+
+
+@pytest.mark.parametrize("engine", ApacheLogParser.ENGINES)
+@pytest.mark.parametrize("columnar", [False, True])
+def test_profiled_analysis(log_path, monkeypatch, engine, columnar):
+    # Small batches, so the stages run several times
+    monkeypatch.setattr(ApacheLogProfiler, "BATCH_SIZE", 300)
+    profiler = ApacheLogProfiler(details=True)
+    profiler.start()
+    assert get_state(log_path, profiler, engine, columnar) \
+        == get_state(log_path, ApacheLogNullProfiler(), engine, columnar)
+    profile = profiler.get_profile(2000)
+    assert set(profile["stages"]) == {"read", "parse", "filter", "analyse"}
+    if not columnar:
+        assert profile["stages"]["filter"]["lines"] == sum(1 for _ in ApacheLogParser(log_path).get_entries())
+    assert set(profile["statistics"]) >= {"top_ips", "buckets", "percentiles"}
+    for timing in list(profile["stages"].values()) + list(profile["statistics"].values()):
+        assert timing["peak_rss_increase_kb"] is None or timing["peak_rss_increase_kb"] >= 0
+    assert profile["total"]["peak_rss_kb"] is None or profile["total"]["peak_rss_kb"] > 0
@@ -0,0 +1,57 @@
+import json
+import socket
+import threading
+import time
+from serve.apache_log_store import ApacheLogStore
+from serve.apache_log_server import ApacheLogServer
+
+
+def start_server(tmp_path, log_path: str) -> ApacheLogServer:
+    socket_path = str(tmp_path / "server.sock")
+    server = ApacheLogServer(ApacheLogStore([log_path]), socket_path=socket_path, threads=2)
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.store.loaded:
+        assert time.monotonic() < deadline, "The store wasn't loaded in time."
+        time.sleep(0.01)
+    return server
+
+
+def get(server: ApacheLogServer, target: str) -> tuple:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(server.socket_path)
+        client.sendall(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response = b""
+        while chunk := client.recv(65536):
+            response += chunk
+    head, body = response.split(b"\r\n\r\n", 1)
+    return int(head.split(b" ")[1]), json.loads(body)
+
+
+def test_query_matching_nothing(tmp_path, log_path):
+    server = start_server(tmp_path, log_path)
+    status, analysis = get(server, "/analysis?ip=192.168.1.1&stats=clients,requests,responses,metadatas,traffic")
+    assert status == 200
+    assert analysis["total_requests"] == 0
+    assert analysis["stats"]["clients"] == {"total_unique_ip": 0, "top_ips": []}
+    assert analysis["stats"]["responses"]["status_code_classes_rate"] == []
+    assert analysis["stats"]["metadatas"]["bot_rate"] == {"total": 0, "percent": 0.0}
+    assert analysis["stats"]["traffic"]["buckets"] == []
+
+
+def test_query(tmp_path, log_path):
+    server = start_server(tmp_path, log_path)
+    status, analysis = get(server, "/analysis?status=2xx")
+    assert status == 200
+    assert 0 < analysis["total_requests"] < 2000
+    assert [rate["code"] for rate in analysis["stats"]["responses"]["status_code_rate"]] == [200]
+    status, error = get(server, "/analysis?status=999")
+    assert status == 400 and "999" in error["error"]
+
+
+def test_analysis_before_load(log_path):
+    # The queries received while the files are loaded see the entries already loaded
+    server = ApacheLogServer(ApacheLogStore([log_path]))
+    analysis = server.get_analysis({"details": "true"})
+    assert analysis["total_requests"] == 0
+    assert analysis["analysis"]["store"]["loaded"] is False
@@ -0,0 +1,36 @@
+from datetime import datetime
+import pytest
+from parse.apache_timestamp_decoder import ApacheTimestampDecoder
+
+TIMESTAMPS = ["10/Oct/2000:13:55:36 -0700", "10/Oct/2000:13:55:37 -0700", "10/Oct/2000:13:56:00 -0700",
+              "29/Feb/2024:23:59:59 +0000", "01/Jan/2025:00:00:00 +0530", "01/Jan/2025:00:00:00 -0959",
+              "01/Jan/2025:00:00:00 +2359", "1/Jan/2025:00:00:00 +0100"]
+
+
+def decode(decoder: ApacheTimestampDecoder, timestamp: str):
+    # The datetime decoded or the message of the error raised
+    try:
+        return decoder.decode(timestamp)
+    except ValueError as ex:
+        return str(ex)
+
+
+def test_same_as_strptime():
+    decoder = ApacheTimestampDecoder()
+    for timestamp in TIMESTAMPS * 2:
+        assert decoder.decode(timestamp) == datetime.strptime(timestamp, ApacheTimestampDecoder.FORMAT)
+    assert decoder.hits > 0 and decoder.misses > 0 and decoder.fallbacks > 0
+
+
+@pytest.mark.parametrize("timestamp", ["10/Oct/2000:13:55:36 +0175", "10/Oct/2000:13:55:36 -0060",
+                                       "10/Oct/2000:13:55:36 +0160", "10/Oct/2000:13:55:36 +2400",
+                                       "31/Feb/2000:13:55:36 +0100", "10/Oct/2000:13:61:36 +0100",
+                                       "10/Abc/2000:13:55:36 +0100", "10/Oct/2000:13:55:36 +01:0"])
+def test_invalid_timestamp(timestamp):
+    # The same error as strptime is raised, also after a valid timestamp was memoized
+    decoder = ApacheTimestampDecoder()
+    with pytest.raises(ValueError) as strptime_error:
+        datetime.strptime(timestamp, ApacheTimestampDecoder.FORMAT)
+    assert decode(decoder, timestamp) == str(strptime_error.value)
+    decoder.decode("10/Oct/2000:13:55:36 +0100")
+    assert decode(decoder, timestamp) == str(strptime_error.value)
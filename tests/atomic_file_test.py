@@ -0,0 +1,46 @@
+import os
+import stat
+import pytest
+from export.atomic_file import open_atomic, FILE_MODE
+
+
+def test_replace(tmp_path):
+    path = str(tmp_path / "analysis.json")
+    with open(path, 'w') as file:
+        file.write("old")
+    with open_atomic(path) as file:
+        # The file is unchanged until the temporary file is closed
+        file.write("new")
+        temporary_name, = set(os.listdir(tmp_path)) - {"analysis.json"}
+        assert temporary_name.startswith("analysis.json.") and temporary_name.endswith(".tmp")
+        with open(path, 'r') as current:
+            assert current.read() == "old"
+    with open(path, 'r') as file:
+        assert file.read() == "new"
+    assert os.listdir(tmp_path) == ["analysis.json"]
+    assert stat.S_IMODE(os.stat(path).st_mode) == FILE_MODE
+
+
+def test_unique_temporary_files(tmp_path):
+    path = str(tmp_path / "analysis.json")
+    with open_atomic(path) as first, open_atomic(path) as second:
+        assert len(os.listdir(tmp_path)) == 2
+        first.write("first")
+        second.write("second")
+    # The last closed file replaces the other one
+    with open(path, 'r') as file:
+        assert file.read() == "first"
+    assert os.listdir(tmp_path) == ["analysis.json"]
+
+
+def test_failed_write(tmp_path):
+    path = str(tmp_path / "analysis.json")
+    with open(path, 'w') as file:
+        file.write("old")
+    with pytest.raises(OSError):
+        with open_atomic(path, 'wb') as file:
+            file.write(b"new")
+            raise OSError("No space left on device")
+    with open(path, 'r') as file:
+        assert file.read() == "old"
+    assert os.listdir(tmp_path) == ["analysis.json"]
@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+# The modules are imported relative to the app directory (like main.py),
+# the logs are written by the generator of the benchmarks
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIRECTORY, "app"))
+sys.path.insert(0, os.path.join(ROOT_DIRECTORY, "benchmarks"))
+
+from log_generator import SyntheticLogGenerator
+
+
+@pytest.fixture
+def log_path(tmp_path) -> str:
+    """
+    Path of a synthetic log of 2000 lines, in time order, with a few malformed lines.
+    """
+    path = str(tmp_path / "access.log")
+    SyntheticLogGenerator(lines=2000, ips=200, urls=100, malformed_ratio=0.02).write(path)
+    return path
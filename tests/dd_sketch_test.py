@@ -0,0 +1,68 @@
+import random
+import pytest
+from analysis.dd_sketch import DDSketch
+
+PERCENTILES = (50, 95, 99)
+
+
+def get_sizes(length: int, seed: int) -> list:
+    # Response sizes: a few empty responses, most around a few KB, a long tail
+    generator = random.Random(seed)
+    return [0 if generator.random() < 0.05 else int(generator.lognormvariate(8, 1.5)) for _ in range(length)]
+
+
+def get_exact_quantile(values: list, quantile: float) -> float:
+    # Same rank as the sketch: the value of rank quantile * (count - 1)
+    return sorted(values)[int(quantile * (len(values) - 1))]
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.05])
+def test_percentiles_relative_error(relative_accuracy):
+    sizes = get_sizes(20000, 1)
+    sketch = DDSketch(relative_accuracy)
+    for size in sizes:
+        sketch.add(size)
+    assert sketch.count == len(sizes)
+    for percentile in PERCENTILES:
+        exact = get_exact_quantile(sizes, percentile / 100)
+        estimated = sketch.get_quantile(percentile / 100)
+        assert abs(estimated - exact) <= relative_accuracy * exact
+
+
+def test_empty_values():
+    sketch = DDSketch()
+    assert sketch.get_quantile(0.5) is None
+    sketch.add(0, count=3)
+    sketch.add(100)
+    assert sketch.get_quantile(0.5) == 0.0
+    assert sketch.get_quantile(1) == pytest.approx(100, rel=sketch.relative_accuracy)
+
+
+def test_merge():
+    first_sizes, second_sizes = get_sizes(10000, 2), get_sizes(5000, 3)
+    first, second, whole = DDSketch(), DDSketch(), DDSketch()
+    for size in first_sizes:
+        first.add(size)
+        whole.add(size)
+    for size in second_sizes:
+        second.add(size)
+        whole.add(size)
+    first.merge(second)
+    assert first.count == whole.count
+    for quantile in (0, 0.25, 0.5, 0.75, 0.95, 0.99, 1):
+        assert first.get_quantile(quantile) == whole.get_quantile(quantile)
+
+
+def test_merge_other_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.02))
+
+
+def test_state():
+    sketch = DDSketch()
+    for size in get_sizes(1000, 4):
+        sketch.add(size)
+    loaded = DDSketch()
+    loaded.load_state(sketch.get_state())
+    assert [loaded.get_quantile(percentile / 100) for percentile in PERCENTILES] \
+        == [sketch.get_quantile(percentile / 100) for percentile in PERCENTILES]
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+from export.exporter import Exporter
+
+
+def get_analysis(top_ips: list, buckets: list) -> dict:
+    return {
+        "path": "access.log",
+        "analysis": {"filter": {"client_ip": ["10.0.0.1", "10.0.0.2"], "timestamp": None}},
+        "stats": {
+            "clients": {"total_unique_ip": len(top_ips), "top_ips": top_ips},
+            "traffic": {"bucket_size": 3600, "buckets": buckets}
+        },
+        "total_requests": sum(item["total"] for item in top_ips)
+    }
+
+
+def get_record_keys(records) -> dict:
+    # The keys of each record name
+    keys = {}
+    for record in records:
+        keys.setdefault(record["record"], set()).update(record)
+    return keys
+
+
+def test_records_of_empty_lists():
+    records = list(Exporter.get_records(get_analysis([], [])))
+    assert records == [
+        {"record": "summary", "path": "access.log", "total_requests": 0},
+        {"record": "analysis.filter", "client_ip": ["10.0.0.1", "10.0.0.2"], "timestamp": None},
+        {"record": "stats.clients", "total_unique_ip": 0},
+        {"record": "stats.traffic", "bucket_size": 3600}
+    ]
+
+
+def test_records_of_lists():
+    top_ips = [{"ip": "10.0.0.1", "total": 3}, {"ip": "10.0.0.2", "total": 1}]
+    buckets = [{"start": datetime(2025, 3, 1, 10), "requests": 4}]
+    records = list(Exporter.get_records(get_analysis(top_ips, buckets)))
+    assert records[2:] == [
+        {"record": "stats.clients", "total_unique_ip": 2},
+        {"record": "stats.clients.top_ips", "ip": "10.0.0.1", "total": 3},
+        {"record": "stats.clients.top_ips", "ip": "10.0.0.2", "total": 1},
+        {"record": "stats.traffic", "bucket_size": 3600},
+        {"record": "stats.traffic.buckets", "start": datetime(2025, 3, 1, 10), "requests": 4}
+    ]
+    # The records of the empty analysis have the same keys, without the items of the lists
+    empty_keys = get_record_keys(Exporter.get_records(get_analysis([], [])))
+    keys = get_record_keys(records)
+    assert {name: keys[name] for name in empty_keys} == empty_keys
+    assert set(keys) - set(empty_keys) == {"stats.clients.top_ips", "stats.traffic.buckets"}
+
+
+def test_records_of_values():
+    records = list(Exporter.get_records({"stats": {"sizes": {"percentiles": [10, 20]}}}))
+    assert records[1:] == [{"record": "stats.sizes.percentiles", "value": 10},
+                           {"record": "stats.sizes.percentiles", "value": 20}]
+
+
+def test_export_ndjson(tmp_path):
+    path = str(tmp_path / "analysis.ndjson")
+    Exporter(path, True).export(get_analysis([], [{"start": datetime(2025, 3, 1, 10), "requests": 0}]), "ndjson")
+    with open(path, 'r') as file:
+        records = [json.loads(line) for line in file]
+    assert records[-1] == {"record": "stats.traffic.buckets", "start": "2025-03-01T10:00:00", "requests": 0}
+    assert {"record": "stats.clients", "total_unique_ip": 0} in records
@@ -0,0 +1,47 @@
+import pytest
+from analysis.hyper_log_log import HyperLogLog
+
+
+@pytest.mark.parametrize("error", [0.05, 0.01])
+@pytest.mark.parametrize("distinct", [100, 5000, 100000])
+def test_cardinality_within_error(error, distinct):
+    estimator = HyperLogLog(error)
+    assert estimator.error <= error
+    for index in range(distinct):
+        # Each item is added several times, only the distinct ones are counted
+        estimator.add(f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}")
+        estimator.add(f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}")
+    # The hash is stable, the estimation is always the same: within 3 standard errors
+    assert abs(estimator.count() - distinct) <= 3 * estimator.error * distinct
+
+
+def test_empty():
+    assert HyperLogLog().count() == 0
+
+
+def test_merge():
+    first, second, union = HyperLogLog(0.02), HyperLogLog(0.02), HyperLogLog(0.02)
+    for index in range(30000):
+        first.add(index)
+        union.add(index)
+    for index in range(20000, 50000):
+        second.add(index)
+        union.add(index)
+    first.merge(second)
+    # The registers of the merge are the ones of an estimator of all the items
+    assert first.get_state() == union.get_state()
+    assert abs(first.count() - 50000) <= 3 * first.error * 50000
+
+
+def test_merge_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(0.01).merge(HyperLogLog(0.1))
+
+
+def test_state():
+    estimator = HyperLogLog()
+    for index in range(1000):
+        estimator.add(index)
+    loaded = HyperLogLog()
+    loaded.load_state(estimator.get_state())
+    assert loaded.count() == estimator.count()
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+from log_generator import SyntheticLogGenerator
+
+APP_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def run_main(*arguments: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "main.py", *arguments], cwd=APP_DIRECTORY,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+
+def read_total_requests(path: str):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)["total_requests"]
+    except (OSError, ValueError):
+        return None
+
+
+def wait_for(condition, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timeout"
+        time.sleep(0.05)
+
+
+def test_follow_rotation_with_state(tmp_path):
+    log_path = str(tmp_path / "a.log")
+    output_path = str(tmp_path / "a.json")
+    state_path = str(tmp_path / "a.state")
+    SyntheticLogGenerator(lines=1000).write(log_path)
+    process = run_main(log_path, "-o", output_path, "--follow", "--state", state_path, "--interval", "0.1")
+    try:
+        wait_for(lambda: read_total_requests(output_path) == 1000 and os.path.isfile(state_path))
+        # The log is rotated: a new file of 10 lines replaces it
+        os.rename(log_path, f"{log_path}.1")
+        SyntheticLogGenerator(lines=10).write(log_path)
+        wait_for(lambda: read_total_requests(output_path) == 10)
+    finally:
+        process.send_signal(signal.SIGINT)
+        output = process.communicate(timeout=20)[0]
+    assert process.returncode == 0, output
+    # The saved state is the analysis of the new file, not of both files
+    resumed_path = str(tmp_path / "resumed.json")
+    fresh_path = str(tmp_path / "fresh.json")
+    assert run_main(log_path, "-o", resumed_path, "--state", state_path).wait(timeout=20) == 0
+    assert run_main(log_path, "-o", fresh_path).wait(timeout=20) == 0
+    assert read_total_requests(resumed_path) == read_total_requests(fresh_path) == 10
@@ -0,0 +1,66 @@
+import random
+from collections import Counter
+from analysis.space_saving import SpaceSaving
+
+
+def get_stream(length: int, seed: int) -> list:
+    # A few items are much more frequent than the others (Zipf-like)
+    generator = random.Random(seed)
+    return [f"/page/{int(generator.paretovariate(1.1))}" for _ in range(length)]
+
+
+def check_bounds(summary: SpaceSaving, counts: Counter):
+    total = sum(counts.values())
+    state = summary.get_state()
+    assert state["total"] == total
+    for item, item_count, error in state["items"]:
+        # Never underestimated, overestimated by at most its error, itself bounded
+        assert counts[item] <= item_count <= counts[item] + error
+        assert error <= total * summary.error
+    # Every item more frequent than the bound is monitored
+    monitored = {item for item, _, _ in state["items"]}
+    for item, item_count in counts.items():
+        if item_count > total * summary.error:
+            assert item in monitored
+
+
+def test_overestimation_bound():
+    stream = get_stream(50000, 1)
+    summary = SpaceSaving(0.01)
+    for item in stream:
+        summary.add(item)
+    counts = Counter(stream)
+    check_bounds(summary, counts)
+    # The most frequent items are found
+    assert [item for item, _ in summary.most_common(3)] == [item for item, _ in counts.most_common(3)]
+
+
+def test_exact_under_capacity():
+    summary = SpaceSaving(0.1)
+    for item in "abacabad":
+        summary.add(item)
+    assert summary.most_common(2) == [("a", 4), ("b", 2)]
+    assert summary.get_error("a") == 0
+
+
+def test_merge_bound():
+    first_stream, second_stream = get_stream(30000, 2), get_stream(20000, 3)
+    first, second = SpaceSaving(0.01), SpaceSaving(0.01)
+    for item in first_stream:
+        first.add(item)
+    for item in second_stream:
+        second.add(item)
+    first.merge(second)
+    check_bounds(first, Counter(first_stream + second_stream))
+
+
+def test_merge_order():
+    first, second = SpaceSaving(0.1), SpaceSaving(0.1)
+    for item in ["b", "a", "b"]:
+        first.add(item)
+    for item in ["c", "a", "d", "c"]:
+        second.add(item)
+    first.merge(second)
+    # The items keep the order they were first seen: the first summary, then the new ones
+    assert [item for item, _, _ in first.get_state()["items"]] == ["b", "a", "c", "d"]
+    assert dict(first.most_common(4)) == {"b": 2, "a": 2, "c": 2, "d": 1}